@@ -0,0 +1,38 @@
+
+# microbenchmark of meta data extraction with a full BeautifulSoup parse of the page, as extract_meta() used to do,
+# to compare with test_parse_meta in bench_parse.py, where parse_meta() only parses the document head
+import random
+import pytest
+from bs4 import BeautifulSoup
+from fixtures import make_page, make_text
+from parse_functions import HTML_PARSER, META_TAGS, PUBLICATION_DATE_META_TAGS, parse_meta
+# paragraphs in the page body, same as bench_parse.py
+PAGE_PARAGRAPHS = [10, 100, 1000]
+def extract_meta_full_parse(html):
+    """
+    Returns meta data the way extract_meta() read it before parse_meta() - full parse, one find() per tag
+
+    Args:
+        html (str): page html
+
+    Returns:
+        dictionary of metadata
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    meta_data = {}
+    for key, attrs in META_TAGS.items():
+        tag = soup.find('meta', attrs=attrs)
+        meta_data[key] = tag['content'] if tag and 'content' in tag.attrs else None
+    meta_data['date'] = None
+    for attrs in PUBLICATION_DATE_META_TAGS:
+        tag = soup.find('meta', attrs=attrs)
+        if tag and 'content' in tag.attrs:
+            meta_data['date'] = tag['content']
+            break
+    return meta_data
+@pytest.mark.parametrize('num_paragraphs', PAGE_PARAGRAPHS)
+def test_extract_meta_full_parse(benchmark, num_paragraphs):
+    html = make_page('Benchmark page', make_text(random.Random(0), num_paragraphs), published = '2024-03-01')
+    meta_data = benchmark(extract_meta_full_parse, html)
+    # parse_meta() reads the same values from the head only
+    assert meta_data == parse_meta(html)
@@ -0,0 +1,58 @@
+
+# microbenchmarks of the metadata log hot paths - url dedup index, and adding rows to the log and writing it, at 1k, 10k and 100k rows
+import pytest
+from fixtures import make_metadata_rows
+ROW_COUNTS = [1000, 10000, 100000]
+@pytest.fixture(scope='module')
+def logged_rows(common_ns):
+    """
+    Metadata log for each row count, as read at the start of a crawl
+    """
+    return {num_rows: common_ns['flush_metadata'](common_ns['read_metadata_log'](common_ns['Path']('/nonexistent/log.parquet')),
+                                                  make_metadata_rows(num_rows)).to_pandas()
+            for num_rows in ROW_COUNTS}
+@pytest.mark.parametrize('num_rows', ROW_COUNTS)
+def test_get_url_index(benchmark, common_ns, logged_rows, num_rows):
+    url_index = benchmark(common_ns['get_url_index'], logged_rows[num_rows])
+    assert len(url_index) == num_rows
+@pytest.mark.parametrize('num_rows', ROW_COUNTS)
+def test_url_in_index(benchmark, common_ns, logged_rows, num_rows):
+    # one lookup for each logged url and one for a url that is not logged, as when a crawl goes back over the listing
+    url_index = common_ns['get_url_index'](logged_rows[num_rows])
+    url_in_index = common_ns['url_in_index']
+    urls = [f'https://stacks.cdc.gov/view/cdc/{100000 + i}' for i in range(2 * num_rows)]
+    num_found = benchmark(lambda: sum(url_in_index(url_index, url) for url in urls))
+    assert num_found == num_rows
+@pytest.mark.parametrize('num_rows', ROW_COUNTS)
+def test_metadata_append(benchmark, common_ns, tmp_path, num_rows):
+    # rows added by the download jobs, with a checkpoint part file written every CHECKPOINT_ROWS rows
+    rows = make_metadata_rows(num_rows)
+    empty_log = common_ns['read_metadata_log'](tmp_path / 'log.parquet')
+    def setup():
+        log_writer = common_ns['MetadataLogWriter'](tmp_path / 'log_benchmark.parquet', empty_log, update_catalog = False)
+        return (log_writer,), {}
+    def append_rows(log_writer):
+        for row in rows:
+            log_writer.append(row)
+        return log_writer
+    log_writer = benchmark.pedantic(append_rows, setup=setup, rounds=3)
+    assert len(log_writer.rows) == num_rows
+@pytest.mark.parametrize('num_rows', ROW_COUNTS)
+def test_metadata_flush(benchmark, common_ns, logged_rows, num_rows):
+    # new rows combined with the logged rows, as in MetadataLogWriter.close()
+    records = [common_ns['MetadataRecord'].from_row(row) for row in make_metadata_rows(num_rows)]
+    flush_metadata = common_ns['flush_metadata']
+    meta_table = benchmark(lambda: flush_metadata(logged_rows[num_rows], list(records)))
+    assert meta_table.num_rows == 2 * num_rows
+@pytest.mark.parametrize('num_rows', ROW_COUNTS)
+def test_metadata_close(benchmark, common_ns, logged_rows, tmp_path, num_rows):
+    # close() of a log with num_rows logged and num_rows new rows - combined, deduplicated and written to parquet
+    records = [common_ns['MetadataRecord'].from_row(row) for row in make_metadata_rows(num_rows)]
+    def setup():
+        log_writer = common_ns['MetadataLogWriter'](tmp_path / 'log_benchmark.parquet', logged_rows[num_rows],
+                                                    checkpoint_rows = 2 * num_rows, update_catalog = False)
+        log_writer.rows = list(records)
+        log_writer.num_checkpointed = num_rows
+        return (log_writer,), {}
+    meta_data = benchmark.pedantic(lambda log_writer: log_writer.close(), setup=setup, rounds=3)
+    assert len(meta_data) == num_rows
@@ -0,0 +1,60 @@
+
+# microbenchmarks of the page parsing done for each document - meta tags, publication date, fact sheet text,
+# CDC Stacks document info and the SAMHSA report sidebar
+import random
+import pytest
+from fixtures import make_page, make_text
+from parse_functions import find_meta_date, get_head_meta_tags, pair_sidebar_items, parse_fact_sheet, parse_meta, parse_stacks_info
+# paragraphs in the page body - about 6 KB, 55 KB and 550 KB pages
+PAGE_PARAGRAPHS = [10, 100, 1000]
+def make_detail_page(num_paragraphs, body = ''):
+    """
+    Returns html of a detail page, body before num_paragraphs paragraphs of text
+    """
+    return make_page('Benchmark page', body + make_text(random.Random(0), num_paragraphs), published = '2024-03-01')
+@pytest.mark.parametrize('num_paragraphs', PAGE_PARAGRAPHS)
+def test_parse_meta(benchmark, num_paragraphs):
+    html = make_detail_page(num_paragraphs)
+    meta_data = benchmark(parse_meta, html)
+    assert meta_data['author'] == 'Benchmark Author'
+    assert meta_data['date'] == '2024-03-01'
+@pytest.mark.parametrize('num_paragraphs', PAGE_PARAGRAPHS)
+def test_extract_meta(benchmark, common_ns, num_paragraphs):
+    # extract_meta() of every source, with the page already in the page cache - parsed again in each round
+    html = make_detail_page(num_paragraphs)
+    url = f'https://www.cdc.gov/benchmark/{num_paragraphs}'
+    page_cache = common_ns['PAGE_CACHE']
+    get_page_fields = common_ns['get_page_fields']
+    def setup():
+        page_cache.put(url, html)
+    meta_data = benchmark.pedantic(lambda: dict(get_page_fields(url, None, parse_meta)), setup=setup, rounds=100)
+    assert meta_data['title'] == 'Benchmark page'
+@pytest.mark.parametrize('num_paragraphs', PAGE_PARAGRAPHS)
+def test_find_meta_date(benchmark, num_paragraphs):
+    html = make_detail_page(num_paragraphs)
+    assert benchmark(lambda: find_meta_date(get_head_meta_tags(html))) == '2024-03-01'
+@pytest.mark.parametrize('num_paragraphs', PAGE_PARAGRAPHS)
+def test_parse_fact_sheet(benchmark, num_paragraphs):
+    # text extraction of download_fact_sheet()
+    rng = random.Random(0)
+    body = ('<div class="sf-navigation">' + make_text(rng, 5) + '</div><div class="date">1 March 2024</div>'
+            '<div class="row sf-detail-content">' + make_text(rng, num_paragraphs) + '</div>')
+    fact_sheet = benchmark(parse_fact_sheet, make_page('Fact sheet', body))
+    assert fact_sheet['date'] == '2024-03-01'
+    assert len(fact_sheet['text']) > 0
+@pytest.mark.parametrize('num_paragraphs', PAGE_PARAGRAPHS)
+def test_parse_stacks_info(benchmark, num_paragraphs):
+    # get_stacks_info() of a CDC Stacks document page
+    body = ('<div class="stacks-flex">Stacks document</div><div class="col-3 bookHeaderListData">2024-05-04</div>'
+            '<form id="download-document" action="/view/cdc/100000/cdc_100000_DS1.pdf" method="get">'
+            '<input type="hidden" name="download" value="true"></form>')
+    stacks_info = benchmark(parse_stacks_info, make_detail_page(num_paragraphs, body))
+    assert stacks_info[2] == '/view/cdc/100000/cdc_100000_DS1.pdf'
+@pytest.mark.parametrize('num_items', [10, 100, 1000])
+def test_pair_sidebar_items(benchmark, num_items):
+    # sidebar walk of get_sahmsa_report_info(), on the element text read from the browser
+    texts = []
+    for i in range(num_items):
+        texts.extend([f'Label {i}:', f'Value {i}', ''])
+    data_dict = benchmark(pair_sidebar_items, texts)
+    assert len(data_dict) == num_items
@@ -0,0 +1,26 @@
+
+# setup shared by the microbenchmarks - the common functions notebook is run once for the session
+from pathlib import Path
+import os
+import sys
+import pytest
+BENCHMARK_FOLDER = Path(__file__).resolve().parent
+REPO_FOLDER = BENCHMARK_FOLDER.parent
+sys.path.append(str(BENCHMARK_FOLDER))
+sys.path.append(str(REPO_FOLDER / 'common'))
+from notebook_loader import run_export
+@pytest.fixture(scope='session')
+def common_ns():
+    """
+    Namespace with a source config and the common functions notebook run in it, as in a save notebook
+    """
+    ns = {'__name__': 'common_functions'}
+    # %run paths are relative to the source folder, as in Jupyter
+    cwd = os.getcwd()
+    os.chdir(REPO_FOLDER / 'cdc_eis_case_studies')
+    try:
+        run_export(REPO_FOLDER / 'cdc_eis_case_studies' / 'cdc_eis_case_studies_config.py', ns)
+        run_export(REPO_FOLDER / 'common' / 'common_functions.py', ns)
+    finally:
+        os.chdir(cwd)
+    return ns
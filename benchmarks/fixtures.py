@@ -0,0 +1,285 @@
+
+# fixtures for the offline pipeline benchmarks - pages and files for each host, with the structure the scrapers read:
+# the WHO publications listing and fact sheets, SAMHSA all-reports pages, CDC Stacks advanced search and the EIS case studies page
+# pages recorded from the real sites can be saved over these, in the same layout, see mock_server.get_fixture_path()
+# also pages and metadata rows for the microbenchmarks, bench_*.py
+# run from the repository root to write them to a folder: python benchmarks/fixtures.py <folder>
+from datetime import date, datetime, timedelta
+from html import escape
+from pathlib import Path
+import random
+import sys
+from mock_server import get_fixture_path
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+ROBOTS_TXT = 'User-agent: *\nAllow: /\n'
+def load_config(config_path):
+    """
+    Returns the settings in a source config notebook export - the configs are plain assignments, so they are run as python
+
+    Args:
+        config_path (Path object): file path to config, for example who/who_config.py
+
+    Returns:
+        dictionary of setting name to value
+    """
+    config = {}
+    exec(compile(Path(config_path).read_text(), str(config_path), 'exec'), config)
+    return config
+def write_fixture(host_folder, url, content):
+    """
+    Save a page or file as the fixture for a url path
+
+    Args:
+        host_folder (Path object): fixture folder for the host
+        url (str): url path, with query string if the page depends on it
+        content (str or bytes): page html or file contents
+
+    Returns:
+
+    """
+    path, _, query = url.partition('?')
+    fixture_path = get_fixture_path(host_folder, path, query)
+    fixture_path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(content, str):
+        fixture_path.write_text(content, encoding='utf-8')
+    else:
+        fixture_path.write_bytes(content)
+def make_page(title, body, author = 'Benchmark Author', published = None):
+    """
+    Returns html of a page, with the meta tags read by extract_meta() in the head
+
+    Args:
+        title (str): page title
+        body (str): html of the page body
+        author (str): author meta tag
+        published (str): publication date meta tag, optional
+
+    Returns:
+        html (str)
+    """
+    date_tag = '' if published is None else f'<meta property="article:published_time" content="{published}">'
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8">'
+            f'<title>{escape(title)}</title>'
+            '<link rel="stylesheet" href="/css/site.css">'
+            f'<meta name="author" content="{escape(author)}">'
+            '<meta name="keywords" content="public health, surveillance, data">'
+            f'<meta name="description" content="{escape(title)} - benchmark fixture">'
+            f'<meta property="og:title" content="{escape(title)}">'
+            f'{date_tag}</head><body>{body}</body></html>')
+def make_text(rng, num_paragraphs):
+    """
+    Returns html paragraphs of filler text
+
+    Args:
+        rng (random.Random): random number generator
+        num_paragraphs (int): number of paragraphs
+
+    Returns:
+        html (str)
+    """
+    words = ['health', 'data', 'public', 'surveillance', 'report', 'disease', 'prevention', 'community', 'guidance', 'outbreak']
+    return ''.join('<p>' + ' '.join(rng.choice(words) for _ in range(80)) + '.</p>' for _ in range(num_paragraphs))
+def make_pdf(rng, num_bytes):
+    """
+    Returns bytes of a file that starts like a PDF, padded to num_bytes with random bytes
+
+    Args:
+        rng (random.Random): random number generator
+        num_bytes (int): file size
+
+    Returns:
+        bytes
+    """
+    header = b'%PDF-1.4\n%benchmark fixture\n'
+    return header + rng.randbytes(max(num_bytes - len(header) - 6, 0)) + b'\n%%EOF'
+def get_dates(num_documents):
+    """
+    Returns a different publication date for each document, newest first
+
+    Args:
+        num_documents (int): number of documents
+
+    Returns:
+        list of date objects
+    """
+    return [date(2024, 6, 1) - timedelta(days=7 * i) for i in range(num_documents)]
+def get_pages(num_documents, page_size):
+    """
+    Returns document numbers on each page of a listing
+
+    Args:
+        num_documents (int): number of documents
+        page_size (int): documents on each page
+
+    Returns:
+        list of ranges, one for each page
+    """
+    return [range(start, min(start + page_size, num_documents)) for start in range(0, max(num_documents, 1), page_size)]
+def make_metadata_rows(num_rows):
+    """
+    Returns rows of metadata as created by the download jobs, with a different url for each row
+
+    Args:
+        num_rows (int): number of rows
+
+    Returns:
+        list of dictionaries with keys from METADATA_SCHEMA
+    """
+    captured = datetime(2024, 6, 1, 12, 0, 0)
+    rows = []
+    for i in range(num_rows):
+        date_time_string = (captured + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f")
+        rows.append({'url': f'https://stacks.cdc.gov/view/cdc/{100000 + i}',
+                     'datetime_captured': date_time_string,
+                     'title': f'Stacks document {i}: surveillance summary',
+                     'author': 'Centers for Disease Control and Prevention',
+                     'publication_date': '2024-05-04',
+                     'license': 'Public Domain',
+                     'file_type': 'pdf',
+                     'storage_location': f'gcs/pubhealth-ai-training-corpus/raw/blobs/{i:064x}/cdc_{100000 + i}_DS1.pdf',
+                     'datetime_last_updated': date_time_string,
+                     'json_additional_metadata': {'keywords': 'public health, surveillance, data',
+                                                  'description': f'Stacks document {i}', 'sha256': f'{i:064x}'}})
+    return rows
+def make_who_fixtures(host_folder, rng, num_documents, page_size, file_size):
+    """
+    WHO publications listing for each document type in WHO_DOCUMENT_TYPES, with the dropdown filter and next page arrow
+        clicked by the scraper, document pages and files, and the fact sheets index and fact sheets
+    """
+    config = load_config(REPO_FOLDER / 'who' / 'who_config.py')
+    write_fixture(host_folder, '/robots.txt', ROBOTS_TXT)
+    dates = get_dates(num_documents)
+    # the filter dropdown - choosing a document type loads its first page
+    options = ''.join(f'''<li onclick="location.search='?type={i}&page=1'">{escape(doc_type)}</li>'''
+                      for i, doc_type in enumerate(config['WHO_DOCUMENT_TYPES']))
+    dropdown = ('<span class="k-icon k-i-arrow-60-down" style="display:inline-block;width:20px;height:20px" '
+                '''onclick="document.getElementById('types').style.display='block'">v</span>'''
+                f'<div class="k-list-container" id="types" style="display:none"><ul>{options}</ul></div>')
+    write_fixture(host_folder, '/publications/m', make_page('Publications', dropdown))
+    for type_num, doc_type in enumerate(config['WHO_DOCUMENT_TYPES']):
+        pages = get_pages(num_documents, page_size)
+        for page_num, doc_nums in enumerate(pages, start=1):
+            items = ''
+            for doc_num in doc_nums:
+                slug = f'type{type_num}-document-{doc_num}'
+                title = f'{doc_type} {doc_num}: guidance on public health data'
+                items += ('<div class="sf-publications-item">'
+                          f'<a class="page-url" href="/publications/i/item/{slug}">'
+                          f'<span class="sf-publications-item__title" title="{escape(title)}">{escape(title)}</span></a>'
+                          f'<div class="sf-publications-item__date">{dates[doc_num].strftime("%d %B %Y")}</div>'
+                          f'<a class="download-url" href="/iris/bitstream/{slug}.pdf">Download</a></div>')
+                write_fixture(host_folder, f'/publications/i/item/{slug}', make_page(title, make_text(rng, 5), 'World Health Organization'))
+                write_fixture(host_folder, f'/iris/bitstream/{slug}.pdf', make_pdf(rng, file_size))
+            if page_num < len(pages):
+                items += ('<span class="k-icon k-i-arrow-60-right" style="display:inline-block;width:20px;height:20px" '
+                          f'''onclick="location.search='?type={type_num}&page={page_num + 1}'">&gt;</span>''')
+            write_fixture(host_folder, f'/publications/m?type={type_num}&page={page_num}', make_page(doc_type, dropdown + items))
+    # fact sheets index and fact sheets
+    links = ''
+    for doc_num in range(num_documents):
+        slug = f'fact-sheet-{doc_num}'
+        title = f'Fact sheet {doc_num}'
+        links += f'<li class="alphabetical-nav--list-item"><a href="/news-room/fact-sheets/detail/{slug}">{title}</a></li>'
+        body = (f'<div class="date">{dates[doc_num].strftime("%d %B %Y")}</div>'
+                f'<div class="row sf-detail-content">{make_text(rng, 20)}</div>')
+        write_fixture(host_folder, f'/news-room/fact-sheets/detail/{slug}', make_page(title, body, 'World Health Organization'))
+    write_fixture(host_folder, '/news-room/fact-sheets', make_page('Fact sheets', f'<ul>{links}</ul>'))
+def make_samhsa_fixtures(host_folder, rng, num_documents, page_size, file_size):
+    """
+    SAMHSA all-reports pages, with the page count read by the scraper, and report pages with the sidebar and files
+    """
+    write_fixture(host_folder, '/robots.txt', ROBOTS_TXT)
+    dates = get_dates(num_documents)
+    pages = get_pages(num_documents, page_size)
+    for page_num, doc_nums in enumerate(pages):
+        links = ''
+        for doc_num in doc_nums:
+            slug = f'report-{doc_num}'
+            title = f'Report {doc_num}: behavioral health data'
+            links += f'<div class="views-row"><a href="/data/report/{slug}">{title}</a></div>'
+            sidebar = ('<div class="desktop:grid-col-6 content-column report-sidebar1">'
+                       f'<span>Publication Date:</span><span>{dates[doc_num].strftime("%B %Y")}</span>'
+                       '<span>Type:</span><span>Report</span></div>')
+            body = (f'<h1 class="hide-for-iframe">{title}</h1>{sidebar}{make_text(rng, 5)}'
+                    f'<a href="/data/sites/default/files/reports/rpt{doc_num}/{slug}.pdf">PDF</a>')
+            write_fixture(host_folder, f'/data/report/{slug}', make_page(title, body, 'SAMHSA'))
+            write_fixture(host_folder, f'/data/sites/default/files/reports/rpt{doc_num}/{slug}.pdf', make_pdf(rng, file_size))
+        pager = f'<div class="pagerer-center-pane">Page {page_num + 1} of {len(pages)}</div>'
+        page = make_page('All reports', links + pager)
+        write_fixture(host_folder, f'/data/all-reports?page={page_num}', page)
+        if page_num == 0:
+            write_fixture(host_folder, '/data/all-reports', page)
+def make_stacks_fixtures(host_folder, rng, num_documents, page_size, file_size):
+    """
+    CDC Stacks advanced search form with the filters set by the scraper, result pages, and document pages with the download form
+    """
+    config = load_config(REPO_FOLDER / 'cdc_stacks' / 'cdc_stacks_config.py')
+    write_fixture(host_folder, '/robots.txt', ROBOTS_TXT)
+    def select(select_id, values):
+        options = ''.join(f'<option>{escape(value)}</option>' for value in sorted(set(values) | {''}))
+        return f'<select id="{select_id}" name="{select_id}">{options}</select>'
+    # any search loads the first page of results, the query string is not part of the fixture name
+    search_form = ('<form action="/results" method="get">'
+                   + select('edit-fedora_terms10', config['CDC_STACKS_COLLECTIONS'])
+                   + select('edit-fedora_terms9', config['CDC_STACKS_DOCUMENT_TYPE'])
+                   + select('edit-fedora_terms5', [config['CDC_LANGUAGE']])
+                   + '<input id="fedora_terms6" name="start"><input id="fedora_terms7" name="end">'
+                   + '<button id="searchButtonAdvanced" type="submit">Search</button></form>')
+    write_fixture(host_folder, '/advancesearch', make_page('Advanced search', search_form))
+    dates = get_dates(num_documents)
+    pages = get_pages(num_documents, page_size)
+    for page_num, doc_nums in enumerate(pages, start=1):
+        links = ''
+        for pg, doc_num in enumerate(doc_nums):
+            doc_id = 100000 + doc_num
+            title = f'Stacks document {doc_num}: surveillance summary'
+            links += f'<div><a id="paginationSubmit{pg}" href="/view/cdc/{doc_id}">{title}</a></div>'
+            body = (f'<div class="stacks-flex">{title}</div>'
+                    f'<div class="col-3 bookHeaderListData">{dates[doc_num].strftime("%Y-%m-%d")}</div>'
+                    f'<form id="download-document" action="/view/cdc/{doc_id}/cdc_{doc_id}_DS1.pdf" method="get">'
+                    '<input type="hidden" name="download" value="true">'
+                    '<button id="download-document-submit" type="submit">Download</button></form>'
+                    + make_text(rng, 5))
+            write_fixture(host_folder, f'/view/cdc/{doc_id}', make_page(title, body, 'Centers for Disease Control and Prevention'))
+            write_fixture(host_folder, f'/view/cdc/{doc_id}/cdc_{doc_id}_DS1.pdf', make_pdf(rng, file_size))
+        if page_num < len(pages):
+            links += f'<a id="next" href="/results?page={page_num + 1}">Next</a>'
+        page = make_page('Search results', links)
+        write_fixture(host_folder, f'/results?page={page_num}', page)
+        if page_num == 1:
+            write_fixture(host_folder, '/results', page)
+def make_eis_fixtures(host_folder, rng, num_documents, file_size):
+    """
+    CDC EIS case studies page, with an "Updated in [year]" note next to each pdf link, and the pdfs
+    """
+    write_fixture(host_folder, '/robots.txt', ROBOTS_TXT)
+    links = ''
+    for doc_num in range(num_documents):
+        file_path = f'/eis/downloads/case-study-{doc_num}.pdf'
+        links += f'<p><a href="{file_path}">Case study {doc_num}</a> Updated in {2024 - doc_num % 5}</p>'
+        write_fixture(host_folder, file_path, make_pdf(rng, file_size))
+    write_fixture(host_folder, '/eis/request-services/casestudies.html', make_page('EIS case studies', links))
+def make_fixtures(fixture_folder, num_documents = 20, page_size = 10, file_size = 256 * 1024, seed = 0):
+    """
+    Write fixtures for every host to fixture_folder, one folder per host
+
+    Args:
+        fixture_folder (Path object): folder to write to
+        num_documents (int): documents for each source, and for each WHO document type
+        page_size (int): documents on each page of a listing
+        file_size (int): bytes in each downloaded file
+        seed (int): seed for the random text and file contents, so runs with the same settings download the same files
+
+    Returns:
+        Path to fixture_folder
+    """
+    fixture_folder = Path(fixture_folder)
+    rng = random.Random(seed)
+    make_who_fixtures(fixture_folder / 'www.who.int', rng, num_documents, page_size, file_size)
+    make_samhsa_fixtures(fixture_folder / 'www.samhsa.gov', rng, num_documents, page_size, file_size)
+    make_stacks_fixtures(fixture_folder / 'stacks.cdc.gov', rng, num_documents, page_size, file_size)
+    make_eis_fixtures(fixture_folder / 'www.cdc.gov', rng, num_documents, file_size)
+    return fixture_folder
+if __name__ == '__main__':
+    folder = make_fixtures(sys.argv[1] if len(sys.argv) > 1 else Path(__file__).resolve().parent / 'fixtures')
+    print(f'Fixtures written to {folder}')
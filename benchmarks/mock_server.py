@@ -0,0 +1,186 @@
+
+# local HTTP server replaying recorded pages and files for each source, so the save pipelines can be run without
+# requesting cdc.gov, who.int or samhsa.gov - one server per host, as the rate limiter and robots.txt are per host
+# fixtures are saved as <fixture folder>/<host>/<url path>, with the query string added to the file name, see get_fixture_path()
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import urlsplit, unquote
+import hashlib
+import mimetypes
+import re
+import threading
+import time
+def get_fixture_path(host_folder, path, query = ''):
+    """
+    Returns file path of the fixture for a url path and query string
+        paths without a file extension are pages saved as <path>/index.html, so /a and /a/b.pdf can both be saved,
+        and a query string is added to the file name as @<query>, with characters other than letters, numbers, - and . replaced with _
+
+    Args:
+        host_folder (Path object): fixture folder for the host
+        path (str): url path
+        query (str): url query string, optional
+
+    Returns:
+        Path file path
+    """
+    relative_path = unquote(path).strip('/')
+    if not '.' in relative_path.split('/')[-1]:
+        relative_path = (relative_path + '/index.html').lstrip('/')
+    if query != '':
+        relative_path = relative_path + '@' + re.sub(r'[^A-Za-z0-9.-]+', '_', query)
+    return Path(host_folder) / relative_path
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Serves the fixtures for one host, with a delay before each response and a limit on bandwidth
+
+    Args:
+        host_folder (Path object): fixture folder for the host
+        latency (float): seconds before the response headers are sent
+        bandwidth (float): bytes per second the response body is sent at, None for no limit
+        port (int): port to listen on, 0 for any free port
+    """
+    daemon_threads = True
+
+    def __init__(self, host_folder, latency = 0.0, bandwidth = None, port = 0):
+        super().__init__(('127.0.0.1', port), FixtureRequestHandler)
+        self.host_folder = Path(host_folder)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.num_bytes = 0
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def count(self, num_bytes):
+        """
+        Add a served response to the request and byte counts
+
+        Args:
+            num_bytes (int): bytes in the response body
+
+        Returns:
+
+        """
+        with self.lock:
+            self.num_requests += 1
+            self.num_bytes += num_bytes
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves a fixture file for GET and HEAD requests - 404 if there is no fixture for the url
+        ETag and Last-Modified are sent, and If-None-Match is answered with a 304, so the HTTP cache is exercised as on the real hosts
+    """
+    protocol_version = 'HTTP/1.1'
+    chunk_size = 16 * 1024
+
+    def do_GET(self):
+        self.send_fixture(include_body = True)
+
+    def do_HEAD(self):
+        self.send_fixture(include_body = False)
+
+    def do_POST(self):
+        # download forms submitted over HTTP
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self.send_fixture(include_body = True)
+
+    def send_fixture(self, include_body):
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        fixture_path = get_fixture_path(self.server.host_folder, parts.path, parts.query)
+        if fixture_path.is_file() == False:
+            # pages that do not depend on the query string are saved once
+            fixture_path = get_fixture_path(self.server.host_folder, parts.path)
+        if fixture_path.is_file() == False:
+            self.send_error(404)
+            self.server.count(0)
+            return
+        body = fixture_path.read_bytes()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            self.server.count(0)
+            return
+        content_type = mimetypes.guess_type(fixture_path.name.split('@')[0])[0] or 'text/html'
+        if content_type.startswith('text/'):
+            content_type = content_type + '; charset=utf-8'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', formatdate(fixture_path.stat().st_mtime, usegmt=True))
+        self.end_headers()
+        if include_body == True:
+            self.send_body(body)
+        self.server.count(len(body))
+
+    def send_body(self, body):
+        try:
+            for start in range(0, len(body), self.chunk_size):
+                chunk = body[start:start + self.chunk_size]
+                self.wfile.write(chunk)
+                if not self.server.bandwidth is None:
+                    time.sleep(len(chunk) / self.server.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            # client stopped reading, for example a download that was cancelled
+            pass
+
+    def log_message(self, format, *args):
+        # requests are not printed in the benchmark output
+        pass
+class MockHosts:
+    """
+    One fixture server for each host folder in the fixture folder, each on its own port, run in background threads
+        used as a context manager - servers are started on enter and stopped on exit
+
+    Args:
+        fixture_folder (Path object): folder with a fixture folder for each host, output of make_fixtures()
+        latency (float): seconds before each response
+        bandwidth (float): bytes per second for each response body, None for no limit
+    """
+    def __init__(self, fixture_folder, latency = 0.0, bandwidth = None):
+        self.fixture_folder = Path(fixture_folder)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.servers = {}
+
+    def __enter__(self):
+        for host_folder in sorted(self.fixture_folder.iterdir()):
+            if host_folder.is_dir() == True:
+                server = FixtureServer(host_folder, self.latency, self.bandwidth)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                self.servers[host_folder.name] = server
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+        return False
+
+    def get_url_map(self):
+        """
+        Returns base url of each real host mapped to the base url of its mock server
+
+        Returns:
+            dictionary of https://<host> to http://127.0.0.1:<port>
+        """
+        return {f'https://{host}': server.base_url for host, server in self.servers.items()}
+
+    def get_counts(self):
+        """
+        Returns requests and bytes served for each host
+
+        Returns:
+            dictionary of host to dictionary with requests and bytes
+        """
+        return {host: {'requests': server.num_requests, 'bytes': server.num_bytes} for host, server in self.servers.items()}
@@ -0,0 +1,63 @@
+
+# runs the notebook exports (.py) of the save notebooks outside Jupyter, so the benchmarks can time them in one process
+# %run lines run the exported notebook in the same namespace, as in Jupyter, and top-level await is allowed
+from pathlib import Path
+import ast
+import asyncio
+import inspect
+import re
+RUN_LINE = re.compile(r'^%run\s+(\S+)\s*$', flags=re.MULTILINE)
+# notebooks whose export is saved under a different name, notebook name to export name
+EXPORT_NAMES = {
+    'cdc_config': 'cdc_eis_case_studies_config',
+    'cdc_functions': 'cdc_eis_case_studies_functions',
+}
+def get_export_path(notebook_path, folder):
+    """
+    Returns file path of the .py export of a notebook
+
+    Args:
+        notebook_path (str): path in a %run line, for example ../common/common_functions.ipynb
+        folder (Path object): folder the path is relative to - the working directory, as in Jupyter,
+            not the folder of the notebook with the %run line
+
+    Returns:
+        Path file path
+    """
+    export_path = (Path(folder) / notebook_path).with_suffix('.py').resolve()
+    if export_path.is_file() == False and export_path.stem in EXPORT_NAMES:
+        export_path = export_path.with_name(EXPORT_NAMES[export_path.stem] + '.py')
+    return export_path
+def run_export(export_path, ns, after_run = None):
+    """
+    Run a notebook export in the namespace ns - notebooks it runs with %run are run first, in the same namespace
+        %run paths are relative to the working directory, as in Jupyter, so run from the source folder like the save notebooks
+
+    Args:
+        export_path (Path object): file path to .py export of a notebook
+        ns (dict): namespace shared by the notebooks, as in one Jupyter kernel
+        after_run (function): called with the export path and ns after each notebook run with %run,
+            for example to change settings once a config notebook has run
+
+    Returns:
+        ns
+    """
+    export_path = Path(export_path)
+    source = export_path.read_text(encoding='utf-8')
+    # %run becomes a call, so the notebook and the ones it runs share one namespace
+    source = RUN_LINE.sub(lambda match: f'__run_notebook__({match.group(1)!r})', source)
+    def run_notebook(notebook_path):
+        path = get_export_path(notebook_path, Path.cwd())
+        if path.is_file() == False:
+            raise FileNotFoundError(f'%run {notebook_path} in {export_path.name}: {path} not found from {Path.cwd()}')
+        run_export(path, ns, after_run)
+        if not after_run is None:
+            after_run(path, ns)
+    ns['__run_notebook__'] = run_notebook
+    ns.setdefault('display', lambda *args, **kwargs: None)
+    code = compile(source, str(export_path), 'exec', flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+    result = eval(code, ns)
+    if inspect.iscoroutine(result):
+        # notebook with top-level await, run on its own event loop
+        asyncio.run(result)
+    return ns
@@ -0,0 +1,324 @@
+
+# end-to-end benchmark of the save pipelines, run offline against fixtures replayed by local mock servers
+# each source's save notebook export is run in its own process, with its files written to a temporary home directory,
+# and the run is reported as documents per second, p50/p99 latency per document, peak RSS and peak Chrome processes
+# run from the repository root: python benchmarks/run_pipeline_benchmarks.py --sources cdc_eis_case_studies WHO_fact_sheets
+# the WHO documents, SAMHSA and CDC Stacks pipelines need Chrome and chromedriver, as in a production crawl
+from datetime import datetime
+from pathlib import Path
+import argparse
+import functools
+import inspect
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+BENCHMARK_FOLDER = Path(__file__).resolve().parent
+REPO_FOLDER = BENCHMARK_FOLDER.parent
+sys.path.append(str(BENCHMARK_FOLDER))
+from fixtures import make_fixtures
+from mock_server import MockHosts
+from notebook_loader import run_export
+# function run once for each document by each save notebook - timed for the per-document latency
+DOCUMENT_FUNCTIONS = {
+    'cdc_eis_case_studies': 'save_case_study',
+    'CDC_stacks': 'save_stacks_document',
+    'SAMHSA_reports': 'save_report',
+    'WHO_documents': 'download_document',
+    'WHO_fact_sheets': 'download_fact_sheet',
+}
+# settings for the delay between requests to a host, set to --delay as the mock servers do not need it
+DELAY_SETTINGS = ['DEFAULT_WAIT_TIME', 'SAMHSA_DOWNLOAD_WAIT_TIME']
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+def get_sources():
+    """
+    Returns the sources crawled by the orchestrator, CRAWL_SOURCES from crawl_sources in the common folder
+
+    Returns:
+        list of source dictionaries with name, notebook, host and log
+    """
+    ns = {'__name__': 'crawl_sources'}
+    # %run paths in crawl_sources are relative to the common folder, as in Jupyter
+    cwd = os.getcwd()
+    os.chdir(REPO_FOLDER / 'common')
+    try:
+        for name in ['common_config', 'orchestrator_functions', 'crawl_sources']:
+            run_export(REPO_FOLDER / 'common' / f'{name}.py', ns)
+    finally:
+        os.chdir(cwd)
+    return ns['CRAWL_SOURCES']
+def get_percentile(values, q):
+    """
+    Returns the q percentile of values, nearest rank
+
+    Args:
+        values (list): numbers
+        q (float): percentile between 0 and 100
+
+    Returns:
+        value, or None if values is empty
+    """
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    rank = max(int(-(-q * len(values) // 100)), 1)
+    return values[rank - 1]
+class ProcessSampler:
+    """
+    Samples the memory of this process and its child processes - parse workers, chromedriver and Chrome - in a background thread
+        read from /proc, so the peak process tree RSS and Chrome process count are only measured on Linux
+
+    Args:
+        interval (float): seconds between samples
+    """
+    def __init__(self, interval = 0.2):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_chrome = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def get_process_tree(self):
+        children = {}
+        for stat_path in Path('/proc').glob('[0-9]*/stat'):
+            try:
+                stat = stat_path.read_text()
+            except OSError:
+                continue
+            # name is in brackets and may contain spaces, the parent pid is the second field after it
+            name = stat[stat.find('(') + 1:stat.rfind(')')]
+            ppid = int(stat[stat.rfind(')') + 2:].split()[1])
+            children.setdefault(ppid, []).append((int(stat_path.parent.name), name))
+        tree = [(os.getpid(), 'python')]
+        for pid, _ in tree:
+            tree.extend(children.get(pid, []))
+        return tree
+
+    def sample(self):
+        rss = 0
+        num_chrome = 0
+        for pid, name in self.get_process_tree():
+            try:
+                rss += int(Path(f'/proc/{pid}/statm').read_text().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+            except (OSError, ValueError):
+                continue
+            if name.startswith('chrom') and name != 'chromedriver':
+                num_chrome += 1
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_chrome = max(self.peak_chrome, num_chrome)
+
+    def run(self):
+        while self.stop_event.is_set() == False:
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        if Path('/proc/self/statm').is_file() == True:
+            self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop_event.set()
+        if self.thread.is_alive() == True:
+            self.thread.join()
+        return False
+def time_documents(func, timings):
+    """
+    Returns func wrapped to add the seconds each call takes, and whether it returned a row, to timings
+
+    Args:
+        func (function): function run for each document, sync or async
+        timings (list): list the (seconds, saved) of each call is added to
+
+    Returns:
+        wrapped function
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def timed(*args, **kwargs):
+            start = time.monotonic()
+            row = await func(*args, **kwargs)
+            timings.append((time.monotonic() - start, not row is None))
+            return row
+    else:
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.monotonic()
+            row = func(*args, **kwargs)
+            timings.append((time.monotonic() - start, not row is None))
+            return row
+    timed.benchmark_timed = True
+    return timed
+class OfflineDriverInstaller:
+    """
+    Used in place of chromedriver_autoinstaller when chromedriver is on the PATH, so the benchmark does not download it
+    """
+    @staticmethod
+    def install(*args, **kwargs):
+        return shutil.which('chromedriver')
+def run_source(source, settings):
+    """
+    Run a save notebook against the mock servers, in this process - the benchmark's child process for the source
+
+    Args:
+        source (dict): source from CRAWL_SOURCES
+        settings (dict): url_map from MockHosts.get_url_map() and delay
+
+    Returns:
+        dictionary of results for the source
+    """
+    timings = []
+    document_function = DOCUMENT_FUNCTIONS[source['name']]
+    def after_run(export_path, ns):
+        if export_path.stem.endswith('_config'):
+            # requests go to the mock servers, set before the functions are defined so their defaults use them too
+            for name, value in list(ns.items()):
+                if isinstance(value, str):
+                    for real_url, mock_url in settings['url_map'].items():
+                        if value.startswith(real_url):
+                            ns[name] = mock_url + value[len(real_url):]
+            for name in DELAY_SETTINGS:
+                if name in ns:
+                    ns[name] = settings['delay']
+        if callable(ns.get(document_function)) and not hasattr(ns[document_function], 'benchmark_timed'):
+            ns[document_function] = time_documents(ns[document_function], timings)
+        if 'chromedriver_autoinstaller' in ns and not shutil.which('chromedriver') is None:
+            ns['chromedriver_autoinstaller'] = OfflineDriverInstaller
+    ns = {'__name__': '__main__'}
+    export_path = (REPO_FOLDER / 'common' / source['notebook']).with_suffix('.py').resolve()
+    with ProcessSampler() as sampler:
+        start = time.monotonic()
+        run_export(export_path, ns, after_run)
+        wall_seconds = time.monotonic() - start
+    latencies = [seconds for seconds, saved in timings]
+    num_saved = sum(saved for _, saved in timings)
+    # ru_maxrss is in kilobytes on Linux, used where the process tree can not be sampled
+    peak_rss = max(sampler.peak_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+    stages = ns['METRICS'].summary()['stages'] if 'METRICS' in ns else {}
+    return {'source': source['name'],
+            'documents': num_saved,
+            'attempted': len(timings),
+            'wall_seconds': round(wall_seconds, 3),
+            'docs_per_second': round(num_saved / wall_seconds, 3) if wall_seconds > 0 else None,
+            'p50_seconds': round(get_percentile(latencies, 50), 4) if len(latencies) > 0 else None,
+            'p99_seconds': round(get_percentile(latencies, 99), 4) if len(latencies) > 0 else None,
+            'peak_rss_mb': round(peak_rss / 2 ** 20, 1),
+            'peak_chrome_processes': sampler.peak_chrome if sampler.thread.ident is not None else None,
+            'stage_seconds': {stage: values['seconds'] for stage, values in stages.items()}}
+def run_source_process(source, settings, home_folder, timeout):
+    """
+    Run the benchmark for a source in a child process, from the save notebook's folder as in Jupyter,
+        with a home directory of its own so logs, caches and downloads start empty
+
+    Args:
+        source (dict): source from CRAWL_SOURCES
+        settings (dict): url_map from MockHosts.get_url_map() and delay
+        home_folder (Path object): home directory for the run
+        timeout (float): seconds before the run is stopped
+
+    Returns:
+        dictionary of results for the source, with error set if the run failed
+    """
+    home_folder.mkdir(parents=True, exist_ok=True)
+    notebook_folder = (REPO_FOLDER / 'common' / source['notebook']).resolve().parent
+    env = dict(os.environ, HOME=str(home_folder))
+    command = [sys.executable, str(Path(__file__).resolve()), '--child', source['name'], '--settings', json.dumps(settings)]
+    try:
+        result = subprocess.run(command, cwd=str(notebook_folder), env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'source': source['name'], 'error': f'timed out after {timeout}s'}
+    (home_folder / 'output.txt').write_text(result.stdout + result.stderr)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return {'source': source['name'], 'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'exit code {result.returncode}'}
+def format_value(value, digits = 3):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:.{digits}f}'
+    return str(value)
+def print_results(results, previous = None):
+    """
+    Print a row of results for each source, with the change from a previous run if given
+
+    Args:
+        results (list): results for each source, output of run_source_process()
+        previous (dict): earlier benchmark output, results are compared by source
+
+    Returns:
+
+    """
+    previous_results = {} if previous is None else {result['source']: result for result in previous['results']}
+    print(f"{'source':<22}{'docs':>6}{'docs/s':>9}{'p50 s':>9}{'p99 s':>9}{'peak RSS MB':>13}{'chrome':>8}  change")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['source']:<22}  failed: {result['error']}")
+            continue
+        change = ''
+        before = previous_results.get(result['source'])
+        if not before is None and 'error' not in before and before.get('docs_per_second') and result['docs_per_second'] is not None:
+            change = f"docs/s {100 * (result['docs_per_second'] / before['docs_per_second'] - 1):+.1f}%"
+            if before.get('p99_seconds') and result['p99_seconds'] is not None:
+                change += f", p99 {100 * (result['p99_seconds'] / before['p99_seconds'] - 1):+.1f}%"
+        print(f"{result['source']:<22}{result['documents']:>6}{format_value(result['docs_per_second'], 2):>9}"
+              f"{format_value(result['p50_seconds']):>9}{format_value(result['p99_seconds']):>9}"
+              f"{format_value(result['peak_rss_mb'], 1):>13}{format_value(result['peak_chrome_processes']):>8}  {change}")
+        stage_times = ', '.join(f'{stage} {seconds}s' for stage, seconds in result['stage_seconds'].items())
+        print(f"{'':<22}time in stages: {stage_times}")
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(REPO_FOLDER), capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+def main():
+    sources = get_sources()
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark of the save pipelines')
+    parser.add_argument('--sources', nargs='+', choices=[source['name'] for source in sources], default=[source['name'] for source in sources])
+    parser.add_argument('--documents', type=int, default=20, help='documents for each source')
+    parser.add_argument('--page-size', type=int, default=10, help='documents on each listing page')
+    parser.add_argument('--file-size', type=int, default=256, help='size of each downloaded file in KB')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds before each response')
+    parser.add_argument('--bandwidth', type=float, default=5000, help='KB per second for each response, 0 for no limit')
+    parser.add_argument('--delay', type=float, default=0, help='seconds between requests to a host, in place of DEFAULT_WAIT_TIME')
+    parser.add_argument('--fixtures', type=Path, help='fixture folder, for example pages recorded from the sites, default fixtures generated for the run')
+    parser.add_argument('--timeout', type=float, default=1800, help='seconds before a source run is stopped')
+    parser.add_argument('--output', type=Path, help='file to save the results to as JSON')
+    parser.add_argument('--compare', type=Path, help='results saved by an earlier run, to show the change')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--settings', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if not args.child is None:
+        source = next(source for source in sources if source['name'] == args.child)
+        result = run_source(source, json.loads(args.settings))
+        print(RESULT_PREFIX + json.dumps(result))
+        return
+    with tempfile.TemporaryDirectory(prefix='pipeline_benchmark_') as run_folder:
+        run_folder = Path(run_folder)
+        fixture_folder = args.fixtures
+        if fixture_folder is None:
+            fixture_folder = make_fixtures(run_folder / 'fixtures', args.documents, args.page_size, args.file_size * 1024)
+        bandwidth = args.bandwidth * 1024 if args.bandwidth > 0 else None
+        results = []
+        with MockHosts(fixture_folder, args.latency, bandwidth) as hosts:
+            settings = {'url_map': hosts.get_url_map(), 'delay': args.delay}
+            for source in sources:
+                if source['name'] in args.sources:
+                    print(f"running {source['name']}")
+                    results.append(run_source_process(source, settings, run_folder / 'home' / source['name'], args.timeout))
+    previous = json.loads(args.compare.read_text()) if not args.compare is None else None
+    print_results(results, previous)
+    if not args.output is None:
+        output = {'datetime': datetime.now().isoformat(timespec='seconds'),
+                  'commit': get_git_commit(),
+                  'settings': {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items() if key not in ['child', 'settings', 'output', 'compare']},
+                  'results': results}
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(output, indent=2))
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 
 %run ./cdc_config.ipynb
+%run ../common/common_functions.ipynb
+%run ../common/async_fetch_functions.ipynb
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
@@ -54,70 +56,9 @@ def get_metadata(metapath):
     Returns:
        Pandas dataframe
     """
-    # if metadata exists read in the file, otherwise create an empty dataframe
-    if metapath.is_file() == True:
-        meta_data = pd.read_parquet(metapath)
-    else:
-        meta_data = pd.DataFrame(columns=METADATA_SCHEMA)
+    # if metadata exists read in the file and any checkpoints left by an interrupted run, otherwise create an empty dataframe
+    meta_data = read_metadata_log(metapath)
     return meta_data
-def get_html_response(url, rp, delay_time = DEFAULT_WAIT_TIME):
-    """
-   Function to get the HTML content of a page
-      Also checks that url scraping is permitted under robots.txt file and delay requests
-    
-    Args:
-        url (str): The URL for the page being accessed.
-        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
-        delay_time: default time for delaying before accessing the page, may be specified in robots.txt
-    Returns:
-        requests reponse object
-    """
-    # if crawl_delay defined in robots.txt, use specified value for delay time
-    if not rp.crawl_delay('*') is None:
-        delay_time = rp.crawl_delay('*')
-    time.sleep(delay_time)
-   
-    if rp.can_fetch(url, "*") == False:
-        print(f'Restricted from scraping data from this URL: {url}')
-        return None
-    else:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
-        return response
-# Function to download a file
-def download_file(pdf_url, folder, filename, rp, delay_time = DEFAULT_WAIT_TIME):
-    """
-   Function to download a pdf file from a URL, file downloaded is printed out
-    
-    Args:
-        url (str): The URL for the file to download
-        folder (Path object): file path to save file to
-        filename (str): filename for saved file
-        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
-        delay_time (int): delay time before downloaded the file
-    Returns:
-        name of file if successfully downloaded, None otherwise
-    """
-    # add delay to download
-    if not rp.crawl_delay('*') is None:
-        delay_time = rp.crawl_delay('*')
-    time.sleep(delay_time)
-    
-    if rp.can_fetch(pdf_url, "*") == False:
-        print(f'Restricted from scraping data from this URL: {url}')
-        return None
-    else:  
-        response = requests.get(pdf_url, stream=True)
-        if response.status_code == 200:
-            file_path = folder / filename
-            with open(file_path, 'wb') as file:
-                for chunk in response.iter_content(1024):
-                    file.write(chunk)
-            print(f'Successfully downloaded {filename}')
-            return filename
-        else:
-            print(f'Failed to download {filename}')
-            return None
 def get_update_date(link):
     """
    Returns year that file was updated based on string Updated in [year]
@@ -137,75 +78,36 @@ def get_update_date(link):
             return match.group(1)
     
     return None 
-def find_meta_date(soup):
-    """
-    Search for publication date, based on a list of possible meta data tag
-        if any date is included, return that, otherwise return None
-    
-    Args:
-        soup (obj): BeautifulSoup parsed html
-        
-    Returns:
-        first date found in metadata from specified tags, or None if there is no date
-    
-    """
-    # Define potential meta tag attributes for publication date
-    publication_date_meta_tags = [
-        {'name': 'dc.date'},
-        {'property': 'article:published_time'},
-        {'itemprop': 'datePublished'},
-        {'name': 'publication_date'}
-    ]
-    for attrs in publication_date_meta_tags:
-        tag = soup.find('meta', attrs=attrs)
-        if tag and 'content' in tag.attrs:
-            return tag['content']
-    return None
-
-def extract_meta(url, rp):
-    """
-    extract meta data including author, keywords, description, title, and any publication date
-    
-    Args:
-        url (str): url for webpage
-        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego 
-    Returns:
-        dictionary of metadata 
+async def save_case_study(fetcher, pdf_url, filename, update_date, blob_folder, rp, date_captured = None):
     """
-    html_content = get_html_response(url, rp).text
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    meta_tags = {
-    'author': soup.find('meta', attrs={'name': 'author'}),
-    'keywords': soup.find('meta', attrs={'name': 'keywords'}),
-    'description': soup.find('meta', attrs={'name': 'description'}),
-    'title': soup.find('meta', attrs={'property': 'og:title'})
-    }
-    
-    meta_data = {}
-
-    for key, tag in meta_tags.items():
-        if tag and 'content' in tag.attrs:
-            meta_data[key] = tag['content']
-        else:
-            meta_data[key] = None
-
-    meta_data['date'] = find_meta_date(soup)
-    
-    return meta_data
-def combine_metadata_descriptions(metainfo, description_fields = ['keywords', 'description']):
-    """
-    combine some metadata fields into dictionary
+    Download an EIS case study and create its row of metadata, run as one of many concurrent jobs on the async fetch engine
     
     Args:
-        metainfo (dictionary): dictionary of metadata, output of extract_meta()
-        description_fields (lst): list of strings with keys to extract from metadata
+        fetcher (AsyncFetcher): async fetch engine for the crawl
+        pdf_url (str): url of the case study pdf
+        filename (str): name of the pdf file, used for the title
+        update_date (str): year the case study was last updated, output of get_update_date()
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+        date_captured (datetime): datetime captured in the log for case studies already logged, current time if None
     Returns:
-        dictionary of subset of metadata, for json_additional_metadata field
+        dictionary, row of metadata for the case study, or None if it was not downloaded
     """
-    metadata_descriptions = {}
-    for k in description_fields:
-        if not metainfo[k] is None:
-            metadata_descriptions[k] = metainfo[k]
-    return metadata_descriptions
-    
\ No newline at end of file
+    file_title = re.sub(r'\.pdf', '', filename)
+    blob_info = await fetcher.download(pdf_url, filename, blob_folder)
+    # extract additional metadata if successfully downloaded file
+    if blob_info is None:
+        return None
+    # a pdf has no html meta tags, so author, keywords and description are left empty rather than requesting the file again
+    now = datetime.now()
+    date_time_string = now.strftime(METADATA_DATE_FMT)
+    return {'url': pdf_url, 
+            'datetime_captured': date_time_string if date_captured is None else date_captured,
+            'title': file_title,
+            'author': None,
+            'publication_date': update_date,
+            'license': CDC_LICENSE,
+            'file_type': CASE_STUDY_EXT,
+            'storage_location': blob_info['storage_location'],
+            'datetime_last_updated': date_time_string,
+            'json_additional_metadata': add_blob_metadata({}, blob_info)}
@@ -2,48 +2,57 @@
 %run ./cdc_functions.ipynb
 # set url and filepaths 
 url = CDC_CASE_STUDY_URL
-destination_folder = set_directory(folder = RAW_DATA_BASE_FOLDER, subfolder = CDC_CASE_STUDY_FOLDER)
+# downloaded files are stored once per SHA-256 digest in the blob store shared by every source
+blob_folder = get_blob_folder()
 metadata_filename = METADATA_PREFIX + CDC_CASE_STUDY_FOLDER + '.' + METADATA_EXT
 metapath = get_metapath(METADATA_FOLDER, metadata_filename) 
 cdc_meta_data = get_metadata(metapath)
+url_index = get_url_index(cdc_meta_data)
+# logged update years and capture dates, used to find case studies updated since they were downloaded
+logged_dates = get_logged_values(cdc_meta_data, 'publication_date')
+logged_captured = get_logged_values(cdc_meta_data, 'datetime_captured')
+# new rows are checkpointed to the log as files are downloaded, so an interrupted run resumes from the last checkpoint
+log_writer = MetadataLogWriter(metapath, cdc_meta_data)
+# serve the crawl metrics while the run is going, if METRICS_PORT is set
+metrics_server = start_metrics_server()
 # read robots.txt file
-r = requests.get(CDC_ROBOTS_TXT)
-rp = Protego.parse(r.text)
-html_content = get_html_response(url, rp)
-if not html_content is None:
-    soup = BeautifulSoup(html_content.text, 'html.parser')
-    
-    # Find all links that end with .pdf
-    pdf_links = soup.find_all('a', href=lambda href: href and href.endswith('.pdf'))
+rp = get_robots_policy(CDC_ROBOTS_TXT)
+# case studies are downloaded at the same time on the async fetch engine, within the robots.txt rate limit
+# rows are added to the log as downloads finish
+async with AsyncFetcher(rp) as fetcher:
+    # index page is revalidated against the HTTP cache, so it is only downloaded again if it changed
+    html_content = await fetcher.fetch(url, use_cache = True)
+    pdf_links = []
+    if not html_content is None:
+        soup = parse_html(html_content.text)
+        # Find all links that end with .pdf
+        pdf_links = soup.find_all('a', href=lambda href: href and href.endswith('.pdf'))
     # Download each PDF
+    jobs = []
+    queued_urls = set()
     for link in pdf_links:
         pdf_url = urljoin(url, link['href'])
-        # check that file has not already been downloaded
-        if cdc_meta_data["url"].str.contains(pdf_url).any() == False:
+        # links to the same file later on the page are skipped
+        if url_in_index(queued_urls, pdf_url) == True:
+            continue
+        # "Updated in [year]" next to the link
+        update_date = get_update_date(link)
+        # check that file has not already been downloaded, or has been updated since it was downloaded
+        is_new = url_in_index(url_index, pdf_url) == False
+        is_updated = (is_new == False and REFRESH_UPDATED_FILES == True and not update_date is None
+                      and update_date != logged_dates.get(normalize_url(pdf_url)))
+        if is_updated == True:
+            print(f'Updated since last downloaded: {pdf_url}')
+        if is_new == True or is_updated == True:
             filename = re.sub(r'.*/', '',link['href'])
-            file_title = re.sub(r'\.pdf', '', filename)
-            download_res = download_file(pdf_url, destination_folder, filename, rp)
-            # extract additional metadata if successfully downloaded file
-            if not download_res is None:
-                meta_data_info = extract_meta(pdf_url, rp)
-                now = datetime.now()
-                date_time_string = now.strftime(METADATA_DATE_FMT)
-                update_date = get_update_date(link)
-                cur_metadata = {'url': pdf_url, 
-                                'datetime_captured': date_time_string,
-                                'title': file_title,
-                                'author': meta_data_info['author'],
-                                'publication_date': update_date,
-                                'license': CDC_LICENSE,
-                                'file_type': CASE_STUDY_EXT,
-                                'storage_location': str(destination_folder) + "/" + filename,
-                                'datetime_last_updated': date_time_string,
-                                'json_additional_metadata': combine_metadata_descriptions(meta_data_info)}
-                cur_metadata = pd.DataFrame([cur_metadata])
-                cdc_meta_data = pd.concat([cdc_meta_data, cur_metadata], ignore_index = True)
-       
+            # updated case studies keep the date they were first captured, and replace the logged row
+            date_captured = None if is_new else logged_captured.get(normalize_url(pdf_url))
+            jobs.append((pdf_url, save_case_study(fetcher, pdf_url, filename, update_date, blob_folder, rp, date_captured)))
+            add_to_url_index(queued_urls, pdf_url)
+    await gather_rows(jobs, log_writer)
 
+cdc_meta_data = log_writer.close()
+# network, politeness, parse, browser and log write times for the run
+write_metrics(CDC_CASE_STUDY_FOLDER)
 display(cdc_meta_data)
-cdc_meta_data['json_additional_metadata'] = ''
-cdc_meta_data.to_parquet(metapath)
  
\ No newline at end of file
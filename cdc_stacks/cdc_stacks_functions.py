@@ -1,5 +1,7 @@
 
 %run ./cdc_stacks_config.ipynb
+%run ../common/common_functions.ipynb
+%run ../common/webdriver_functions.ipynb
 from selenium import webdriver
 import chromedriver_autoinstaller
 from selenium.webdriver.chrome.service import Service
@@ -22,7 +24,7 @@ from pathlib import Path
 
 
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse, unquote
 def get_html_response(url, rp, delay_time = 5):
     """
    Function to get the HTML content of a page
@@ -35,16 +37,13 @@ def get_html_response(url, rp, delay_time = 5):
     Returns:
         requests reponse object
     """
-    # if crawl_delay defined in robots.txt, use specified value for delay time
-    if not rp.crawl_delay('*') is None:
-        delay_time = rp.crawl_delay('*')
-    time.sleep(delay_time)
-   
     if rp.can_fetch(url, "*") == False:
         print(f'Restricted from scraping data from this URL: {url}')
         return None
     else:
-        response = requests.get(url)
+        # wait until the delay since the last request to this host has passed - crawl delay or request rate in robots.txt if specified
+        wait_for_host(url, rp, delay_time)
+        response = http_get(url)
         response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
         return response
 def set_directory(folder, subfolder):
@@ -92,11 +91,8 @@ def get_metadata(metapath):
     Returns:
        Pandas dataframe
     """
-    # if metadata exists read in the file, otherwise create an empty dataframe
-    if metapath.is_file() == True:
-        meta_data = pd.read_parquet(metapath)
-    else:
-        meta_data = pd.DataFrame(columns=METADATA_SCHEMA)
+    # if metadata exists read in the file and any checkpoints left by an interrupted run, otherwise create an empty dataframe
+    meta_data = read_metadata_log(metapath)
     return meta_data
 def get_stacks_info(link, rp):
     """
@@ -106,45 +102,10 @@ def get_stacks_info(link, rp):
         url (str): The URL for the page being accessed.
         rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
     Returns:
-        dictionary of metadata 
-    """
-    response = get_html_response(link, rp).text
-    soup = BeautifulSoup(response, 'html.parser')
-    page_text = soup.find('div', class_='stacks-flex').get_text(separator='\n', strip=True)
-    page_date = soup.find('div', class_='col-3 bookHeaderListData').get_text(separator='\n', strip=True)
-    
-    form_element = soup.find('form', id='download-document')
-
-    # Extract the value of the action attribute
-    action_value = form_element['action']
-
-    return page_text, page_date, action_value
-def find_meta_date(soup):
+        page text, page date, download form action url, download form method and download form input values
     """
-    Search for publication date, based on a list of possible meta data tag
-        if any date is included, return that, otherwise return None
-    
-    Args:
-        soup (obj): BeautifulSoup parsed html
-        
-    Returns:
-        first date found in metadata from specified tags, or None if there is no date
-    
-    """
-    # Define potential meta tag attributes for publication date
-    publication_date_meta_tags = [
-        {'name': 'dc.date'},
-        {'property': 'article:published_time'},
-        {'itemprop': 'datePublished'},
-        {'name': 'publication_date'}
-    ]
-    for attrs in publication_date_meta_tags:
-        tag = soup.find('meta', attrs=attrs)
-        if tag and 'content' in tag.attrs:
-            return tag['content']
-    return None
-
-# extract meta data including author, keywords, description, title, and any publication date
+    # same page as extract_meta(), read from the page cache
+    return get_page_fields(link, rp, parse_stacks_info)
 def extract_meta(url, rp):
     """
     extract meta data including author, keywords, description, title, and any publication date
@@ -155,27 +116,8 @@ def extract_meta(url, rp):
     Returns:
         dictionary of metadata 
     """
-    html_content = get_html_response(url, rp).text
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    meta_tags = {
-    'author': soup.find('meta', attrs={'name': 'author'}),
-    'keywords': soup.find('meta', attrs={'name': 'keywords'}),
-    'description': soup.find('meta', attrs={'name': 'description'}),
-    'title': soup.find('meta', attrs={'property': 'og:title'})
-    }
-    
-    meta_data = {}
-
-    for key, tag in meta_tags.items():
-        if tag and 'content' in tag.attrs:
-            meta_data[key] = tag['content']
-        else:
-            meta_data[key] = None
-
-    meta_data['date'] = find_meta_date(soup)
-    
-    return meta_data
+    # page is requested once per run and its meta tags parsed once, other extractors reading it use the cached copy
+    return dict(get_page_fields(url, rp, parse_meta))
 def find_element_with_retry(driver, by, value, retries=3, delay=1):
     """
    Function to find element with retry mechanism - if stale element attempts to find it again and adds a delay
@@ -190,51 +132,146 @@ def find_element_with_retry(driver, by, value, retries=3, delay=1):
     Returns:
        element 
     """
-    for i in range(retries):
-        try:
-            element = driver.find_element(by, value)
-            return element
-        except (StaleElementReferenceException, TimeoutException, NoSuchElementException) as e:
-            if i < retries - 1:
-                time.sleep(delay)
-                continue
-            else:
-                #print(f"Encountered an error: {e}")
-                return None
+    with time_stage('browser', 'browser_seconds', action='find'):
+        for i in range(retries):
+            try:
+                element = driver.find_element(by, value)
+                return element
+            except (StaleElementReferenceException, TimeoutException, NoSuchElementException) as e:
+                if i < retries - 1:
+                    METRICS.inc('browser_retries_total', action='find')
+                    time.sleep(delay)
+                    continue
+                else:
+                    #print(f"Encountered an error: {e}")
+                    return None
                 
-def download_stacks(url, directory):
+def get_download_filename(response, url):
     """
-   Function to download a file from a URL - finds download button and download files to specified directory
+   Returns name of downloaded file, from the Content-Disposition header if there is one, otherwise from the url
     
     Args:
-        url (str): The URL for the file to download
-        directory (Path object): file path to save file to
+        response (obj): requests response object
+        url (str): url the file was downloaded from
     Returns:
-        
+        filename (str)
     """
-    # Configure Chrome options to set the download directory
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument('--headless')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    prefs = {"download.default_directory": directory}
-    chrome_options.add_experimental_option("prefs", prefs)
-
-    # Initialize the Chrome webdriver
-    new_driver = webdriver.Chrome(options=chrome_options)
-
-    # Open the webpage
-    new_driver.get(url)
+    content_disposition = response.headers.get('Content-Disposition', '')
+    filename = re.findall(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)\"?", content_disposition, flags=re.IGNORECASE)
+    if len(filename) > 0:
+        return re.sub(r'^.*/', '', unquote(filename[-1]))
+    return re.sub(r'^.*/', '', urlparse(response.url or url).path)
+def download_stacks_http(url, blob_folder, rp, action_value, form_method = 'get', form_inputs = None, delay_time = DEFAULT_WAIT_TIME):
+    """
+   Function to download a file by submitting the download form over HTTP, without a browser
+      the file is streamed into the blob store in DOWNLOAD_CHUNK_SIZE chunks
+    
+    Args:
+        url (str): The URL for the document page
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+        action_value (str): action url of the download form, output of get_stacks_info()
+        form_method (str): method of the download form, output of get_stacks_info()
+        form_inputs (dict): input values of the download form, output of get_stacks_info()
+        delay_time: default time for delaying before accessing the page, may be specified in robots.txt
+    Returns:
+        dictionary of stored file details, output of stream_to_blob(), None if not downloaded
+    """
+    form_url = urljoin(url, action_value)
+    if rp.can_fetch(form_url, "*") == False:
+        print(f'Restricted from scraping data from this URL: {form_url}')
+        return None
+    # wait until the delay since the last request to this host has passed - crawl delay or request rate in robots.txt if specified
+    wait_for_host(form_url, rp, delay_time)
 
-    # Wait for the download button to be clickable
-    download_button = find_element_with_retry(new_driver, By.ID, "download-document-submit")
-    download_button.click()
+    if form_method == 'post':
+        response = get_http_session().post(form_url, data=form_inputs, stream=True, timeout=HTTP_TIMEOUT)
+    else:
+        response = http_get(form_url, stream=True, params=form_inputs)
+    with response:
+        # an html page instead of the file means the form needs a browser
+        if response.status_code != 200 or response.headers.get('Content-Type', '').startswith('text/html'):
+            return None
+        filename = get_download_filename(response, form_url)
+        return stream_to_blob(response, filename, blob_folder)
+def download_stacks(url, blob_folder, driver_pool, rp = None, stacks_info = None):
+    """
+   Function to download a file from a URL - submits the download form over HTTP if the form details are given,
+      and falls back to finding the download button in a browser if that fails
+    
+    Args:
+        url (str): The URL for the file to download
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        driver_pool (WebDriverPool): pool of Chrome webdrivers, a driver is borrowed if the browser is used
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego, optional
+        stacks_info (tuple): output of get_stacks_info() for the page, optional
+    Returns:
+        dictionary of stored file details, output of stream_to_blob() or store_file_blob(), None if not downloaded
+    """
+    if not stacks_info is None and not rp is None:
+        try:
+            blob_info = download_stacks_http(url, blob_folder, rp, stacks_info[2], stacks_info[3], stacks_info[4])
+            if not blob_info is None:
+                return blob_info
+        except requests.exceptions.RequestException as e:
+            print(f'HTTP download failed, using browser: {e}')
+    return download_stacks_browser(url, blob_folder, driver_pool)
+def download_stacks_browser(url, blob_folder, driver_pool):
+    """
+   Function to download a file from a URL - finds download button and downloads the file, which is then moved into the blob store
+    
+    Args:
+        url (str): The URL for the file to download
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        driver_pool (WebDriverPool): pool of Chrome webdrivers, a driver is borrowed for the download
+    Returns:
+        dictionary of stored file details, output of store_file_blob()
+        raises TimeoutError if the download did not finish, so the download workers count it as failed
+    """
+    # download into a directory for this task only, so the new file can be found
+    with task_download_directory(blob_folder) as task_directory:
+        # borrow a driver from the pool, downloading to the task directory
+        with driver_pool.driver(download_directory = task_directory) as new_driver:
+            # Open the webpage
+            browser_get(new_driver, url)
 
-    # Wait for the download to complete (you may need to adjust the time.sleep duration)
-    time.sleep(10)
+            # Wait for the download button to be clickable
+            download_button = find_element_with_retry(new_driver, By.ID, "download-document-submit")
+            download_button.click()
 
-    # Close the webdriver
-    new_driver.quit()
+            # Wait for the download to complete - temporary .crdownload file is gone and the file size is stable
+            filename = wait_for_download(task_directory)
+        if filename is None:
+            raise TimeoutError(f'Download did not finish: {url}')
+        blob_info = store_file_blob(task_directory / filename, blob_folder)
+    print(f'Downloaded: {filename}')
+    return blob_info
+def skip_to_page(driver, target_page, wait_time = DEFAULT_WAIT_TIME):
+    """
+   Click through search result pages without processing them, used to resume a crawl at the page after the last fully processed page
+    
+    Args:
+        driver (obj): webdriver Chrome object, on the first page of search results
+        target_page (int): page to move to, pages start at 1
+        wait_time (int): delay after each click, default DEFAULT_WAIT_TIME
+        
+    Returns:
+       page number reached (int), lower than target_page if there are fewer pages
+    """
+    page = 1
+    while page < target_page:
+        try:
+            next_button = WebDriverWait(driver, 15).until(
+                EC.element_to_be_clickable((By.ID, 'next'))
+            )
+        except TimeoutException:
+            break
+        next_button.click()
+        time.sleep(wait_time)
+        page = page + 1
+    if page > 1:
+        print(f'Resuming from page: {page}')
+    return page
 def filter_stacks_search(driver, collection_name = "", dataset_type = "", language = "", date_start = "", date_end = ""):
     """
    Set document type, collection, date range, and language in cdc stacks advanced filtering for documents 
@@ -294,4 +331,38 @@ def combine_metadata_descriptions(metainfo, description_fields = ['keywords', 'd
     for k in description_fields:
         if not metainfo[k] is None:
             metadata_descriptions[k] = metainfo[k]
-    return metadata_descriptions
\ No newline at end of file
+    return metadata_descriptions
+def save_stacks_document(stack_link, blob_folder, driver_pool, rp):
+    """
+    Download a CDC Stacks document and create its row of metadata, run by the download workers
+    
+    Args:
+        stack_link (str): url of the document page
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        driver_pool (WebDriverPool): pool of Chrome webdrivers, a driver is borrowed if the browser is used
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+    Returns:
+        dictionary, row of metadata for the document, or None if it was not downloaded
+    """
+    # get additional metadata, including the download form used to download the document
+    stacks_meta = extract_meta(stack_link, rp)
+    stacks_info = get_stacks_info(stack_link, rp)
+    # download document - over HTTP, falling back to the browser
+    blob_info = download_stacks(stack_link, blob_folder, driver_pool, rp, stacks_info)
+    if blob_info is None:
+        # not added to the log, so the document is tried again on the next run
+        return None
+    # set current date/time
+    now = datetime.now()
+    date_time_string = now.strftime(METADATA_DATE_FMT)
+    cur_file_ext = re.sub(r'^.*\.', '', blob_info['file_name'])
+    return {'url':stack_link, 
+            'datetime_captured': date_time_string,
+            'title': stacks_info[0],
+            'author': stacks_meta['author'],
+            'publication_date': stacks_info[1],
+            'license': CDC_LICENSE,
+            'file_type': cur_file_ext,
+            'storage_location': blob_info['storage_location'],
+            'datetime_last_updated': date_time_string,
+            'json_additional_metadata': add_blob_metadata(combine_metadata_descriptions(stacks_meta), blob_info)}
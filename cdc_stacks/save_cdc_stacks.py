@@ -5,31 +5,39 @@
 # used to filter files up to current date
 now = datetime.now()
 current_date = now.strftime("%m/%d/%Y")
+# serve the crawl metrics while the run is going, if METRICS_PORT is set
+metrics_server = start_metrics_server()
 # read robots.txt file
-r = requests.get(CDC_ROBOTS_TXT)
-rp = Protego.parse(r.text)
+rp = get_robots_policy(CDC_ROBOTS_TXT)
 # set url and filepaths to directory for saving data and metadata
 url = CDC_STACKS_URL
-destination_folder = set_directory(folder = RAW_DATA_BASE_FOLDER, subfolder = CDC_STACKS_FOLDER)
-directory = str(destination_folder)
+# downloaded files are stored once per SHA-256 digest in the blob store shared by every source
+blob_folder = get_blob_folder()
 metadata_filename = METADATA_PREFIX + CDC_STACKS_FOLDER + '.' + METADATA_EXT
 metapath = get_metapath(METADATA_FOLDER, metadata_filename) 
 meta_data = get_metadata(metapath)
+url_index = get_url_index(meta_data)
+# new rows are checkpointed to the log as files are downloaded, so an interrupted run resumes from the last checkpoint
+log_writer = MetadataLogWriter(metapath, meta_data)
+# documents are downloaded by a pool of download workers while the main thread moves through the search results
+pipeline = DownloadPipeline(log_writer, url_index)
+# last fully processed page for each collection from previous runs, so an interrupted crawl resumes from the next page
+state_path = get_crawl_state_path(METADATA_FOLDER, CDC_STACKS_FOLDER)
+crawl_state = load_crawl_state(state_path)
 # Set up Selenium with headless Chrome
-options = webdriver.ChromeOptions()
-options.add_argument('--headless')
-options.add_argument('--no-sandbox')
-options.add_argument('--disable-dev-shm-usage')
+# drivers are shared from a pool - one for the search results, others are reused for downloading documents
 chromedriver_autoinstaller.install()
-
-driver = webdriver.Chrome(options=options)
+driver_pool = WebDriverPool()
+driver = driver_pool.acquire()
 # CDC Stacks has 10,000s (or 100,000s) of documents, we are not downloading all of these
 # Just downloading a subset of document types and/or collections - reports, guidelines and recommendations, Stephen B. Thacker CDC Library collection, Preventing Chronic Disease
 # filter for these types of files, and click through all pages to download files and collect related info
 for i in range(3, len(CDC_STACKS_COLLECTIONS)):
-    page = 1
+    # end date is left out of the key as it is always the current date
+    filter_key = get_filter_key(CDC_STACKS_COLLECTIONS[i], CDC_STACKS_DOCUMENT_TYPE[i], CDC_LANGUAGE, CDC_STACKS_START_DATE[i])
+    start_page = get_resume_page(crawl_state, filter_key, CDC_STACKS_ORDERING)
     # Load the page
-    driver.get(url)
+    browser_get(driver, url)
     # filter to specified document types
     filter_stacks_search(driver,
                          collection_name = CDC_STACKS_COLLECTIONS[i],
@@ -42,6 +50,8 @@ for i in range(3, len(CDC_STACKS_COLLECTIONS)):
     search_button.click()
     driver.implicitly_wait(10)
     time.sleep(2)
+    # move to the page after the last fully processed page
+    page = skip_to_page(driver, start_page)
     
     while True:
         driver.implicitly_wait(10)
@@ -53,30 +63,12 @@ for i in range(3, len(CDC_STACKS_COLLECTIONS)):
                 if not stack_links is None:
                     stack_link = stack_links.get_attribute('href')
                     # check that document has not already be downloaded
-                    if meta_data["url"].str.contains(stack_link).any() == False and not stack_link is None:
-                        # download document
-                        download_stacks(stack_link, directory)
-                        # get additional metadata
-                        stacks_meta = extract_meta(stack_link, rp)
-                        stacks_info = get_stacks_info(stack_link, rp)
-                        # set current date/time
-                        now = datetime.now()
-                        date_time_string = now.strftime(METADATA_DATE_FMT)
-                        download_filename = re.sub(r'^.*/', '', stacks_info[2])
-                        cur_file_ext = re.sub(r'^.*\.', '', download_filename)
-                        cur_metadata = {'url':stack_link, 
-                                        'datetime_captured': date_time_string,
-                                        'title': stacks_info[0],
-                                        'author': stacks_meta['author'],
-                                        'publication_date': stacks_info[1],
-                                        'license': CDC_LICENSE,
-                                        'file_type': cur_file_ext,
-                                        'storage_location': directory + "/" + download_filename,
-                                        'datetime_last_updated': date_time_string,
-                                        'json_additional_metadata': combine_metadata_descriptions(stacks_meta)}
-                        cur_metadata = pd.DataFrame([cur_metadata])
-                        meta_data = pd.concat([meta_data, cur_metadata], ignore_index = True)
+                    if not stack_link is None and url_in_index(url_index, stack_link) == False:
+                        # queue the document - metadata extracted and file downloaded by a download worker
+                        pipeline.submit(stack_link, save_stacks_document, stack_link, blob_folder, driver_pool, rp)
                         
+            # once the page's documents are downloaded, save their rows and then record the page as processed
+            pipeline.when_page_done(checkpoint_page, log_writer, state_path, crawl_state, filter_key, CDC_STACKS_ORDERING, page)
             # click next button to move to the next page of documents
             next_button = WebDriverWait(driver, 15).until(
                 EC.element_to_be_clickable((By.ID, 'next'))
@@ -89,15 +81,25 @@ for i in range(3, len(CDC_STACKS_COLLECTIONS)):
         except StaleElementReferenceException:
             print("Encountered a stale element reference. Retrying...")
             continue
+        except TimeoutException:
+            # no next button - all pages have been processed
+            print("No more pages to load")
+            pipeline.when_page_done(checkpoint_page, log_writer, state_path, crawl_state, filter_key, CDC_STACKS_ORDERING, page, completed = True)
+            break
         except Exception as e:
             print(f"No more pages to load or encountered an error: {e}")
             break
 
-driver.quit()
+driver_pool.release(driver)
+# wait for the queued downloads before closing the log
+pipeline.close()
+driver_pool.close()
 
 
+meta_data = log_writer.close()
+# network, politeness, parse, browser and log write times for the run
+write_metrics(CDC_STACKS_FOLDER)
 display(meta_data)
 
 
-meta_data.to_parquet(metapath, index = False)
  
\ No newline at end of file
@@ -0,0 +1,238 @@
+
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit
+from pathlib import Path
+import aiofiles
+import aiohttp
+import asyncio
+import hashlib
+import os
+import requests
+import time
+import uuid
+class AsyncFetcher:
+    """
+    asyncio fetch engine for scrapers that do not need a browser - many pages and files can be in flight at once
+        requests to each host are limited to host_concurrency at a time, and each request still waits for
+        its slot from HOST_RATE_LIMITER, so the crawl delay or request rate in robots.txt holds
+        used as an async context manager, so the client session is closed when the crawl finishes
+
+    Args:
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the host using Protego
+        delay_time: default time between requests to a host, used if not specified in robots.txt
+        host_concurrency (int): maximum number of requests in flight to each host
+        max_connections (int): maximum number of open connections across all hosts
+        retries (int): retries for connection errors and HTTP_RETRY_STATUSES responses, with backoff
+    """
+    def __init__(self, rp, delay_time = DEFAULT_WAIT_TIME, host_concurrency = ASYNC_HOST_CONCURRENCY,
+                 max_connections = ASYNC_MAX_CONNECTIONS, retries = HTTP_RETRIES):
+        self.rp = rp
+        self.delay_time = delay_time
+        self.host_concurrency = host_concurrency
+        self.max_connections = max_connections
+        self.retries = retries
+        self.host_semaphores = {}
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.host_concurrency)
+        timeout = aiohttp.ClientTimeout(sock_connect=HTTP_TIMEOUT[0], sock_read=HTTP_TIMEOUT[1])
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers={'User-Agent': HTTP_USER_AGENT})
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    def get_host_semaphore(self, url):
+        """
+        Returns semaphore limiting the number of requests in flight to the url's host
+
+        Args:
+            url (str): url about to be requested
+
+        Returns:
+            asyncio Semaphore
+        """
+        host = urlsplit(url).netloc.lower()
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return self.host_semaphores[host]
+
+    async def get(self, url, headers = None):
+        """
+        Send a GET request, waiting for the host's rate limit before each attempt and retrying with backoff
+            the caller must release the response
+
+        Args:
+            url (str): The URL to request
+            headers (dict): request headers, optional
+
+        Returns:
+            aiohttp ClientResponse object
+        """
+        host = get_metrics_host(url)
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                METRICS.inc('http_retries_total', host=host)
+            await wait_for_host_async(url, self.rp, self.delay_time)
+            start = time.monotonic()
+            try:
+                response = await self.session.get(url, headers=headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                observe_stage('network', time.monotonic() - start)
+                METRICS.inc('http_errors_total', host=host, error=type(e).__name__)
+                if attempt == self.retries:
+                    raise
+            else:
+                observe_stage('network', time.monotonic() - start)
+                METRICS.observe('http_request_seconds', time.monotonic() - start, host=host)
+                METRICS.inc('http_requests_total', host=host, status=response.status)
+                if response.status not in HTTP_RETRY_STATUSES or attempt == self.retries:
+                    return response
+                response.release()
+            await asyncio.sleep(HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+    async def fetch(self, url, use_cache = False, cache_folder = HTTP_CACHE_FOLDER):
+        """
+        Get a page - also checks that url scraping is permitted under robots.txt file
+
+        Args:
+            url (str): The URL for the page being accessed.
+            use_cache (bool): default False, if True the page is revalidated against the on-disk HTTP cache and not downloaded again if unchanged
+            cache_folder (str): file path to cache folder, relative to the home directory
+
+        Returns:
+            requests response object, from_cache attribute is True if the body was read from the cache,
+            or None if the page can not be scraped
+        """
+        if self.rp.can_fetch(url, "*") == False:
+            print(f'Restricted from scraping data from this URL: {url}')
+            return None
+        cache_meta = None
+        if use_cache == True:
+            cache_meta = await asyncio.to_thread(read_http_cache, url, cache_folder)
+        async with self.get_host_semaphore(url):
+            response = await self.get(url, headers=get_conditional_headers(cache_meta))
+            start = time.monotonic()
+            try:
+                content = await response.read()
+            finally:
+                response.release()
+                observe_stage('network', time.monotonic() - start)
+        METRICS.inc('bytes_downloaded_total', len(content), host=get_metrics_host(url))
+        if response.status == 304 and cache_meta is not None:
+            METRICS.inc('http_cache_hits_total', host=get_metrics_host(url))
+            body_path, _ = get_http_cache_paths(url, cache_folder)
+            async with aiofiles.open(body_path, 'rb') as file:
+                return get_cached_response(url, cache_meta, await file.read())
+        # same response object as the sync helpers return, so the scrapers' parsing code is shared
+        page_response = requests.Response()
+        page_response.status_code = response.status
+        page_response.url = str(response.url)
+        page_response.headers = CaseInsensitiveDict(response.headers)
+        page_response.encoding = response.charset
+        page_response._content = content
+        page_response.from_cache = False
+        page_response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
+        if use_cache == True:
+            await asyncio.to_thread(write_http_cache, url, page_response, cache_folder)
+        return page_response
+
+    async def download(self, url, file_name, blob_folder, chunk_size = DOWNLOAD_CHUNK_SIZE):
+        """
+        Download a file into the blob store, streamed to disk in chunks with the SHA-256 digest computed as it is written
+            also checks that url scraping is permitted under robots.txt file
+
+        Args:
+            url (str): The URL for the file to download
+            file_name (str): name of the file, used for its extension and printed out
+            blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+            chunk_size (int): number of bytes to read and write at a time
+
+        Returns:
+            dictionary of stored file details, output of get_blob_info(), None if not downloaded
+        """
+        if self.rp.can_fetch(url, "*") == False:
+            print(f'Restricted from scraping data from this URL: {url}')
+            return None
+        incoming_path = Path(blob_folder) / '.incoming' / uuid.uuid4().hex
+        incoming_path.parent.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        num_bytes = 0
+        async with self.get_host_semaphore(url):
+            response = await self.get(url)
+            try:
+                if response.status != 200:
+                    print(f'Failed to download {file_name}')
+                    return None
+                start = time.monotonic()
+                try:
+                    async with aiofiles.open(incoming_path, 'wb') as file:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            await file.write(chunk)
+                            hasher.update(chunk)
+                            num_bytes += len(chunk)
+                        await file.flush()
+                        await asyncio.to_thread(os.fsync, file.fileno())
+                except BaseException:
+                    # leave no partial file behind if the download fails
+                    if incoming_path.exists() == True:
+                        incoming_path.unlink()
+                    raise
+                seconds = time.monotonic() - start
+                observe_stage('network', seconds)
+                METRICS.inc('bytes_downloaded_total', num_bytes, host=get_metrics_host(url))
+                METRICS.observe('download_seconds', seconds, host=get_metrics_host(url))
+            finally:
+                response.release()
+        digest = hasher.hexdigest()
+        blob_path = await asyncio.to_thread(add_blob, incoming_path, digest, file_name, blob_folder)
+        print(f"Downloaded: {file_name} ({format_transfer(num_bytes, seconds)})")
+        return get_blob_info(blob_path, digest, file_name, num_bytes)
+async def write_text_async(file_path, text):
+    """
+    Write text to a file without blocking the event loop - written to a temporary file first and then renamed
+
+    Args:
+        file_path (Path object): file path to write to
+        text (str): text to write
+
+    Returns:
+
+    """
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    async with aiofiles.open(tmp_path, 'w', encoding='utf-8') as file:
+        await file.write(text)
+    os.replace(tmp_path, file_path)
+async def gather_rows(jobs, log_writer):
+    """
+    Run download jobs at the same time and add the rows they return to the metadata log as they finish
+        jobs return None if there is nothing to log, a job that raises an exception does not stop the others
+
+    Args:
+        jobs (list): list of tuples of url and job coroutine, the coroutine returns a row of metadata or None
+        log_writer (MetadataLogWriter): log that rows are added to
+
+    Returns:
+        dictionary with number of jobs that logged a row, did not log a row, and failed
+    """
+    async def run_job(url, job):
+        try:
+            return url, await job, None
+        except Exception as e:
+            return url, None, e
+
+    counts = {'logged': 0, 'skipped': 0, 'failed': 0}
+    for next_job in asyncio.as_completed([run_job(url, job) for url, job in jobs]):
+        url, row, error = await next_job
+        if error is not None:
+            print(f'Download failed: {url}: {error}')
+            counts['failed'] += 1
+        elif row is None:
+            counts['skipped'] += 1
+        else:
+            log_writer.append(row)
+            counts['logged'] += 1
+    print(f"Logged: {counts['logged']}, skipped: {counts['skipped']}, failed: {counts['failed']}")
+    return counts
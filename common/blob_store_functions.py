@@ -0,0 +1,139 @@
+
+from pathlib import Path
+import hashlib
+import shutil
+import uuid
+def get_blob_folder(folder = None):
+    """
+   Returns full file path to the content-addressed blob store, shared by every source. If folder does not exist it is created
+
+    Args:
+        folder (str): file path to raw data folder, relative to the home directory, default RAW_DATA_BASE_FOLDER
+
+    Returns:
+       Path file path
+    """
+    if folder is None:
+        folder = RAW_DATA_BASE_FOLDER
+    blob_folder = Path.home() / folder / BLOB_FOLDER
+    blob_folder.mkdir(parents=True, exist_ok=True)
+    return blob_folder
+def get_blob_path(digest, file_name, blob_folder):
+    """
+   Returns file path of the blob for a digest - blobs are spread over subfolders by the first two characters of the digest,
+      and keep the extension of the downloaded file so the file type can still be seen
+
+    Args:
+        digest (str): SHA-256 hex digest of the file contents
+        file_name (str): name of the downloaded file, used for the extension
+        blob_folder (Path object): output of get_blob_folder()
+
+    Returns:
+       Path file path
+    """
+    ext = Path(file_name).suffix.lower()
+    return Path(blob_folder) / digest[:2] / (digest + ext)
+def get_blob_info(blob_path, digest, file_name, num_bytes):
+    """
+   Returns details of a stored file, used for the storage_location and json_additional_metadata of its log row
+
+    Args:
+        blob_path (Path object): output of get_blob_path()
+        digest (str): SHA-256 hex digest of the file contents
+        file_name (str): name of the downloaded file
+        num_bytes (int): size of the file
+
+    Returns:
+        dictionary with keys file_name, storage_location, sha256 and num_bytes
+    """
+    return {'file_name': file_name,
+            'storage_location': str(blob_path),
+            'sha256': digest,
+            'num_bytes': num_bytes}
+def add_blob(tmp_path, digest, file_name, blob_folder):
+    """
+   Move a fully written file into the blob store - if a blob with the same digest is already stored,
+      the file is removed instead, so there is one copy of each file however many urls it was downloaded from
+
+    Args:
+        tmp_path (Path object): file path of the written file
+        digest (str): SHA-256 hex digest of the file contents
+        file_name (str): name of the downloaded file
+        blob_folder (Path object): output of get_blob_folder()
+
+    Returns:
+        Path to the blob
+    """
+    blob_path = get_blob_path(digest, file_name, blob_folder)
+    if blob_path.is_file() == True:
+        Path(tmp_path).unlink()
+        print(f'Already stored: {file_name} ({digest[:12]})')
+    else:
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        # a rename if the file is on the same file system, otherwise a copy
+        shutil.move(str(tmp_path), str(blob_path))
+    return blob_path
+def stream_to_blob(response, file_name, blob_folder = None, chunk_size = DOWNLOAD_CHUNK_SIZE):
+    """
+   Stream body of a response into the blob store, the SHA-256 digest is computed as the chunks are written
+
+    Args:
+        response (obj): requests response object, requested with stream=True
+        file_name (str): name of the downloaded file, used for the extension and printed out
+        blob_folder (Path object): output of get_blob_folder(), default blob store under RAW_DATA_BASE_FOLDER
+        chunk_size (int): number of bytes to read and write at a time
+
+    Returns:
+        dictionary, output of get_blob_info()
+    """
+    if blob_folder is None:
+        blob_folder = get_blob_folder()
+    # written next to the blobs, so the move into place is a rename on the same file system
+    incoming_path = Path(blob_folder) / '.incoming' / uuid.uuid4().hex
+    incoming_path.parent.mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    num_bytes, seconds = stream_to_file(response, incoming_path, chunk_size, hasher)
+    digest = hasher.hexdigest()
+    blob_path = add_blob(incoming_path, digest, file_name, blob_folder)
+    print(f"Downloaded: {file_name} ({format_transfer(num_bytes, seconds)})")
+    return get_blob_info(blob_path, digest, file_name, num_bytes)
+def store_file_blob(file_path, blob_folder = None, chunk_size = DOWNLOAD_CHUNK_SIZE):
+    """
+   Move a file already on disk, for example a browser download, into the blob store
+
+    Args:
+        file_path (Path object): file path of the downloaded file
+        blob_folder (Path object): output of get_blob_folder(), default blob store under RAW_DATA_BASE_FOLDER
+        chunk_size (int): number of bytes to read at a time when hashing
+
+    Returns:
+        dictionary, output of get_blob_info()
+    """
+    if blob_folder is None:
+        blob_folder = get_blob_folder()
+    file_path = Path(file_path)
+    hasher = hashlib.sha256()
+    num_bytes = 0
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            hasher.update(chunk)
+            num_bytes += len(chunk)
+    digest = hasher.hexdigest()
+    blob_path = add_blob(file_path, digest, file_path.name, blob_folder)
+    return get_blob_info(blob_path, digest, file_path.name, num_bytes)
+def add_blob_metadata(additional_metadata, blob_info):
+    """
+   Returns json_additional_metadata with the digest and original file name of the stored file added,
+      so the log maps each url to its blob
+
+    Args:
+        additional_metadata (dict): output of combine_metadata_descriptions()
+        blob_info (dict): output of stream_to_blob() or store_file_blob()
+
+    Returns:
+        dictionary
+    """
+    additional_metadata = dict(additional_metadata or {})
+    additional_metadata['sha256'] = blob_info['sha256']
+    additional_metadata['file_name'] = blob_info['file_name']
+    return additional_metadata
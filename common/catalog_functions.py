@@ -0,0 +1,157 @@
+
+from pathlib import Path
+import shutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+# partition columns of the catalog, as hive style folders source=<source>/capture_month=<YYYY-MM>
+# source is dictionary encoded, like license and file_type in the logs
+CATALOG_PARTITIONING = ds.partitioning(pa.schema([('source', pa.dictionary(pa.int32(), pa.string())), ('capture_month', pa.string())]),
+                                       flavor='hive', dictionaries='infer')
+def get_catalog_folder(metadata_folder = None):
+    """
+   Returns full file path to the metadata catalog, the catalog is in the folder with the metadata logs
+
+    Args:
+        metadata_folder (str): file path to folder with the metadata logs, relative to the home directory, default METADATA_FOLDER in the source config
+
+    Returns:
+       Path file path
+    """
+    if metadata_folder is None:
+        metadata_folder = METADATA_FOLDER
+    return Path.home() / metadata_folder / CATALOG_FOLDER
+def get_source_name(metapath):
+    """
+   Returns name of the source a metadata log is for - the log file name without its log_ or logs_ prefix,
+      same as the source name in CRAWL_SOURCES, the source's folder name
+
+    Args:
+        metapath (Path object): file path to metadata file
+
+    Returns:
+       source name (str)
+    """
+    return Path(metapath).stem.split('_', 1)[-1]
+def get_capture_month(meta_table):
+    """
+   Returns capture month of each row, in YYYY-MM format, used to partition the catalog
+
+    Args:
+        meta_table (pyarrow Table): metadata log, output of get_metadata_table()
+
+    Returns:
+        pyarrow array of strings, null where datetime_captured is missing
+    """
+    return pc.strftime(meta_table["datetime_captured"], format='%Y-%m')
+def recover_catalog_source(source_folder, old_folder):
+    """
+   Clean up after a write of a source to the catalog that was interrupted during the swap in write_catalog_source()
+      if the source's partitions were moved aside but the new ones not moved in, the old partitions are put back,
+      otherwise the old partitions left behind are deleted
+
+    Args:
+        source_folder (Path object): folder with the source's partitions
+        old_folder (Path object): folder the source's partitions are moved to during the swap
+
+    Returns:
+
+    """
+    if old_folder.is_dir() == False:
+        return
+    if source_folder.is_dir() == False:
+        print(f'Restoring catalog partitions left in {old_folder.name} by an interrupted write')
+        old_folder.rename(source_folder)
+    else:
+        shutil.rmtree(old_folder)
+def write_catalog_source(meta_data, source, catalog_folder):
+    """
+   Replace the rows for a source in the catalog with the metadata log - written to a temporary folder first,
+      and swapped in for the source's partitions once complete, so queries never see a partly written source
+      the swap is two renames, old partitions out and new ones in, not one atomic step - a query between them
+      finds no rows for the source, and if the write is interrupted there, the old partitions are put back
+      by recover_catalog_source() on the next write
+
+    Args:
+        meta_data (pandas dataframe or pyarrow Table): full metadata log for the source, output of MetadataLogWriter.close()
+        source (str): name of the source, output of get_source_name()
+        catalog_folder (Path object): output of get_catalog_folder()
+
+    Returns:
+        Path to the source's partitions
+    """
+    catalog_folder = Path(catalog_folder)
+    source_folder = catalog_folder / f'source={source}'
+    # named after the source, so folders left by an interrupted write are found on the next write
+    # folders starting with . are not read as part of the catalog
+    tmp_folder = catalog_folder / f'.tmp-source={source}'
+    old_folder = catalog_folder / f'.old-source={source}'
+    recover_catalog_source(source_folder, old_folder)
+    if tmp_folder.is_dir() == True:
+        shutil.rmtree(tmp_folder)
+    meta_table = get_metadata_table(meta_data)
+    table = meta_table.append_column('capture_month', get_capture_month(meta_table))
+    try:
+        # created first, so a source with no rows still replaces its old partitions
+        tmp_folder.mkdir(parents=True)
+        ds.write_dataset(table, tmp_folder, format='parquet', partitioning=['capture_month'], partitioning_flavor='hive',
+                         basename_template='part-{i}.parquet', existing_data_behavior='error')
+        if source_folder.is_dir() == True:
+            source_folder.rename(old_folder)
+        tmp_folder.rename(source_folder)
+    finally:
+        if tmp_folder.is_dir() == True:
+            shutil.rmtree(tmp_folder)
+        recover_catalog_source(source_folder, old_folder)
+    return source_folder
+def build_catalog(sources):
+    """
+   Write the catalog from the metadata log of every source, for example for logs written before the catalog existed
+      logs are updated in the catalog by MetadataLogWriter.close() after that
+      each source is written to the catalog in the folder with its log, as in MetadataLogWriter.close()
+
+    Args:
+        sources (list): source dictionaries with name and log, CRAWL_SOURCES from crawl_sources
+
+    Returns:
+        dictionary of number of rows per source
+    """
+    num_rows = {}
+    for source in sources:
+        metapath = Path.home() / source['log']
+        catalog_folder = metapath.parent / CATALOG_FOLDER
+        catalog_folder.mkdir(parents=True, exist_ok=True)
+        meta_data = read_metadata_log(metapath)
+        write_catalog_source(drop_replaced_rows(meta_data), source['name'], catalog_folder)
+        num_rows[source['name']] = len(meta_data)
+    return num_rows
+def get_catalog_dataset(catalog_folder = None):
+    """
+   Returns the catalog as a pyarrow dataset - rows for every source, with source and capture_month partition columns
+      only the files are listed here, data is read when the dataset is scanned
+
+    Args:
+        catalog_folder (Path object): output of get_catalog_folder(), default catalog in METADATA_FOLDER
+
+    Returns:
+        pyarrow dataset
+    """
+    if catalog_folder is None:
+        catalog_folder = get_catalog_folder()
+    return ds.dataset(catalog_folder, format='parquet', partitioning=CATALOG_PARTITIONING)
+def query_catalog(columns = None, filter = None, catalog_folder = None):
+    """
+   Returns catalog rows matching filter - only the columns asked for are read, filters on source and capture_month
+      skip whole partitions, and filters on other columns skip row groups using the parquet statistics
+      for example all PDFs captured after 2020:
+      query_catalog(['url', 'storage_location'], (ds.field('file_type') == 'pdf') & (ds.field('capture_month') >= '2021-01'))
+
+    Args:
+        columns (list): columns to read, from METADATA_SCHEMA, source and capture_month, default all columns
+        filter (pyarrow expression): filter on the rows, built with ds.field(), default all rows
+        catalog_folder (Path object): output of get_catalog_folder(), default catalog in METADATA_FOLDER
+
+    Returns:
+        Pandas dataframe
+    """
+    return get_catalog_dataset(catalog_folder).to_table(columns=columns, filter=filter).to_pandas()
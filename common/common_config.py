@@ -0,0 +1,79 @@
+
+# settings shared by the scrapers for every source
+
+# folder the metrics and caches shared by every source are saved under, same as DATA_INGESTION_BASE_FOLDER in the source configs
+CORPUS_BASE_FOLDER = "gcs/pubhealth-ai-training-corpus"
+
+# metadata log checkpointing - new rows are written to a part file every CHECKPOINT_ROWS rows or CHECKPOINT_SECONDS seconds
+CHECKPOINT_ROWS = 500
+CHECKPOINT_SECONDS = 300 #seconds
+CHECKPOINT_FOLDER_SUFFIX = "_checkpoints"
+
+# metadata catalog - rows from every source's log as one parquet dataset, partitioned by source and capture month
+# saved in CATALOG_FOLDER next to the logs, and updated for a source when its log is closed
+CATALOG_FOLDER = "catalog"
+UPDATE_CATALOG = True
+
+# crawl state - last fully processed page for each source and filter combination, saved in METADATA_FOLDER
+CRAWL_STATE_PREFIX = "crawl_state_"
+CRAWL_STATE_EXT = "json"
+CRAWL_STATE_MAX_AGE = 7 * 24 * 60 * 60 #seconds a crawl is resumed for, after this the next crawl starts from the first page again
+
+# shared HTTP session - connections are pooled and kept alive per host
+HTTP_POOL_CONNECTIONS = 10 # number of hosts with a connection pool
+HTTP_POOL_MAXSIZE = 10 # connections kept alive per host
+HTTP_TIMEOUT = (10, 60) # seconds to connect, seconds to wait for data
+HTTP_RETRIES = 3 # retries for connection errors and 429/5xx responses, with backoff
+HTTP_RETRY_BACKOFF = 2 #seconds
+HTTP_RETRY_STATUSES = [429, 500, 502, 503, 504]
+HTTP_USER_AGENT = "pubhealth-ai-training-corpus/1.0 (public health data collection; +https://github.com/alliecwarren/public_health_data_collection)"
+
+# browser downloads - wait for the file to finish downloading, up to BROWSER_DOWNLOAD_TIMEOUT seconds
+BROWSER_DOWNLOAD_TIMEOUT = 300 #seconds
+BROWSER_DOWNLOAD_POLL_INTERVAL = 0.5 #seconds
+
+# HTTP downloads - files are streamed to disk in chunks, so large files are never held in memory
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024 # bytes read from the response and written at a time
+
+# content-addressed blob store - downloaded files are stored once per SHA-256 digest, in this folder under RAW_DATA_BASE_FOLDER
+BLOB_FOLDER = "blobs"
+
+# download workers - pages are discovered on the main thread while a pool of workers downloads the files found
+DOWNLOAD_WORKERS = 4 # download worker threads, requests to each host are still spaced out by the robots.txt rate limit
+DOWNLOAD_QUEUE_SIZE = 32 # jobs waiting for a worker before discovery waits
+
+# headless Chrome pool - drivers are reused across documents and replaced after WEBDRIVER_MAX_USES uses
+# scrapers hold one driver for the result listing, and each download worker may borrow one
+WEBDRIVER_POOL_SIZE = DOWNLOAD_WORKERS + 1
+WEBDRIVER_MAX_USES = 50
+
+# asyncio fetch engine for the scrapers that do not need a browser
+ASYNC_HOST_CONCURRENCY = 8 # requests in flight to each host, each still waits for its robots.txt rate limit slot
+ASYNC_MAX_CONNECTIONS = 64 # open connections across all hosts
+
+# crawl orchestrator - save notebooks for every source, run at the same time
+# sources on the same host run one after another, so each host only sees one crawler and its robots.txt rate limit holds
+# the sources are listed in crawl_sources, with the host and log of each read from its config
+CRAWL_WORKER_BUDGET = 4 # maximum number of save notebooks running at the same time
+CRAWL_PROGRESS_INTERVAL = 60 #seconds
+
+# crawl metrics - counters, latency histograms and time per stage (network, politeness, parse, browser, metadata_write)
+# written as Prometheus text and a JSON summary to METRICS_FOLDER at the end of each run
+METRICS_FOLDER = f"{CORPUS_BASE_FOLDER}/logs/metrics"
+METRICS_PREFIX = "crawl_"
+METRICS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300] #seconds
+METRICS_PORT = None # local port to serve /metrics on while a crawl runs, for example 9108 - None to not serve them
+
+# per-run cache of fetched detail pages, so each page is requested once even if several extractors read it
+PAGE_CACHE_SIZE = 64 # pages kept, least recently used pages are dropped first
+
+# pages are parsed in worker processes, so parsing does not hold up the threads doing network I/O - 0 parses in the calling thread
+PARSE_WORKERS = 2
+
+# on-disk HTTP cache for index pages and robots.txt, revalidated with ETag / Last-Modified on each request
+HTTP_CACHE_FOLDER = f"{CORPUS_BASE_FOLDER}/http_cache"
+
+# robots.txt policy for each host, requested on first use and saved, so later runs within ROBOTS_TTL do not request it again
+ROBOTS_TTL = 24 * 60 * 60 #seconds
+ROBOTS_RETRY_INTERVAL = 15 * 60 #seconds a stale robots.txt is used for when the server fails, before it is requested again
+ROBOTS_CACHE_FOLDER = f"{CORPUS_BASE_FOLDER}/robots_cache"
@@ -0,0 +1,19 @@
+
+# shared functions used by the scrapers for every source
+%run ../common/common_config.ipynb
+%run ../common/metrics_functions.ipynb
+%run ../common/metadata_functions.ipynb
+%run ../common/catalog_functions.ipynb
+%run ../common/crawl_state_functions.ipynb
+%run ../common/http_functions.ipynb
+%run ../common/robots_functions.ipynb
+%run ../common/blob_store_functions.ipynb
+%run ../common/download_pipeline_functions.ipynb
+%run ../common/rate_limit_functions.ipynb
+# parse functions are imported as a module, so they can be run in worker processes
+import sys
+from pathlib import Path
+if str(Path('../common').resolve()) not in sys.path:
+    sys.path.append(str(Path('../common').resolve()))
+from parse_functions import HTML_PARSER, ParsePool, parse_html, parse_meta, parse_fact_sheet, parse_stacks_info, pair_sidebar_items
+%run ../common/page_cache_functions.ipynb
@@ -0,0 +1,18 @@
+
+# sources crawled by the orchestrator, with the host and metadata log of each read from the source's config
+# the configs use the same setting names, so each source is added right after its config is run
+CRAWL_SOURCES = []
+%run ../cdc_eis_case_studies/cdc_eis_case_studies_config.ipynb
+CRAWL_SOURCES.append(get_crawl_source('../cdc_eis_case_studies/save_cdc_eis_case_studies.ipynb', CDC_CASE_STUDY_FOLDER, CDC_ROBOTS_TXT,
+                                      METADATA_FOLDER, METADATA_PREFIX + CDC_CASE_STUDY_FOLDER + '.' + METADATA_EXT))
+%run ../cdc_stacks/cdc_stacks_config.ipynb
+CRAWL_SOURCES.append(get_crawl_source('../cdc_stacks/save_cdc_stacks.ipynb', CDC_STACKS_FOLDER, CDC_ROBOTS_TXT,
+                                      METADATA_FOLDER, METADATA_PREFIX + CDC_STACKS_FOLDER + '.' + METADATA_EXT))
+%run ../samhsa/SAMHSA_config.ipynb
+CRAWL_SOURCES.append(get_crawl_source('../samhsa/save_SAMHSA_reports.ipynb', SAMHSA_FOLDER, SAMHSA_ROBOTS_TXT,
+                                      METADATA_FOLDER, METADATA_PREFIX + SAMHSA_FOLDER + '.' + METADATA_EXT))
+%run ../who/who_config.ipynb
+CRAWL_SOURCES.append(get_crawl_source('../who/save_who_documents.ipynb', WHO_DOCUMENTS_FOLDER, WHO_ROBOTS_TXT,
+                                      METADATA_FOLDER, METADATA_PREFIX + WHO_DOCUMENTS_FOLDER + '.' + METADATA_EXT))
+CRAWL_SOURCES.append(get_crawl_source('../who/save_who_fact_sheets.ipynb', WHO_FACT_SHEETS_FOLDER, WHO_ROBOTS_TXT,
+                                      METADATA_FOLDER, METADATA_PREFIX + WHO_FACT_SHEETS_FOLDER + '.' + METADATA_EXT))
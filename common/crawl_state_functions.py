@@ -0,0 +1,159 @@
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+def get_crawl_state_path(folder, source):
+    """
+   Returns full file path to the crawl state file for a source
+
+    Args:
+        folder (str): file path to folder
+        source (str): name of source, used in the filename
+
+    Returns:
+       Path file path
+    """
+    output_path_base = Path.home()
+    gcs_base = output_path_base / folder
+    return gcs_base / (CRAWL_STATE_PREFIX + source + '.' + CRAWL_STATE_EXT)
+def load_crawl_state(state_path):
+    """
+   Returns saved crawl state, if it does not already exist an empty dictionary is returned
+
+    Args:
+        state_path (Path object): file path to crawl state file, output of get_crawl_state_path()
+
+    Returns:
+       dictionary with an entry per filter combination
+    """
+    if state_path.is_file() == True:
+        with open(state_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    return {}
+def save_crawl_state(state_path, crawl_state):
+    """
+   Write crawl state to file - written to a temporary file first and then renamed, so a crash never leaves a partial file
+
+    Args:
+        state_path (Path object): file path to crawl state file, output of get_crawl_state_path()
+        crawl_state (dict): crawl state, output of load_crawl_state()
+
+    Returns:
+
+    """
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_name(state_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(crawl_state, file, indent=2)
+    os.replace(tmp_path, state_path)
+def get_filter_key(*filters):
+    """
+   Returns key identifying a collection or filter combination in the crawl state
+
+    Args:
+        filters (str): filter values, for example collection name and document type
+
+    Returns:
+       string key
+    """
+    return '|'.join(str(f) for f in filters)
+def get_resumed_state(crawl_state, filter_key, ordering, max_age = CRAWL_STATE_MAX_AGE):
+    """
+   Returns saved state of a crawl that is resumed, or None if the crawl starts from the first page -
+      there is no saved state for the filters, the previous crawl finished, results were ordered differently
+      in the previous crawl, or the state was last updated more than max_age seconds ago
+
+    Args:
+        crawl_state (dict): crawl state, output of load_crawl_state()
+        filter_key (str): key for filter combination, output of get_filter_key()
+        ordering (str): ordering of results used by the crawl
+        max_age (int): seconds a crawl is resumed for, default CRAWL_STATE_MAX_AGE
+
+    Returns:
+       dictionary, or None
+    """
+    state = crawl_state.get(filter_key)
+    if state is None or state['completed'] == True or state['ordering'] != ordering:
+        return None
+    last_updated = datetime.strptime(state['datetime_last_updated'], METADATA_DATE_FMT)
+    if (datetime.now() - last_updated).total_seconds() > max_age:
+        return None
+    return state
+def get_resume_page(crawl_state, filter_key, ordering, first_page = 1, max_age = CRAWL_STATE_MAX_AGE):
+    """
+   Returns page to start crawling from - the page after the last fully processed page
+      starts from first_page if the crawl is not resumed, see get_resumed_state(), so new documents at the top
+      of the listing and failed downloads are picked up again
+
+    Args:
+        crawl_state (dict): crawl state, output of load_crawl_state()
+        filter_key (str): key for filter combination, output of get_filter_key()
+        ordering (str): ordering of results used by the crawl
+        first_page (int): number of the first page, default 1
+        max_age (int): seconds a crawl is resumed for, default CRAWL_STATE_MAX_AGE
+
+    Returns:
+       page number (int)
+    """
+    state = get_resumed_state(crawl_state, filter_key, ordering, max_age)
+    if state is None:
+        return first_page
+    if len(state.get('failed_urls', [])) > 0:
+        print(f"{len(state['failed_urls'])} downloads failed earlier in this crawl, they are tried again on the next crawl from the first page")
+    return state['last_page'] + 1
+def update_crawl_state(state_path, crawl_state, filter_key, ordering, last_page, completed = False, failed_urls = None):
+    """
+   Record the last fully processed page for a filter combination and save the crawl state
+      rows for the page should be checkpointed to the metadata log before this is called
+
+    Args:
+        state_path (Path object): file path to crawl state file, output of get_crawl_state_path()
+        crawl_state (dict): crawl state, output of load_crawl_state()
+        filter_key (str): key for filter combination, output of get_filter_key()
+        ordering (str): ordering of results used by the crawl
+        last_page (int): last fully processed page
+        completed (bool): True if all pages have been processed, next crawl starts from the first page
+        failed_urls (list): urls of downloads that failed in this crawl, tried again when the crawl next starts from the first page
+
+    Returns:
+
+    """
+    crawl_state[filter_key] = {'last_page': last_page,
+                               'ordering': ordering,
+                               'completed': completed,
+                               'failed_urls': [] if failed_urls is None else failed_urls,
+                               'datetime_last_updated': datetime.now().strftime(METADATA_DATE_FMT)}
+    save_crawl_state(state_path, crawl_state)
+def checkpoint_page(log_writer, state_path, crawl_state, filter_key, ordering, last_page, completed = False, failed_urls = None):
+    """
+   Save rows for a page to the metadata log and then record the page as processed in the crawl state
+      run through DownloadPipeline.when_page_done() so it happens once the page's downloads have finished
+      failed downloads are added to the crawl state and the crawl moves on - they are not in the log or url index,
+      so they are tried again when the crawl next starts from the first page
+
+    Args:
+        log_writer (MetadataLogWriter): metadata log for the crawl
+        state_path (Path object): file path to crawl state file, output of get_crawl_state_path()
+        crawl_state (dict): crawl state, output of load_crawl_state()
+        filter_key (str): key for filter combination, output of get_filter_key()
+        ordering (str): ordering of results used by the crawl
+        last_page (int): last fully processed page
+        completed (bool): True if all pages have been processed, next crawl starts from the first page
+        failed_urls (list): urls of downloads that failed on this page, from DownloadPipeline.when_page_done()
+
+    Returns:
+
+    """
+    log_writer.checkpoint()
+    # failures from earlier pages of the same crawl are kept, a crawl from the first page starts a new list
+    state = get_resumed_state(crawl_state, filter_key, ordering)
+    all_failed_urls = []
+    if not state is None:
+        all_failed_urls = list(state.get('failed_urls', []))
+    for url in failed_urls or []:
+        if not url in all_failed_urls:
+            all_failed_urls.append(url)
+    if len(failed_urls or []) > 0:
+        print(f'{len(failed_urls)} downloads failed on page {last_page}, they are tried again on the next crawl from the first page')
+    update_crawl_state(state_path, crawl_state, filter_key, ordering, last_page, completed, all_failed_urls)
@@ -0,0 +1,213 @@
+
+from collections import deque
+import queue
+import threading
+class DownloadPipeline:
+    """
+    Pool of download worker threads, fed by the page discovery loop through a bounded queue
+        discovery submits a job for each new file and moves on to the next page while workers download,
+        rows returned by the jobs are added to the metadata log, jobs return None if there is nothing to log
+        per-host rate limits still hold, as every download goes through wait_for_host()
+        submit() blocks while the queue is full, so discovery can not get far ahead of the downloads
+        failed jobs are counted for the page they were submitted for, see when_page_done()
+
+    Args:
+        log_writer (MetadataLogWriter): log that rows returned by the jobs are added to
+        url_index (set): output of get_url_index(), urls are added when submitted so a file is only queued once, optional
+        num_workers (int): number of download worker threads
+        queue_size (int): maximum number of jobs waiting for a worker
+    """
+    def __init__(self, log_writer, url_index = None, num_workers = DOWNLOAD_WORKERS, queue_size = DOWNLOAD_QUEUE_SIZE):
+        self.log_writer = log_writer
+        self.url_index = url_index
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.callback_lock = threading.Lock()
+        self.in_flight = set()
+        self.next_seq = 0
+        self.callbacks = deque()
+        # jobs submitted since the last when_page_done() belong to the next page
+        self.page_start_seq = 0
+        self.failed_urls = {}
+        self.num_logged = 0
+        self.num_skipped = 0
+        self.num_failed = 0
+        self.workers = [threading.Thread(target=self.work, daemon=True) for _ in range(num_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, url, job, *args, **kwargs):
+        """
+        Queue a download job, blocks while the queue is full
+
+        Args:
+            url (str): url of the file, added to the url index
+            job (function): function that downloads the file and returns its row of metadata, or None if not downloaded
+            args, kwargs: arguments for job
+
+        Returns:
+
+        """
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.in_flight.add(seq)
+        # urls already logged stay in the index even if the job does not log a row, for example refreshed files that have not changed
+        is_new = True
+        if not self.url_index is None:
+            is_new = url_in_index(self.url_index, url) == False
+            add_to_url_index(self.url_index, url)
+        self.jobs.put((seq, url, is_new, job, args, kwargs))
+
+    def work(self):
+        """
+        Worker thread - runs jobs from the queue until close() is called
+
+        Returns:
+
+        """
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                self.jobs.task_done()
+                break
+            seq, url, is_new, job, args, kwargs = item
+            try:
+                row = job(*args, **kwargs)
+                if row is None:
+                    self.not_logged(url, is_new)
+                else:
+                    self.log_writer.append(row)
+                    with self.lock:
+                        self.num_logged += 1
+            except Exception as e:
+                print(f'Download failed: {url}: {e}')
+                with self.lock:
+                    self.failed_urls[seq] = url
+                self.not_logged(url, is_new, failed = True)
+            finally:
+                with self.lock:
+                    self.in_flight.discard(seq)
+                self.jobs.task_done()
+                self.run_callbacks()
+
+    def not_logged(self, url, is_new, failed = False):
+        """
+        Record a job that did not log a row - a new url is removed from the url index again,
+            as it is not in the log, so the file is tried again on the next run
+
+        Args:
+            url (str): url of the file
+            is_new (bool): True if the url was not in the url index when the job was submitted
+            failed (bool): True if the job raised an exception
+
+        Returns:
+
+        """
+        with self.lock:
+            if failed == True:
+                self.num_failed += 1
+            else:
+                self.num_skipped += 1
+        if is_new == True and not self.url_index is None:
+            self.url_index.discard(normalize_url(url))
+
+    def when_done(self, callback, *args, **kwargs):
+        """
+        Run callback once every job submitted so far has finished, without waiting for it here
+            used to checkpoint the log once the files queued so far are downloaded,
+            while discovery moves on to the next page
+            callbacks run in the order they were added
+
+        Args:
+            callback (function): function to run
+            args, kwargs: arguments for callback
+
+        Returns:
+
+        """
+        self.add_callback(False, callback, args, kwargs)
+
+    def when_page_done(self, callback, *args, **kwargs):
+        """
+        Run callback once every job submitted so far has finished, as when_done(), for the page whose jobs were
+            submitted since the last when_page_done()
+            callback is given failed_urls, the urls of the jobs on this page that raised an exception,
+            so they can be recorded in the crawl state
+
+        Args:
+            callback (function): function to run, with a failed_urls argument
+            args, kwargs: arguments for callback
+
+        Returns:
+
+        """
+        self.add_callback(True, callback, args, kwargs)
+
+    def add_callback(self, is_page, callback, args, kwargs):
+        """
+        Add a callback for the jobs submitted so far, output of when_done() and when_page_done()
+
+        Args:
+            is_page (bool): True if callback is given the failed urls for the page
+            callback (function): function to run
+            args (tuple), kwargs (dict): arguments for callback
+
+        Returns:
+
+        """
+        with self.lock:
+            self.callbacks.append((self.page_start_seq, self.next_seq, is_page, callback, args, kwargs))
+            # when_done() callbacks do not end a page, so its failures still go to the next when_page_done()
+            if is_page == True:
+                self.page_start_seq = self.next_seq
+        self.run_callbacks()
+
+    def run_callbacks(self):
+        """
+        Run callbacks whose jobs have all finished
+
+        Returns:
+
+        """
+        with self.callback_lock:
+            while True:
+                with self.lock:
+                    if len(self.callbacks) == 0:
+                        return
+                    start, limit, is_page, callback, args, kwargs = self.callbacks[0]
+                    if len(self.in_flight) > 0 and min(self.in_flight) < limit:
+                        return
+                    self.callbacks.popleft()
+                    if is_page == True:
+                        failed_urls = [url for seq, url in sorted(self.failed_urls.items()) if start <= seq < limit]
+                        kwargs = dict(kwargs, failed_urls = failed_urls)
+                try:
+                    callback(*args, **kwargs)
+                except Exception as e:
+                    print(f'Callback failed: {e}')
+
+    def wait(self):
+        """
+        Wait until every submitted job has finished
+
+        Returns:
+
+        """
+        self.jobs.join()
+        self.run_callbacks()
+
+    def close(self):
+        """
+        Wait for every submitted job to finish and stop the workers
+
+        Returns:
+            dictionary with number of jobs that logged a row, did not log a row, and failed
+        """
+        self.wait()
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join()
+        print(f'Logged: {self.num_logged}, skipped: {self.num_skipped}, failed: {self.num_failed}')
+        return {'logged': self.num_logged, 'skipped': self.num_skipped, 'failed': self.num_failed}
@@ -0,0 +1,254 @@
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+# session shared by all fetch and download helpers, created on first use
+_http_session = None
+_http_session_lock = threading.Lock()
+def get_http_session():
+    """
+   Returns requests session shared by the scrapers, connections to each host are pooled and kept alive
+      so repeated requests to the same host do not open a new TCP and TLS connection
+      responses are compressed (gzip, deflate, and brotli if installed) and failed requests are retried with backoff
+
+    Returns:
+       requests Session object
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            retries = Retry(total=HTTP_RETRIES,
+                            backoff_factor=HTTP_RETRY_BACKOFF,
+                            status_forcelist=HTTP_RETRY_STATUSES,
+                            allowed_methods=['HEAD', 'GET'],
+                            respect_retry_after_header=True,
+                            raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retries)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'User-Agent': HTTP_USER_AGENT,
+                                    'Accept-Encoding': ACCEPT_ENCODING,
+                                    'Connection': 'keep-alive'})
+            _http_session = session
+    return _http_session
+def http_get(url, stream = False, **kwargs):
+    """
+   Function to send a GET request with the shared session and default timeout
+
+    Args:
+        url (str): The URL to request
+        stream (bool): if True the body is not downloaded until it is read, for downloading files
+        kwargs: other arguments for requests, for example headers or params
+
+    Returns:
+        requests response object
+    """
+    kwargs.setdefault('timeout', HTTP_TIMEOUT)
+    host = get_metrics_host(url)
+    start = time.monotonic()
+    try:
+        response = get_http_session().get(url, stream=stream, **kwargs)
+    except requests.exceptions.RequestException as e:
+        METRICS.inc('http_errors_total', host=host, error=type(e).__name__)
+        raise
+    finally:
+        observe_stage('network', time.monotonic() - start)
+    METRICS.observe('http_request_seconds', time.monotonic() - start, host=host)
+    METRICS.inc('http_requests_total', host=host, status=response.status_code)
+    # retries made by the session's Retry before this response
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None and len(retries.history) > 0:
+        METRICS.inc('http_retries_total', len(retries.history), host=host)
+    if stream == False:
+        METRICS.inc('bytes_downloaded_total', len(response.content), host=host)
+    return response
+def stream_to_file(response, file_path, chunk_size = DOWNLOAD_CHUNK_SIZE, hasher = None):
+    """
+   Write body of a streamed response to a file in chunks, so the whole file is never held in memory
+      the body is written to a temporary file, flushed to disk and then renamed,
+      so the file at file_path is either complete or not there
+
+    Args:
+        response (obj): requests response object, requested with stream=True
+        file_path (Path object): file path to save file to
+        chunk_size (int): number of bytes to read and write at a time
+        hasher (hashlib object): optional, updated with each chunk so the digest is computed while the file is written
+
+    Returns:
+        tuple of number of bytes written (int) and seconds taken (float)
+    """
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    num_bytes = 0
+    start = time.monotonic()
+    try:
+        with open(tmp_path, 'wb') as file:
+            for chunk in response.iter_content(chunk_size):
+                file.write(chunk)
+                num_bytes += len(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        # leave no partial file behind if the download fails
+        if tmp_path.exists() == True:
+            tmp_path.unlink()
+        raise
+    finally:
+        response.close()
+        seconds = time.monotonic() - start
+        observe_stage('network', seconds)
+    host = get_metrics_host(response.url)
+    METRICS.inc('bytes_downloaded_total', num_bytes, host=host)
+    METRICS.observe('download_seconds', seconds, host=host)
+    return num_bytes, seconds
+def format_transfer(num_bytes, seconds):
+    """
+   Returns size and throughput of a download for printing, e.g. "12.3 MB in 4.1 s, 3.0 MB/s"
+
+    Args:
+        num_bytes (int): number of bytes downloaded
+        seconds (float): seconds taken
+
+    Returns:
+        str
+    """
+    megabytes = num_bytes / 1e6
+    return f"{megabytes:.1f} MB in {seconds:.1f} s, {megabytes / max(seconds, 1e-6):.1f} MB/s"
+def get_http_cache_paths(url, cache_folder = HTTP_CACHE_FOLDER):
+    """
+   Returns file paths for the cached body and validators of a url
+
+    Args:
+        url (str): url of the cached page
+        cache_folder (str): file path to cache folder, relative to the home directory
+
+    Returns:
+       tuple of Path to the body file and Path to the json file with validators and headers
+    """
+    key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+    folder = Path.home() / cache_folder / key[:2]
+    return folder / (key + '.body'), folder / (key + '.json')
+def write_http_cache(url, response, cache_folder = HTTP_CACHE_FOLDER):
+    """
+   Save response body and validators to the cache - only responses with an ETag or Last-Modified header are saved,
+      as others can not be revalidated
+
+    Args:
+        url (str): url that was requested
+        response (obj): requests response object with status 200
+        cache_folder (str): file path to cache folder, relative to the home directory
+
+    Returns:
+
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag is None and last_modified is None:
+        return
+    body_path, meta_path = get_http_cache_paths(url, cache_folder)
+    body_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_meta = {'url': url,
+                  'etag': etag,
+                  'last_modified': last_modified,
+                  'encoding': response.encoding,
+                  'headers': {k: v for k, v in response.headers.items() if k.lower() in ('content-type', 'etag', 'last-modified')}}
+    # body first, so validators never point at a body that was not written
+    for path, mode, content in [(body_path, 'wb', response.content), (meta_path, 'w', json.dumps(cache_meta))]:
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, mode) as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+def read_http_cache(url, cache_folder = HTTP_CACHE_FOLDER):
+    """
+   Returns validators and headers saved for a url, or None if the url is not cached
+
+    Args:
+        url (str): url of the cached page
+        cache_folder (str): file path to cache folder, relative to the home directory
+
+    Returns:
+        dictionary, saved by write_http_cache(), or None
+    """
+    body_path, meta_path = get_http_cache_paths(url, cache_folder)
+    if meta_path.is_file() == False or body_path.is_file() == False:
+        return None
+    with open(meta_path, 'r') as file:
+        return json.load(file)
+def get_conditional_headers(cache_meta, headers = None):
+    """
+   Returns request headers with If-None-Match / If-Modified-Since added from the cached validators
+
+    Args:
+        cache_meta (dict): output of read_http_cache(), or None if the url is not cached
+        headers (dict): other request headers, optional
+
+    Returns:
+        dictionary of headers
+    """
+    headers = dict(headers or {})
+    if cache_meta is not None:
+        if cache_meta['etag'] is not None:
+            headers['If-None-Match'] = cache_meta['etag']
+        if cache_meta['last_modified'] is not None:
+            headers['If-Modified-Since'] = cache_meta['last_modified']
+    return headers
+def get_cached_response(url, cache_meta, content, request = None):
+    """
+   Returns response for a url answered from the cache, used when the server responds 304 Not Modified
+
+    Args:
+        url (str): url that was requested
+        cache_meta (dict): output of read_http_cache()
+        content (bytes): cached body
+        request (obj): request that was sent, optional
+
+    Returns:
+        requests response object with status 200, from_cache attribute is True
+    """
+    cached_response = requests.Response()
+    cached_response.status_code = 200
+    cached_response.url = url
+    cached_response.headers = CaseInsensitiveDict(cache_meta['headers'])
+    cached_response.encoding = cache_meta['encoding']
+    cached_response.request = request
+    cached_response._content = content
+    cached_response.from_cache = True
+    return cached_response
+def http_get_cached(url, cache_folder = HTTP_CACHE_FOLDER, **kwargs):
+    """
+   Function to send a GET request that is revalidated against the on-disk cache
+      if the url was cached, If-None-Match / If-Modified-Since are sent and a 304 response is answered from the cache
+      so unchanged pages are not downloaded again
+
+    Args:
+        url (str): The URL to request
+        cache_folder (str): file path to cache folder, relative to the home directory
+        kwargs: other arguments for requests
+
+    Returns:
+        requests response object, from_cache attribute is True if the body was read from the cache
+    """
+    cache_meta = read_http_cache(url, cache_folder)
+    headers = get_conditional_headers(cache_meta, kwargs.pop('headers', None))
+    response = http_get(url, headers=headers, **kwargs)
+    if response.status_code == 304 and cache_meta is not None:
+        METRICS.inc('http_cache_hits_total', host=get_metrics_host(url))
+        body_path, _ = get_http_cache_paths(url, cache_folder)
+        with open(body_path, 'rb') as file:
+            return get_cached_response(url, cache_meta, file.read(), response.request)
+    if response.status_code == 200:
+        write_http_cache(url, response, cache_folder)
+    response.from_cache = False
+    return response
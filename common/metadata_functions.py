@@ -0,0 +1,481 @@
+
+from urllib.parse import urlsplit, urlunsplit
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+# column types of the metadata log, in METADATA_SCHEMA order
+# license and file_type have few distinct values so are dictionary encoded, author is a list of names,
+# datetimes are timestamps, and json_additional_metadata is a JSON string
+METADATA_ARROW_SCHEMA = pa.schema([
+    ('url', pa.string()),
+    ('datetime_captured', pa.timestamp('us')),
+    ('title', pa.string()),
+    ('author', pa.list_(pa.string())),
+    ('publication_date', pa.string()),
+    ('license', pa.dictionary(pa.int32(), pa.string())),
+    ('file_type', pa.dictionary(pa.int32(), pa.string())),
+    ('storage_location', pa.string()),
+    ('datetime_last_updated', pa.timestamp('us')),
+    ('json_additional_metadata', pa.string())
+])
+METADATA_DATETIME_COLUMNS = ['datetime_captured', 'datetime_last_updated']
+def normalize_url(url):
+    """
+    Returns normalized form of a url, used as the key when checking whether a url has already been downloaded
+        scheme and host are lowercased, default ports, fragments and trailing slashes are removed
+
+    Args:
+        url (str): url to normalize
+
+    Returns:
+        normalized url (str), or None if url is None
+    """
+    if url is None:
+        return None
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    # drop default ports so http://a.gov:80/x and http://a.gov/x match
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parts.path
+    if len(path) > 1:
+        path = path.rstrip('/')
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+def get_url_index(meta_data):
+    """
+    Returns set of normalized urls already in the metadata log, for O(1) lookups of downloaded files
+        built once after the log is read in, and kept in sync with add_to_url_index as rows are added
+
+    Args:
+        meta_data (pandas dataframe): metadata log, output of get_metadata()
+
+    Returns:
+        set of normalized urls
+    """
+    return {normalize_url(url) for url in meta_data["url"].dropna()}
+def url_in_index(url_index, url):
+    """
+    Check whether url has already been downloaded - exact match on the normalized url
+
+    Args:
+        url_index (set): output of get_url_index()
+        url (str): url to check
+
+    Returns:
+        True if url is in the index, False otherwise
+    """
+    return normalize_url(url) in url_index
+def add_to_url_index(url_index, url):
+    """
+    Add url to the index of downloaded urls
+
+    Args:
+        url_index (set): output of get_url_index()
+        url (str): url to add
+
+    Returns:
+
+    """
+    url_index.add(normalize_url(url))
+def encode_additional_metadata(value):
+    """
+    Returns json_additional_metadata value as a JSON string, so the column has the same type in every log
+        dicts are serialized, existing JSON strings are kept, and empty values become an empty JSON object
+
+    Args:
+        value (dict, str or None): json_additional_metadata value, output of combine_metadata_descriptions()
+
+    Returns:
+        JSON string
+    """
+    if isinstance(value, str):
+        return value if value != '' else '{}'
+    if isinstance(value, dict):
+        # drop keys that were filled in with None when the log was read back in
+        value = {k: v for k, v in value.items() if v is not None}
+        return json.dumps(value, default=lambda o: o.tolist() if hasattr(o, 'tolist') else str(o))
+    return '{}'
+def is_missing(value):
+    """
+    Check whether a metadata value is missing - None, NaN, NaT or pandas NA
+
+    Args:
+        value: metadata value
+
+    Returns:
+        True if missing, False otherwise
+    """
+    return np.ndim(value) == 0 and not isinstance(value, dict) and pd.isna(value)
+def to_metadata_string(value):
+    """
+    Returns metadata value as a string, or None if it is missing
+
+    Args:
+        value: metadata value
+
+    Returns:
+        str or None
+    """
+    return None if is_missing(value) else str(value)
+def to_metadata_datetime(value):
+    """
+    Returns datetime_captured or datetime_last_updated value as a datetime
+        strings in METADATA_DATE_FMT, as the scrapers write them, and timestamps read back from the log are accepted
+
+    Args:
+        value (str, datetime or pandas Timestamp): datetime value
+
+    Returns:
+        datetime, or None if the value is missing
+    """
+    if is_missing(value) or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, METADATA_DATE_FMT)
+        except ValueError:
+            return pd.Timestamp(value).to_pydatetime()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+def to_author_list(value):
+    """
+    Returns author value as a list of names - a single author string, as read from the page meta data, is a list of one
+
+    Args:
+        value (str or list): author value
+
+    Returns:
+        list of str, or None if there is no author
+    """
+    if isinstance(value, str):
+        return [value] if value.strip() != '' else None
+    if is_missing(value):
+        return None
+    authors = [str(author) for author in value if not is_missing(author)]
+    return authors if len(authors) > 0 else None
+class MetadataRecord:
+    """
+    Row of metadata for one downloaded file, with each value converted to its type in METADATA_ARROW_SCHEMA
+        slots rather than a dict per row, so the rows collected during a crawl take much less memory
+
+    Args:
+        keyword arguments for the columns in METADATA_SCHEMA, missing columns are None
+    """
+    __slots__ = ('url', 'datetime_captured', 'title', 'author', 'publication_date', 'license',
+                 'file_type', 'storage_location', 'datetime_last_updated', 'json_additional_metadata')
+
+    def __init__(self, url = None, datetime_captured = None, title = None, author = None, publication_date = None, license = None,
+                 file_type = None, storage_location = None, datetime_last_updated = None, json_additional_metadata = None):
+        self.url = to_metadata_string(url)
+        self.datetime_captured = to_metadata_datetime(datetime_captured)
+        self.title = to_metadata_string(title)
+        self.author = to_author_list(author)
+        self.publication_date = to_metadata_string(publication_date)
+        self.license = to_metadata_string(license)
+        self.file_type = to_metadata_string(file_type)
+        self.storage_location = to_metadata_string(storage_location)
+        self.datetime_last_updated = to_metadata_datetime(datetime_last_updated)
+        self.json_additional_metadata = encode_additional_metadata(json_additional_metadata)
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Returns record for a row of metadata, rows already converted are returned as they are
+
+        Args:
+            row (dict or MetadataRecord): dictionary with keys from METADATA_SCHEMA, as returned by the download jobs
+
+        Returns:
+            MetadataRecord
+        """
+        if isinstance(row, cls):
+            return row
+        return cls(**{column: row.get(column) for column in cls.__slots__})
+
+    def to_dict(self):
+        """
+        Returns record as a dictionary with keys from METADATA_SCHEMA
+
+        Returns:
+            dictionary
+        """
+        return {column: getattr(self, column) for column in self.__slots__}
+def to_metadata_datetimes(values):
+    """
+    Returns datetime_captured or datetime_last_updated column as datetimes, values in METADATA_DATE_FMT are converted at once
+        and any other values one by one with to_metadata_datetime()
+
+    Args:
+        values (pandas series): datetime column
+
+    Returns:
+        pandas series of datetime64
+    """
+    datetimes = pd.to_datetime(values, format=METADATA_DATE_FMT, errors='coerce')
+    not_converted = datetimes.isna() & values.notna() & (values != '')
+    if not_converted.any() == True:
+        datetimes[not_converted] = pd.to_datetime(values[not_converted].map(to_metadata_datetime))
+    return datetimes
+def records_to_table(records):
+    """
+    Returns metadata records as an Arrow table, built column by column with the types in METADATA_ARROW_SCHEMA
+
+    Args:
+        records (list): list of MetadataRecord
+
+    Returns:
+        pyarrow Table
+    """
+    columns = [pa.array([getattr(record, field.name) for record in records], type=field.type) for field in METADATA_ARROW_SCHEMA]
+    return pa.Table.from_arrays(columns, schema=METADATA_ARROW_SCHEMA)
+def get_metadata_table(meta_data):
+    """
+    Returns metadata as an Arrow table with the column types in METADATA_ARROW_SCHEMA
+        logs written before the typed schema, with every column as a string, are converted column by column
+
+    Args:
+        meta_data (pandas dataframe or pyarrow Table): metadata log
+
+    Returns:
+        pyarrow Table
+    """
+    if isinstance(meta_data, pa.Table):
+        if meta_data.schema.equals(METADATA_ARROW_SCHEMA) == True:
+            return meta_data
+        meta_data = meta_data.to_pandas()
+    meta_data = meta_data.reindex(columns=METADATA_SCHEMA)
+    # frames read from a typed log already have the right types
+    if all(pd.api.types.is_datetime64_any_dtype(meta_data[column]) for column in METADATA_DATETIME_COLUMNS):
+        try:
+            return pa.Table.from_pandas(meta_data, schema=METADATA_ARROW_SCHEMA, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    columns = []
+    for field in METADATA_ARROW_SCHEMA:
+        values = meta_data[field.name].astype(object)
+        if field.name in METADATA_DATETIME_COLUMNS:
+            values = to_metadata_datetimes(values)
+        elif field.name == 'author':
+            values = values.map(to_author_list)
+        elif field.name == 'json_additional_metadata':
+            values = values.map(encode_additional_metadata)
+        else:
+            try:
+                columns.append(pa.array(values, type=field.type, from_pandas=True))
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # not all strings
+                values = values.map(to_metadata_string)
+        columns.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(columns, schema=METADATA_ARROW_SCHEMA)
+def format_metadata(meta_data):
+    """
+    Returns metadata with columns in METADATA_SCHEMA order, with the column types in METADATA_ARROW_SCHEMA
+        license and file_type are categorical, author is a column of lists and datetimes are datetime64
+
+    Args:
+        meta_data (pandas dataframe or pyarrow Table): metadata log
+
+    Returns:
+        Pandas dataframe
+    """
+    return get_metadata_table(meta_data).to_pandas()
+def flush_metadata(meta_data, metadata_rows):
+    """
+    Returns metadata log with the buffered rows added, rows are combined with a single concat
+        metadata_rows is cleared, so the same buffer can keep collecting rows after a flush
+
+    Args:
+        meta_data (pandas dataframe or pyarrow Table): metadata log, output of get_metadata()
+        metadata_rows (list): list of dictionaries with keys from METADATA_SCHEMA or MetadataRecord, one per downloaded file
+
+    Returns:
+        pyarrow Table
+    """
+    new_table = records_to_table([MetadataRecord.from_row(row) for row in metadata_rows])
+    metadata_rows.clear()
+    return pa.concat_tables([get_metadata_table(meta_data), new_table])
+def get_logged_values(meta_data, column):
+    """
+    Returns values of a column in the metadata log, keyed by normalized url
+
+    Args:
+        meta_data (pandas dataframe): metadata log, output of get_metadata()
+        column (str): name of column in METADATA_SCHEMA
+
+    Returns:
+        dictionary of normalized url to value, missing values are None
+    """
+    values = meta_data[column].astype(object).where(meta_data[column].notna(), None)
+    return {normalize_url(url): value for url, value in zip(meta_data["url"], values)}
+def drop_replaced_rows(meta_data):
+    """
+    Returns metadata with one row per url - rows for refreshed files are appended to the log
+        and replace the earlier row for the same url, so the last row is kept
+
+    Args:
+        meta_data (pandas dataframe or pyarrow Table): metadata log
+
+    Returns:
+        Pandas dataframe or pyarrow Table, same as meta_data
+    """
+    if isinstance(meta_data, pa.Table):
+        is_replaced = meta_data["url"].to_pandas().duplicated(keep="last")
+        return meta_data.filter(pa.array(~is_replaced.to_numpy()))
+    return meta_data.drop_duplicates(subset="url", keep="last", ignore_index = True)
+def get_checkpoint_folder(metapath):
+    """
+    Returns folder holding checkpoint part files for a metadata log, the folder is next to the log
+
+    Args:
+        metapath (Path object): file path to metadata file
+
+    Returns:
+       Path file path
+    """
+    return metapath.parent / (metapath.stem + CHECKPOINT_FOLDER_SUFFIX)
+def write_parquet_atomic(meta_data, path):
+    """
+    Write metadata to parquet file with the column types in METADATA_ARROW_SCHEMA - written to a temporary file first and then renamed,
+        so the file at path is never left partially written
+
+    Args:
+        meta_data (pandas dataframe or pyarrow Table): metadata to write
+        path (Path object): file path to write to
+
+    Returns:
+
+    """
+    tmp_path = path.with_name(path.name + '.tmp')
+    pq.write_table(get_metadata_table(meta_data), tmp_path)
+    os.replace(tmp_path, path)
+def read_metadata_log(metapath):
+    """
+    Returns metadata log including rows checkpointed by a run that did not finish,
+        if no log exists pandas dataframe of specified format is returned
+        logs written before the typed schema are converted to it
+
+    Args:
+        metapath (Path object): file path to metadata file
+
+    Returns:
+       Pandas dataframe
+    """
+    tables = []
+    if metapath.is_file() == True:
+        tables.append(get_metadata_table(pq.read_table(metapath)))
+    checkpoint_folder = get_checkpoint_folder(metapath)
+    if checkpoint_folder.is_dir() == True:
+        for part_path in sorted(checkpoint_folder.glob('part-*.parquet')):
+            tables.append(get_metadata_table(pq.read_table(part_path)))
+    if len(tables) == 0:
+        return records_to_table([]).to_pandas()
+    return drop_replaced_rows(pa.concat_tables(tables)).to_pandas()
+class MetadataLogWriter:
+    """
+    Collects metadata rows during a crawl and checkpoints them to parquet part files,
+        every checkpoint_rows rows or checkpoint_seconds seconds, whichever comes first
+        part files are written atomically, so if the crawl dies only rows since the last checkpoint are lost,
+        and read_metadata_log() picks the checkpointed rows up on the next run
+        close() compacts the log and the part files into a single file at metapath, and updates the source in the catalog
+        rows can be added from several threads, for example by download workers
+
+    Args:
+        metapath (Path object): file path to metadata file
+        meta_data (pandas dataframe): existing metadata, output of get_metadata()
+        checkpoint_rows (int): number of new rows before a checkpoint is written
+        checkpoint_seconds (int): seconds since the last checkpoint before a checkpoint is written
+        update_catalog (bool): if True the source's rows in the metadata catalog are replaced with the log on close()
+    """
+    def __init__(self, metapath, meta_data, checkpoint_rows = CHECKPOINT_ROWS, checkpoint_seconds = CHECKPOINT_SECONDS,
+                 update_catalog = UPDATE_CATALOG):
+        self.metapath = metapath
+        self.meta_data = meta_data
+        self.checkpoint_rows = checkpoint_rows
+        self.checkpoint_seconds = checkpoint_seconds
+        self.checkpoint_folder = get_checkpoint_folder(metapath)
+        self.update_catalog = update_catalog
+        self.rows = []
+        self.num_checkpointed = 0
+        self.last_checkpoint = time.monotonic()
+        self.lock = threading.RLock()
+
+    def append(self, row):
+        """
+        Add row of metadata to the log, writes a checkpoint if one is due
+            a row for a url already in the log replaces the logged row
+
+        Args:
+            row (dict or MetadataRecord): dictionary with keys from METADATA_SCHEMA, kept as a MetadataRecord
+
+        Returns:
+
+        """
+        record = MetadataRecord.from_row(row)
+        with self.lock:
+            self.rows.append(record)
+            num_pending = len(self.rows) - self.num_checkpointed
+            if num_pending >= self.checkpoint_rows or time.monotonic() - self.last_checkpoint >= self.checkpoint_seconds:
+                self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Write rows added since the last checkpoint to a new part file
+
+        Returns:
+            Path to part file written, or None if there were no new rows
+        """
+        with self.lock:
+            self.last_checkpoint = time.monotonic()
+            pending_rows = self.rows[self.num_checkpointed:]
+            if len(pending_rows) == 0:
+                return None
+            self.checkpoint_folder.mkdir(parents=True, exist_ok=True)
+            part_name = f"part-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{self.num_checkpointed:06d}.parquet"
+            part_path = self.checkpoint_folder / part_name
+            with time_stage('metadata_write', 'metadata_write_seconds', write='checkpoint'):
+                write_parquet_atomic(records_to_table(pending_rows), part_path)
+            METRICS.inc('metadata_rows_total', len(pending_rows))
+            self.num_checkpointed = len(self.rows)
+            return part_path
+
+    def close(self):
+        """
+        Write all rows to the metadata file and remove the part files, then update the source in the catalog
+            a failed catalog update does not lose the log, it is counted in catalog_errors_total in the crawl metrics
+
+        Returns:
+            Pandas dataframe of the full metadata log
+        """
+        with self.lock:
+            self.checkpoint()
+            self.metapath.parent.mkdir(parents=True, exist_ok=True)
+            with time_stage('metadata_write', 'metadata_write_seconds', write='close'):
+                meta_table = drop_replaced_rows(flush_metadata(self.meta_data, list(self.rows)))
+                write_parquet_atomic(meta_table, self.metapath)
+            # parts are only removed once the compacted log is in place
+            if self.checkpoint_folder.is_dir() == True:
+                for part_path in self.checkpoint_folder.glob('part-*.parquet'):
+                    part_path.unlink()
+            if self.update_catalog == True:
+                # the log is already written, a catalog that is not updated can be rebuilt with build_catalog()
+                source = get_source_name(self.metapath)
+                try:
+                    write_catalog_source(meta_table, source, self.metapath.parent / CATALOG_FOLDER)
+                except Exception as e:
+                    METRICS.inc('catalog_errors_total', source=source, error=type(e).__name__)
+                    print(f'ERROR: catalog not updated for {source}, the log at {self.metapath} is saved - '
+                          f'run build_catalog() to update it: {type(e).__name__}: {e}')
+            meta_data = meta_table.to_pandas()
+            self.meta_data = meta_data
+            self.rows = []
+            self.num_checkpointed = 0
+            return meta_data
@@ -0,0 +1,300 @@
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime
+from urllib.parse import urlsplit
+from pathlib import Path
+import bisect
+import json
+import os
+import threading
+import time
+class Histogram:
+    """
+    Distribution of observed values, counted in buckets with upper bounds, as in a Prometheus histogram
+
+    Args:
+        buckets (list): increasing upper bounds of the buckets, values above the last bound are counted in a +Inf bucket
+    """
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """
+        Add an observed value
+
+        Args:
+            value (float): value, for example seconds taken
+
+        Returns:
+
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Returns estimate of the q quantile - the upper bound of the bucket it falls in, or the largest value for the +Inf bucket
+
+        Args:
+            q (float): quantile between 0 and 1, for example 0.99
+
+        Returns:
+            value (float), or None if nothing was observed
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, num in zip(self.buckets, self.counts):
+            cumulative += num
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+class MetricsRegistry:
+    """
+    Counters and histograms for a crawl, each keyed by metric name and labels, for example host or stage
+        updated from download workers, async tasks and the main thread, so updates are made under a lock
+
+    Args:
+        prefix (str): prefix added to metric names when exported
+        buckets (list): bucket upper bounds for histograms, in seconds
+    """
+    def __init__(self, prefix = METRICS_PREFIX, buckets = METRICS_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Remove all recorded values, and restart the run clock
+
+        Returns:
+
+        """
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = datetime.now()
+            self.start_time = time.monotonic()
+
+    def inc(self, name, value = 1, **labels):
+        """
+        Add value to a counter
+
+        Args:
+            name (str): metric name, ending in _total
+            value (float): amount to add, default 1
+            labels: label names and values, for example host='www.who.int'
+
+        Returns:
+
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Add an observed value to a histogram
+
+        Args:
+            name (str): metric name, ending in _seconds for timings
+            value (float): observed value
+            labels: label names and values, for example stage='network'
+
+        Returns:
+
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.buckets)
+            self.histograms[key].observe(value)
+
+    def to_prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format
+
+        Returns:
+            str
+        """
+        def format_labels(labels, extra = ()):
+            labels = list(labels) + list(extra)
+            if len(labels) == 0:
+                return ''
+            return '{' + ','.join(f'{k}="{escape_label_value(v)}"' for k, v in labels) + '}'
+
+        def escape_label_value(value):
+            # backslash, double quote and line feed are escaped in label values, as in the Prometheus text format
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f'# TYPE {self.prefix}{name} counter')
+                for (cur_name, labels), value in sorted(self.counters.items()):
+                    if cur_name == name:
+                        lines.append(f'{self.prefix}{name}{format_labels(labels)} {value}')
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f'# TYPE {self.prefix}{name} histogram')
+                for (cur_name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if cur_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, num in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                        cumulative += num
+                        lines.append(f'{self.prefix}{name}_bucket{format_labels(labels, [("le", bound)])} {cumulative}')
+                    lines.append(f'{self.prefix}{name}_sum{format_labels(labels)} {histogram.sum}')
+                    lines.append(f'{self.prefix}{name}_count{format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        Returns summary of the run - total seconds per stage, counters, and count, mean, p50, p99 and max of each histogram
+            stage seconds are summed across threads and tasks, so they can add up to more than the run time
+
+        Returns:
+            dictionary
+        """
+        with self.lock:
+            histograms = {}
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                histograms.setdefault(name, []).append({'labels': dict(labels),
+                                                        'count': histogram.count,
+                                                        'sum': round(histogram.sum, 3),
+                                                        'mean': round(histogram.sum / histogram.count, 3),
+                                                        'p50': histogram.quantile(0.5),
+                                                        'p99': histogram.quantile(0.99),
+                                                        'max': round(histogram.max, 3)})
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+            stages = {row['labels']['stage']: {'seconds': row['sum'], 'count': row['count']} for row in histograms.get('stage_seconds', [])}
+            return {'started': self.started.isoformat(timespec='seconds'),
+                    'wall_seconds': round(time.monotonic() - self.start_time, 1),
+                    'stages': stages,
+                    'counters': counters,
+                    'histograms': histograms}
+# metrics shared by all fetch, download, browser and log helpers in the run
+METRICS = MetricsRegistry()
+def get_metrics_host(url):
+    """
+   Returns host label for a url
+
+    Args:
+        url (str): url requested
+
+    Returns:
+       host (str)
+    """
+    return urlsplit(str(url)).netloc.lower()
+def observe_stage(stage, seconds):
+    """
+   Add time spent in a stage of the crawl - network, politeness, parse, browser or metadata_write
+
+    Args:
+        stage (str): name of the stage
+        seconds (float): seconds spent
+
+    Returns:
+
+    """
+    METRICS.observe('stage_seconds', seconds, stage=stage)
+@contextmanager
+def time_stage(stage, metric = None, **labels):
+    """
+   Context manager timing a block as part of a stage of the crawl, and optionally in its own histogram
+
+    Args:
+        stage (str): name of the stage
+        metric (str): name of histogram the time is also added to, optional
+        labels: labels for metric
+
+    Returns:
+
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        seconds = time.monotonic() - start
+        observe_stage(stage, seconds)
+        if metric is not None:
+            METRICS.observe(metric, seconds, **labels)
+def write_metrics(name, folder = METRICS_FOLDER):
+    """
+   Write the metrics for the run as a Prometheus text file and a JSON summary, both replaced on each run
+      the stage totals are printed
+
+    Args:
+        name (str): name of the run, for example the source folder name
+        folder (str): file path to folder to save to, relative to the home directory
+
+    Returns:
+        dictionary, output of MetricsRegistry.summary()
+    """
+    metrics_folder = Path.home() / folder
+    metrics_folder.mkdir(parents=True, exist_ok=True)
+    summary = METRICS.summary()
+    summary['name'] = name
+    for file_name, content in [(f'{name}.prom', METRICS.to_prometheus()), (f'{name}_summary.json', json.dumps(summary, indent=2, default=str))]:
+        path = metrics_folder / file_name
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    stage_times = ', '.join(f"{stage} {values['seconds']}s" for stage, values in summary['stages'].items())
+    print(f"{name}: {summary['wall_seconds']}s, time in stages: {stage_times}")
+    return summary
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves /metrics in the Prometheus text format and /summary as JSON
+    """
+    def do_GET(self):
+        if self.path.startswith('/metrics'):
+            body = METRICS.to_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4'
+        elif self.path.startswith('/summary'):
+            body = json.dumps(METRICS.summary(), default=str).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # requests for metrics are not printed in the crawl output
+        pass
+def start_metrics_server(port = METRICS_PORT):
+    """
+   Serve the metrics on a local port while the crawl runs, in a background thread
+
+    Args:
+        port (int): port to listen on, default METRICS_PORT, if None metrics are not served
+
+    Returns:
+        ThreadingHTTPServer, or None if metrics are not served
+    """
+    if port is None:
+        return None
+    try:
+        server = ThreadingHTTPServer(('127.0.0.1', port), MetricsRequestHandler)
+    except OSError as e:
+        # for example another crawl already serving on the port
+        print(f'Metrics not served on port {port}: {e}')
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'Metrics served at http://127.0.0.1:{port}/metrics')
+    return server
@@ -0,0 +1,166 @@
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+import json
+import subprocess
+import sys
+import threading
+import time
+import pandas as pd
+import pyarrow.parquet as pq
+def get_crawl_source(notebook, folder, robots_txt, metadata_folder, metadata_filename):
+    """
+   Returns a source for the orchestrator, from the settings in the source's config
+
+    Args:
+        notebook (str): file path to the save notebook, relative to the common folder
+        folder (str): folder name for the source, for example CDC_CASE_STUDY_FOLDER, used as the source name
+        robots_txt (str): url of the robots.txt file for the source's host
+        metadata_folder (str): file path to folder with the metadata log, relative to the home directory
+        metadata_filename (str): name of the metadata log file
+
+    Returns:
+       dictionary with name, notebook, host and log - file path to the log, relative to the home directory
+    """
+    return {'name': folder,
+            'notebook': notebook,
+            'host': urlsplit(robots_txt).netloc,
+            'log': str(Path(metadata_folder) / metadata_filename)}
+def count_log_rows(metapath):
+    """
+   Returns number of rows in a metadata log, including rows in checkpoint part files
+      only parquet footers are read, so this is cheap enough to call while a crawl is writing the log
+
+    Args:
+        metapath (Path object): file path to metadata file
+
+    Returns:
+       number of rows (int)
+    """
+    num_rows = 0
+    part_paths = []
+    if metapath.is_file() == True:
+        part_paths.append(metapath)
+    checkpoint_folder = get_checkpoint_folder(metapath)
+    if checkpoint_folder.is_dir() == True:
+        part_paths.extend(checkpoint_folder.glob('part-*.parquet'))
+    for part_path in part_paths:
+        try:
+            num_rows = num_rows + pq.ParquetFile(part_path).metadata.num_rows
+        except (OSError, ValueError):
+            # file replaced or removed while it was being read
+            continue
+    return num_rows
+def run_notebook(notebook_path, output_folder):
+    """
+   Execute a save notebook in its own Jupyter kernel, the executed notebook with its output is saved to output_folder
+
+    Args:
+        notebook_path (Path object): file path to notebook
+        output_folder (Path object): folder to save the executed notebook to
+
+    Returns:
+       dictionary with return code, run time in seconds and the end of the error output
+    """
+    start = time.monotonic()
+    result = subprocess.run([sys.executable, '-m', 'jupyter', 'nbconvert', '--to', 'notebook', '--execute',
+                             '--ExecutePreprocessor.timeout=-1',
+                             '--output-dir', str(output_folder), str(notebook_path)],
+                            cwd=str(notebook_path.parent), capture_output=True, text=True)
+    return {'returncode': result.returncode,
+            'seconds': time.monotonic() - start,
+            'error': result.stderr[-2000:] if result.returncode != 0 else ''}
+def run_source_group(sources, output_folder, status):
+    """
+   Run the save notebooks for sources on the same host one after another
+
+    Args:
+        sources (list): source dictionaries from CRAWL_SOURCES, all for the same host
+        output_folder (Path object): folder to save executed notebooks to
+        status (dict): shared dictionary of status per source name, updated as notebooks start and finish
+
+    Returns:
+
+    """
+    for source in sources:
+        status[source['name']].update({'status': 'running', 'started': datetime.now().isoformat(timespec='seconds')})
+        try:
+            result = run_notebook(Path(source['notebook']).resolve(), output_folder)
+        except Exception as e:
+            result = {'returncode': -1, 'seconds': 0, 'error': str(e)}
+        status[source['name']].update({'status': 'finished' if result['returncode'] == 0 else 'failed',
+                                       'finished': datetime.now().isoformat(timespec='seconds'),
+                                       'seconds': round(result['seconds'], 1),
+                                       'error': result['error']})
+def get_progress(sources, status, start_rows):
+    """
+   Returns progress of each source - status and rows added to its log since the crawl started
+
+    Args:
+        sources (list): source dictionaries from CRAWL_SOURCES
+        status (dict): status per source name, updated by run_source_group()
+        start_rows (dict): rows in each log when the crawl started
+
+    Returns:
+       Pandas dataframe with a row per source
+    """
+    rows = []
+    for source in sources:
+        cur_status = dict(status[source['name']])
+        cur_status['new_rows'] = count_log_rows(Path.home() / source['log']) - start_rows[source['name']]
+        rows.append({'source': source['name'], 'host': source['host'], **cur_status})
+    return pd.DataFrame(rows)
+def run_all_sources(sources, worker_budget = CRAWL_WORKER_BUDGET, progress_interval = CRAWL_PROGRESS_INTERVAL, metadata_folder = None):
+    """
+   Run the save notebooks for all sources at the same time and report combined progress and a summary
+      sources are grouped by host and each group runs in its own worker, so total time is close to the slowest host
+      rather than the sum of all sources, while each host still only sees one crawler at a time
+
+    Args:
+        sources (list): source dictionaries with name, notebook, host and log, CRAWL_SOURCES from crawl_sources
+        worker_budget (int): maximum number of notebooks running at the same time
+        progress_interval (int): seconds between progress reports
+        metadata_folder (str): file path to folder the summary is saved in, relative to the home directory,
+            default the folder with the first source's log
+
+    Returns:
+       Pandas dataframe summary with a row per source
+    """
+    if metadata_folder is None:
+        metadata_folder = Path(sources[0]['log']).parent
+    metadata_folder = Path.home() / metadata_folder
+    run_name = 'crawl_' + datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_folder = metadata_folder / 'crawl_runs' / run_name
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    groups = {}
+    for source in sources:
+        groups.setdefault(source['host'], []).append(source)
+    status = {source['name']: {'status': 'waiting'} for source in sources}
+    start_rows = {source['name']: count_log_rows(Path.home() / source['log']) for source in sources}
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(worker_budget, len(groups)))) as executor:
+        pending = {executor.submit(run_source_group, group, output_folder, status) for group in groups.values()}
+        while len(pending) > 0:
+            done, pending = wait(pending, timeout=progress_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+            progress = get_progress(sources, status, start_rows)
+            print(f'{round(time.monotonic() - start)}s elapsed')
+            print(progress[['source', 'status', 'new_rows']].to_string(index=False))
+
+    summary = get_progress(sources, status, start_rows)
+    wall_seconds = time.monotonic() - start
+    total = {'run': run_name,
+             'wall_seconds': round(wall_seconds, 1),
+             'sum_source_seconds': round(float(summary['seconds'].fillna(0).sum()), 1) if 'seconds' in summary else 0,
+             'new_rows': int(summary['new_rows'].sum()),
+             'failed': summary.loc[summary['status'] != 'finished', 'source'].tolist(),
+             'sources': summary.to_dict(orient='records')}
+    with open(output_folder / 'summary.json', 'w', encoding='utf-8') as file:
+        json.dump(total, file, indent=2, default=str)
+    print(f"Finished in {total['wall_seconds']}s (sources took {total['sum_source_seconds']}s in total), {total['new_rows']} new rows")
+    return summary
@@ -0,0 +1,154 @@
+
+from collections import OrderedDict
+import asyncio
+import threading
+class PageCache:
+    """
+    Least recently used cache of page html, parsed BeautifulSoup and fields extracted by parse functions, keyed by normalized url
+        used so metadata extractors reading the same detail page share one request and one parse
+
+    Args:
+        max_pages (int): number of pages kept, default PAGE_CACHE_SIZE
+    """
+    def __init__(self, max_pages = PAGE_CACHE_SIZE):
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Returns cached page for url, or None if it is not cached
+
+        Args:
+            url (str): url of the page
+
+        Returns:
+            dictionary with page html under 'text', parsed page (or None if not parsed yet) under 'soup' and fields extracted by parse functions under 'fields'
+        """
+        key = normalize_url(url)
+        with self.lock:
+            page = self.pages.get(key)
+            if page is not None:
+                self.pages.move_to_end(key)
+            return page
+
+    def put(self, url, text):
+        """
+        Add page html to the cache, for example the page source of a page rendered with Selenium
+
+        Args:
+            url (str): url of the page
+            text (str): html of the page
+
+        Returns:
+            dictionary with page html under 'text', parsed page under 'soup' and fields extracted by parse functions under 'fields'
+        """
+        key = normalize_url(url)
+        page = {'text': text, 'soup': None, 'fields': {}}
+        with self.lock:
+            self.pages[key] = page
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        """
+        Remove all pages from the cache
+
+        Returns:
+
+        """
+        with self.lock:
+            self.pages.clear()
+# cache shared by the metadata extractors
+PAGE_CACHE = PageCache()
+# worker processes shared by the parse functions, parse_meta() only reads the document head so it runs inline
+PARSE_POOL = ParsePool(PARSE_WORKERS, inline_funcs = [parse_meta])
+def get_page_text(url, rp):
+    """
+   Returns html of a page, requested with get_html_response() the first time and read from PAGE_CACHE after that
+
+    Args:
+        url (str): The URL for the page being accessed.
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+
+    Returns:
+       html (str), or None if the page can not be scraped
+    """
+    page = PAGE_CACHE.get(url)
+    if page is None:
+        response = get_html_response(url, rp)
+        if response is None:
+            return None
+        page = PAGE_CACHE.put(url, response.text)
+    return page['text']
+def get_page_soup(url, rp):
+    """
+   Returns parsed html of a page, the page is requested and parsed once and read from PAGE_CACHE after that
+
+    Args:
+        url (str): The URL for the page being accessed.
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+
+    Returns:
+       BeautifulSoup parsed html, or None if the page can not be scraped
+    """
+    text = get_page_text(url, rp)
+    if text is None:
+        return None
+    page = PAGE_CACHE.get(url)
+    if page is None:
+        # dropped from the cache by another thread, parse without caching
+        return parse_html(text)
+    if page['soup'] is None:
+        page['soup'] = parse_html(text)
+    return page['soup']
+def get_page_fields(url, rp, parse_func):
+    """
+   Returns fields extracted from a page by a parse function from parse_functions, for example parse_meta
+      the page is requested once and each parse function is run once per page, in a worker process from PARSE_POOL
+
+    Args:
+        url (str): The URL for the page being accessed.
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+        parse_func (function): parse function taking page html
+
+    Returns:
+       output of parse_func, or None if the page can not be scraped
+    """
+    text = get_page_text(url, rp)
+    if text is None:
+        return None
+    page = PAGE_CACHE.get(url)
+    if page is not None and parse_func.__name__ in page['fields']:
+        return page['fields'][parse_func.__name__]
+    with time_stage('parse', 'parse_seconds', parser=parse_func.__name__):
+        fields = PARSE_POOL.parse(parse_func, text)
+    if page is not None:
+        page['fields'][parse_func.__name__] = fields
+    return fields
+async def get_page_fields_async(url, rp, parse_func):
+    """
+   Async version of get_page_fields(), other tasks run while the page is parsed
+      pages fetched with AsyncFetcher should be added to PAGE_CACHE first, otherwise the page is requested in a thread
+
+    Args:
+        url (str): The URL for the page being accessed.
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+        parse_func (function): parse function taking page html
+
+    Returns:
+       output of parse_func, or None if the page can not be scraped
+    """
+    text = await asyncio.to_thread(get_page_text, url, rp)
+    if text is None:
+        return None
+    page = PAGE_CACHE.get(url)
+    if page is not None and parse_func.__name__ in page['fields']:
+        return page['fields'][parse_func.__name__]
+    with time_stage('parse', 'parse_seconds', parser=parse_func.__name__):
+        fields = await PARSE_POOL.parse_async(parse_func, text)
+    if page is not None:
+        page['fields'][parse_func.__name__] = fields
+    return fields
@@ -0,0 +1,285 @@
+
+# parsing of fetched pages into the fields the scrapers use
+# this is a module imported by common_functions rather than a notebook that is run, so the functions can be
+# sent to worker processes - they only take page html and return plain values, no config or shared state
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+import asyncio
+import re
+import threading
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+# meta tags read by extract_meta()
+META_TAGS = {
+    'author': {'name': 'author'},
+    'keywords': {'name': 'keywords'},
+    'description': {'name': 'description'},
+    'title': {'property': 'og:title'}
+}
+# potential meta tag attributes for publication date, the first one found is used
+PUBLICATION_DATE_META_TAGS = [
+    {'name': 'dc.date'},
+    {'property': 'article:published_time'},
+    {'itemprop': 'datePublished'},
+    {'name': 'publication_date'}
+]
+def parse_html(html, parse_only = None):
+    """
+    Returns parsed html, with lxml if it is installed and html.parser otherwise
+
+    Args:
+        html (str): page html
+        parse_only (SoupStrainer): only tags matching this, and their contents, are parsed, optional
+
+    Returns:
+        BeautifulSoup parsed html
+    """
+    return BeautifulSoup(html, HTML_PARSER, parse_only=parse_only)
+# end of the document head, the meta tags read by parse_meta() are before it, apart from BODY_META_TAG
+HEAD_END = re.compile(r'</head\s*>', re.IGNORECASE)
+# publication date microdata, often in the body with the article rather than in the head - the body is only searched for this tag
+BODY_META_TAG = re.compile(r'<meta\b[^>]*\bitemprop\s*=\s*["\']?datePublished\b[^>]*>', re.IGNORECASE)
+class HeadMetaParser(HTMLParser):
+    """
+    Collects the meta tags in the document head in a single pass, stops at the end of the head or the start of the body
+        tags are kept by each of their attributes, so every META_TAGS and PUBLICATION_DATE_META_TAGS lookup is a dict lookup
+        the first tag with an attribute value is kept, same as BeautifulSoup find(), with None as content if it has no content attribute
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta_tags = {}
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done == True:
+            return
+        if tag == 'meta':
+            attrs = dict(attrs)
+            for name, value in attrs.items():
+                if name != 'content':
+                    self.meta_tags.setdefault((name, value), attrs.get('content'))
+        elif tag == 'body':
+            self.done = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.done = True
+def get_head_meta_tags(html):
+    """
+    Returns content of the meta tags in the document head, keyed by (attribute name, attribute value)
+        only the html up to </head> is parsed, the rest of the page is only searched for BODY_META_TAG
+        if it is not in the head
+
+    Args:
+        html (str): page html
+
+    Returns:
+        dictionary of (attribute name, attribute value) to content, None for a tag without content
+    """
+    head_end = HEAD_END.search(html)
+    parser = HeadMetaParser()
+    parser.feed(html if head_end is None else html[:head_end.end()])
+    parser.close()
+    meta_tags = parser.meta_tags
+    if not ('itemprop', 'datePublished') in meta_tags:
+        for match in BODY_META_TAG.finditer(html, 0 if head_end is None else head_end.end()):
+            # the match is parsed as a tag, so only an exact itemprop="datePublished" is kept
+            tag_parser = HeadMetaParser()
+            tag_parser.feed(match.group(0))
+            tag_parser.close()
+            if ('itemprop', 'datePublished') in tag_parser.meta_tags:
+                meta_tags[('itemprop', 'datePublished')] = tag_parser.meta_tags[('itemprop', 'datePublished')]
+                break
+    return meta_tags
+def find_meta_tag(meta_tags, attrs):
+    """
+    Returns content of the meta tag matching attrs
+
+    Args:
+        meta_tags (dict): output of get_head_meta_tags()
+        attrs (dict): single attribute name and value, for example {'name': 'author'}
+
+    Returns:
+        content (str), or None if there is no matching tag or the first matching tag has no content
+    """
+    (name, value), = attrs.items()
+    return meta_tags.get((name, value))
+def find_meta_date(meta_tags):
+    """
+    Search for publication date, based on a list of possible meta data tag
+        if any date is included, return that, otherwise return None
+
+    Args:
+        meta_tags (dict): output of get_head_meta_tags()
+
+    Returns:
+        first date found in metadata from specified tags, or None if there is no date
+    """
+    for attrs in PUBLICATION_DATE_META_TAGS:
+        content = find_meta_tag(meta_tags, attrs)
+        if content is not None:
+            return content
+    return None
+def parse_meta(html):
+    """
+    extract meta data including author, keywords, description, title, and any publication date
+        only the document head is parsed, and the meta tags are read in a single pass
+        the body is only searched for an itemprop datePublished meta tag, see BODY_META_TAG
+
+    Args:
+        html (str): page html
+
+    Returns:
+        dictionary of metadata
+    """
+    meta_tags = get_head_meta_tags(html)
+    meta_data = {key: find_meta_tag(meta_tags, attrs) for key, attrs in META_TAGS.items()}
+    meta_data['date'] = find_meta_date(meta_tags)
+    return meta_data
+def parse_fact_sheet(html):
+    """
+    extract text content and publication date of a WHO fact-sheet
+        only the date and content divs are parsed
+
+    Args:
+        html (str): page html
+
+    Returns:
+        dictionary with text content (empty string if there is none) under 'text', and publication date in Y-m-d format under 'date'
+    """
+    soup = parse_html(html, SoupStrainer('div', class_=['date', 'row sf-detail-content']))
+    # Assuming the fact-sheet content is within the row sf-detail-content
+    text_content = ''
+    for content in soup.find_all('div', class_='row sf-detail-content'):
+        text_content = text_content + content.get_text(separator='\n', strip=True)
+    pub_date = soup.find('div', class_='date').get_text(separator='\n', strip=True)
+    pub_date = datetime.strptime(pub_date, "%d %B %Y").strftime("%Y-%m-%d")
+    return {'text': text_content, 'date': pub_date}
+def parse_stacks_info(html):
+    """
+    extract info related to a CDC Stacks document page - date, title and the download form
+        only divs and forms are parsed
+
+    Args:
+        html (str): page html
+
+    Returns:
+        page text, page date, download form action url, download form method and download form input values
+    """
+    soup = parse_html(html, SoupStrainer(['div', 'form']))
+    page_text = soup.find('div', class_='stacks-flex').get_text(separator='\n', strip=True)
+    page_date = soup.find('div', class_='col-3 bookHeaderListData').get_text(separator='\n', strip=True)
+
+    form_element = soup.find('form', id='download-document')
+    # Extract the value of the action attribute
+    action_value = form_element['action']
+    # method and input values, so the form can be submitted without a browser
+    form_method = form_element.get('method', 'get').lower()
+    form_inputs = {}
+    for input_element in form_element.find_all('input'):
+        if input_element.get('name'):
+            form_inputs[input_element['name']] = input_element.get('value', '')
+
+    return page_text, page_date, action_value, form_method, form_inputs
+def pair_sidebar_items(texts):
+    """
+    create dictionary from the text of the elements in a SAMHSA report sidebar - text ending in ':' is a label,
+        and the text after it is its value
+
+    Args:
+        texts (list): stripped text of each element in the sidebar, in page order
+
+    Returns:
+        dictionary of label (without ':') to value
+    """
+    data_dict = {}
+    current_key = None
+    for text in texts:
+        if text.endswith(':'):
+            current_key = re.sub(":", "", text)
+        elif current_key:
+            data_dict[current_key] = text
+            current_key = None
+    return data_dict
+class ParsePool:
+    """
+    Runs parse functions in a pool of worker processes, so parsing large pages does not hold up the threads doing network I/O
+        with max_workers 0 the parse functions run in the calling thread
+        the pool is started when first used
+
+    Args:
+        max_workers (int): number of worker processes
+        inline_funcs (list): parse functions cheap enough to always run in the calling thread,
+            where sending the page to a worker would take longer than parsing it
+    """
+    def __init__(self, max_workers, inline_funcs = ()):
+        self.max_workers = max_workers
+        self.inline_funcs = set(inline_funcs)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, parse_func, html):
+        """
+        Start parse_func for the page html in a worker process
+
+        Args:
+            parse_func (function): function from this module taking page html
+            html (str): page html
+
+        Returns:
+            concurrent.futures Future for the output of parse_func
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self.executor.submit(parse_func, html)
+
+    def parse(self, parse_func, html):
+        """
+        Returns output of parse_func for the page html, waits for the result
+
+        Args:
+            parse_func (function): function from this module taking page html
+            html (str): page html
+
+        Returns:
+            output of parse_func
+        """
+        if self.max_workers == 0 or parse_func in self.inline_funcs:
+            return parse_func(html)
+        return self.submit(parse_func, html).result()
+
+    async def parse_async(self, parse_func, html):
+        """
+        Async version of parse(), other tasks run while the page is parsed
+
+        Args:
+            parse_func (function): function from this module taking page html
+            html (str): page html
+
+        Returns:
+            output of parse_func
+        """
+        if self.max_workers == 0 or parse_func in self.inline_funcs:
+            return parse_func(html)
+        return await asyncio.wrap_future(self.submit(parse_func, html))
+
+    def close(self):
+        """
+        Stop the worker processes
+
+        Returns:
+
+        """
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
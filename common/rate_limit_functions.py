@@ -0,0 +1,106 @@
+
+from urllib.parse import urlsplit
+import asyncio
+import threading
+import time
+def get_robots_interval(rp, delay_time = DEFAULT_WAIT_TIME):
+    """
+   Returns minimum number of seconds between requests to a host, based on robots.txt
+      the larger of the crawl delay and the request rate interval, or delay_time if robots.txt specifies neither
+
+    Args:
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the host using Protego
+        delay_time: default time between requests
+
+    Returns:
+       seconds (float)
+    """
+    intervals = []
+    if not rp.crawl_delay('*') is None:
+        intervals.append(float(rp.crawl_delay('*')))
+    request_rate = rp.request_rate('*')
+    if not request_rate is None and request_rate.requests > 0:
+        intervals.append(request_rate.seconds / request_rate.requests)
+    if len(intervals) == 0:
+        return delay_time
+    return max(intervals)
+class HostRateLimiter:
+    """
+    Per-host scheduler enforcing a minimum interval between the start of requests to the same host
+        rather than sleeping a fixed time before every request, callers only wait for what is left of the interval,
+        so time spent parsing, writing files or requesting other hosts counts toward the delay
+        slots are reserved under a lock, so threads sharing the limiter are spaced out too
+    """
+    def __init__(self):
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, url, min_interval):
+        """
+        Reserve the next slot for the url's host, without waiting for it
+
+        Args:
+            url (str): url about to be requested
+            min_interval (float): minimum seconds between requests to the host
+
+        Returns:
+            seconds until the reserved slot (float), 0 or less if the request can be sent now
+        """
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = start + min_interval
+        return start - now
+
+    def wait(self, url, min_interval):
+        """
+        Wait until a request to the url's host is allowed, and reserve the next slot for the host
+
+        Args:
+            url (str): url about to be requested
+            min_interval (float): minimum seconds between requests to the host
+
+        Returns:
+            seconds waited (float)
+        """
+        delay = self.reserve(url, min_interval)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+# limiter shared by all fetch and download helpers
+HOST_RATE_LIMITER = HostRateLimiter()
+def wait_for_host(url, rp, delay_time = DEFAULT_WAIT_TIME):
+    """
+   Wait until the crawl delay or request rate in robots.txt (or delay_time if neither is set) has passed
+      since the last request to the url's host
+
+    Args:
+        url (str): url about to be requested
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the host using Protego
+        delay_time: default time between requests, used if not specified in robots.txt
+
+    Returns:
+       seconds waited (float)
+    """
+    delay = HOST_RATE_LIMITER.wait(url, get_robots_interval(rp, delay_time))
+    observe_stage('politeness', max(delay, 0))
+    return delay
+async def wait_for_host_async(url, rp, delay_time = DEFAULT_WAIT_TIME):
+    """
+   Async version of wait_for_host(), other tasks run while waiting
+      slots come from the same HOST_RATE_LIMITER, so sync and async requests to a host are spaced out together
+
+    Args:
+        url (str): url about to be requested
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the host using Protego
+        delay_time: default time between requests, used if not specified in robots.txt
+
+    Returns:
+       seconds waited (float)
+    """
+    delay = HOST_RATE_LIMITER.reserve(url, get_robots_interval(rp, delay_time))
+    if delay > 0:
+        await asyncio.sleep(delay)
+    observe_stage('politeness', max(delay, 0))
+    return delay
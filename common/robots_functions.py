@@ -0,0 +1,212 @@
+
+from protego import Protego
+from urllib.parse import urlsplit
+from pathlib import Path
+import json
+import os
+import requests
+import threading
+import time
+class RobotsPolicy:
+    """
+    robots.txt rules for one host, with the answers to can_fetch(), crawl_delay() and request_rate() memoized
+        so checking the same url or user agent again is a dict lookup rather than matching the rules again
+        has the same methods as the Protego parser, so it is passed as rp to the fetch and download helpers
+
+    Args:
+        robots_txt (str): contents of robots.txt
+        fetched_at (float): time robots.txt was requested, in seconds since the epoch, default now
+    """
+    def __init__(self, robots_txt, fetched_at = None):
+        self.robots_txt = robots_txt
+        self.parser = Protego.parse(robots_txt)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.allowed = {}
+        self.crawl_delays = {}
+        self.request_rates = {}
+
+    def can_fetch(self, url, user_agent):
+        """
+        Check whether the url may be requested by user_agent, memoized per url path and query
+
+        Args:
+            url (str): url to check
+            user_agent (str): user agent, "*" for all crawlers
+
+        Returns:
+            True if url can be requested, False otherwise
+        """
+        parts = urlsplit(url)
+        key = (parts.path, parts.query, user_agent)
+        if key not in self.allowed:
+            self.allowed[key] = self.parser.can_fetch(url, user_agent)
+        return self.allowed[key]
+
+    def crawl_delay(self, user_agent):
+        """
+        Returns crawl delay for user_agent in seconds, or None if robots.txt does not set one
+
+        Args:
+            user_agent (str): user agent, "*" for all crawlers
+
+        Returns:
+            seconds (float) or None
+        """
+        if user_agent not in self.crawl_delays:
+            self.crawl_delays[user_agent] = self.parser.crawl_delay(user_agent)
+        return self.crawl_delays[user_agent]
+
+    def request_rate(self, user_agent):
+        """
+        Returns request rate for user_agent, or None if robots.txt does not set one
+
+        Args:
+            user_agent (str): user agent, "*" for all crawlers
+
+        Returns:
+            Protego request rate, with requests and seconds attributes, or None
+        """
+        if user_agent not in self.request_rates:
+            self.request_rates[user_agent] = self.parser.request_rate(user_agent)
+        return self.request_rates[user_agent]
+
+    def is_expired(self, ttl = ROBOTS_TTL):
+        """
+        Check whether robots.txt was requested more than ttl seconds ago
+
+        Args:
+            ttl (int): seconds a robots.txt file is used before it is requested again
+
+        Returns:
+            True if expired, False otherwise
+        """
+        return time.time() - self.fetched_at >= ttl
+# policies shared by every scraper in the run, keyed by scheme and host
+ROBOTS_POLICIES = {}
+ROBOTS_POLICIES_LOCK = threading.Lock()
+def get_robots_url(url):
+    """
+   Returns url of the robots.txt file for the url's host
+
+    Args:
+        url (str): any url on the host, for example the robots.txt url itself
+
+    Returns:
+       url (str)
+    """
+    parts = urlsplit(url)
+    return f'{parts.scheme.lower()}://{parts.netloc.lower()}/robots.txt'
+def get_robots_cache_path(robots_url, cache_folder = ROBOTS_CACHE_FOLDER):
+    """
+   Returns file path the robots.txt file for a host is saved to between runs
+
+    Args:
+        robots_url (str): output of get_robots_url()
+        cache_folder (str): file path to cache folder, relative to the home directory
+
+    Returns:
+       Path file path
+    """
+    parts = urlsplit(robots_url)
+    return Path.home() / cache_folder / f"{parts.scheme}_{parts.netloc.replace(':', '_')}.json"
+def read_robots_cache(robots_url, cache_folder = ROBOTS_CACHE_FOLDER):
+    """
+   Returns policy saved by an earlier run, or None if the host's robots.txt has not been saved
+
+    Args:
+        robots_url (str): output of get_robots_url()
+        cache_folder (str): file path to cache folder, relative to the home directory
+
+    Returns:
+        RobotsPolicy, or None
+    """
+    cache_path = get_robots_cache_path(robots_url, cache_folder)
+    if cache_path.is_file() == False:
+        return None
+    with open(cache_path, 'r') as file:
+        saved = json.load(file)
+    return RobotsPolicy(saved['robots_txt'], saved['fetched_at'])
+def write_robots_cache(robots_url, policy, cache_folder = ROBOTS_CACHE_FOLDER):
+    """
+   Save robots.txt and the time it was requested, written to a temporary file first and then renamed
+
+    Args:
+        robots_url (str): output of get_robots_url()
+        policy (RobotsPolicy): policy to save
+        cache_folder (str): file path to cache folder, relative to the home directory
+
+    Returns:
+
+    """
+    cache_path = get_robots_cache_path(robots_url, cache_folder)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump({'url': robots_url, 'robots_txt': policy.robots_txt, 'fetched_at': policy.fetched_at}, file)
+    os.replace(tmp_path, cache_path)
+def get_retry_policy(stale_policy, ttl = ROBOTS_TTL, retry_interval = ROBOTS_RETRY_INTERVAL):
+    """
+   Returns the stale policy, stamped so it expires retry_interval seconds from now rather than a full ttl,
+      used when robots.txt could not be requested
+
+    Args:
+        stale_policy (RobotsPolicy): expired policy from an earlier request
+        ttl (int): seconds a robots.txt file is used before it is requested again
+        retry_interval (int): seconds before robots.txt is requested again
+
+    Returns:
+        RobotsPolicy
+    """
+    return RobotsPolicy(stale_policy.robots_txt, time.time() - ttl + retry_interval)
+def fetch_robots_policy(robots_url, stale_policy = None, ttl = ROBOTS_TTL):
+    """
+   Request robots.txt, revalidated against the on-disk HTTP cache
+      a missing robots.txt (4xx response) allows everything, if the server fails the stale policy is kept
+      and requested again after ROBOTS_RETRY_INTERVAL seconds
+
+    Args:
+        robots_url (str): output of get_robots_url()
+        stale_policy (RobotsPolicy): expired policy from an earlier request, optional
+        ttl (int): seconds a robots.txt file is used before it is requested again
+
+    Returns:
+        RobotsPolicy
+    """
+    try:
+        response = http_get_cached(robots_url)
+    except requests.exceptions.RequestException:
+        if stale_policy is None:
+            raise
+        print(f'Could not request {robots_url}, using robots.txt saved earlier until it can be requested again')
+        return get_retry_policy(stale_policy, ttl)
+    if response.status_code == 200:
+        return RobotsPolicy(response.text)
+    if 400 <= response.status_code < 500:
+        return RobotsPolicy('')
+    if stale_policy is not None:
+        print(f'Could not request {robots_url} ({response.status_code}), using robots.txt saved earlier until it can be requested again')
+        return get_retry_policy(stale_policy, ttl)
+    response.raise_for_status()
+def get_robots_policy(url, ttl = ROBOTS_TTL, cache_folder = ROBOTS_CACHE_FOLDER):
+    """
+   Returns robots.txt policy for the url's host - robots.txt is requested on first use and saved,
+      later calls in the run and later runs within ttl seconds use the saved copy without a request
+
+    Args:
+        url (str): any url on the host, for example the robots.txt url itself
+        ttl (int): seconds a robots.txt file is used before it is requested again
+        cache_folder (str): file path to cache folder, relative to the home directory
+
+    Returns:
+        RobotsPolicy, passed as rp to the fetch and download helpers
+    """
+    robots_url = get_robots_url(url)
+    with ROBOTS_POLICIES_LOCK:
+        policy = ROBOTS_POLICIES.get(robots_url)
+        if policy is None:
+            policy = read_robots_cache(robots_url, cache_folder)
+        if policy is None or policy.is_expired(ttl) == True:
+            policy = fetch_robots_policy(robots_url, policy, ttl)
+            write_robots_cache(robots_url, policy, cache_folder)
+        ROBOTS_POLICIES[robots_url] = policy
+        return policy
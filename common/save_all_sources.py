@@ -0,0 +1,9 @@
+
+# run the save notebooks for every source at the same time, with a combined progress report and summary
+%run ./common_config.ipynb
+%run ./metadata_functions.ipynb
+%run ./orchestrator_functions.ipynb
+%run ./crawl_sources.ipynb
+crawl_summary = run_all_sources(CRAWL_SOURCES, worker_budget = CRAWL_WORKER_BUDGET)
+display(crawl_summary)
+ 
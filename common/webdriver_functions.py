@@ -0,0 +1,266 @@
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from contextlib import contextmanager
+from pathlib import Path
+import queue
+import shutil
+import threading
+import time
+import uuid
+def get_chrome_options(download_directory = None):
+    """
+   Returns options for headless Chrome
+
+    Args:
+        download_directory (str): default directory for downloaded files, optional
+
+    Returns:
+       ChromeOptions object
+    """
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    if download_directory is not None:
+        prefs = {"download.default_directory": str(download_directory)}
+        chrome_options.add_experimental_option("prefs", prefs)
+    return chrome_options
+def set_download_directory(driver, download_directory):
+    """
+   Set the directory files are downloaded to for a running Chrome webdriver
+
+    Args:
+        driver (object): Chrome webdriver
+        download_directory (str): directory for downloaded files
+
+    Returns:
+
+    """
+    driver.execute_cdp_cmd('Page.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': str(download_directory)})
+def is_partial_download(filename):
+    """
+   Check whether a file in the download directory is a temporary file for a download still in progress
+
+    Args:
+        filename (str): name of file
+
+    Returns:
+       True if the file is a temporary download file, False otherwise
+    """
+    return filename.endswith('.crdownload') or filename.endswith('.tmp') or filename.startswith('.com.google.Chrome')
+def wait_for_download(directory, existing_files = None, timeout = BROWSER_DOWNLOAD_TIMEOUT, poll_interval = BROWSER_DOWNLOAD_POLL_INTERVAL, stable_checks = 2):
+    """
+   Wait for a browser download to finish - watches the directory for a new file, waits for Chrome's temporary
+      .crdownload files to disappear and for the size of the new file to stop changing
+
+    Args:
+        directory (str): directory the file is downloaded to
+        existing_files (set): names of files in the directory before the download started, optional
+        timeout (int): seconds to wait before giving up, default BROWSER_DOWNLOAD_TIMEOUT
+        poll_interval (float): seconds between checks of the directory
+        stable_checks (int): number of checks in a row the file size must be unchanged
+
+    Returns:
+       name of the downloaded file, or None if the download did not finish before the timeout
+    """
+    with time_stage('browser', 'browser_seconds', action='download'):
+        return poll_for_download(Path(directory), existing_files, timeout, poll_interval, stable_checks)
+def poll_for_download(directory, existing_files, timeout, poll_interval, stable_checks):
+    """
+   Poll the download directory until the new file is complete, arguments as for wait_for_download()
+
+    Returns:
+       name of the downloaded file, or None if the download did not finish before the timeout
+    """
+    if existing_files is None:
+        existing_files = set()
+    deadline = time.monotonic() + timeout
+    last_sizes = None
+    num_stable = 0
+    while time.monotonic() < deadline:
+        new_files = [p for p in directory.iterdir() if p.name not in existing_files]
+        in_progress = [p for p in new_files if is_partial_download(p.name)]
+        finished = [p for p in new_files if not is_partial_download(p.name) and p.is_file()]
+        if len(finished) > 0 and len(in_progress) == 0:
+            sizes = {p.name: p.stat().st_size for p in finished}
+            if sizes == last_sizes:
+                num_stable = num_stable + 1
+                if num_stable >= stable_checks:
+                    # most recently modified file, if more than one appeared
+                    return max(finished, key=lambda p: p.stat().st_mtime).name
+            else:
+                num_stable = 0
+            last_sizes = sizes
+        time.sleep(poll_interval)
+    return None
+@contextmanager
+def task_download_directory(directory):
+    """
+   Context manager for a new empty directory inside directory, used so each browser download task has its own
+      download directory and files from tasks running at the same time are not mixed up - removed on exit
+
+    Args:
+        directory (str): directory the downloaded files are saved to
+
+    Returns:
+       Path to the task directory
+    """
+    task_directory = Path(directory) / '.downloading' / uuid.uuid4().hex
+    task_directory.mkdir(parents=True, exist_ok=True)
+    try:
+        yield task_directory
+    finally:
+        shutil.rmtree(task_directory, ignore_errors=True)
+class WebDriverPool:
+    """
+    Bounded pool of headless Chrome webdrivers, shared by the scrapers instead of starting Chrome for every document
+        drivers are created when first needed, checked before each use, and replaced after max_uses uses
+
+    Args:
+        max_drivers (int): maximum number of drivers running at the same time
+        max_uses (int): number of uses before a driver is quit and replaced
+        options (ChromeOptions): options for new drivers, default get_chrome_options()
+    """
+    def __init__(self, max_drivers = WEBDRIVER_POOL_SIZE, max_uses = WEBDRIVER_MAX_USES, options = None):
+        self.max_uses = max_uses
+        self.options = options if options is not None else get_chrome_options()
+        self.slots = threading.BoundedSemaphore(max_drivers)
+        self.idle_drivers = queue.LifoQueue()
+        self.uses = {}
+        self.lock = threading.Lock()
+
+    def is_healthy(self, driver):
+        """
+        Check that a driver's browser session is still responding
+
+        Args:
+            driver (object): Chrome webdriver
+
+        Returns:
+            True if the session responds, False otherwise
+        """
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def quit_driver(self, driver):
+        """
+        Quit a driver and stop tracking it
+
+        Args:
+            driver (object): Chrome webdriver
+
+        Returns:
+
+        """
+        with self.lock:
+            self.uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def acquire(self, download_directory = None):
+        """
+        Returns a driver from the pool, blocks while max_drivers drivers are in use
+            an idle driver is reused if it is healthy, otherwise a new driver is started
+
+        Args:
+            download_directory (str): directory for files downloaded by this task, optional
+
+        Returns:
+            Chrome webdriver
+        """
+        self.slots.acquire()
+        try:
+            driver = None
+            while driver is None:
+                try:
+                    driver = self.idle_drivers.get_nowait()
+                except queue.Empty:
+                    break
+                if self.is_healthy(driver) == False:
+                    self.quit_driver(driver)
+                    driver = None
+            if driver is None:
+                with time_stage('browser', 'browser_seconds', action='start'):
+                    driver = webdriver.Chrome(options=self.options)
+                METRICS.inc('browser_starts_total')
+                with self.lock:
+                    self.uses[id(driver)] = 0
+            if download_directory is not None:
+                set_download_directory(driver, download_directory)
+            return driver
+        except:
+            self.slots.release()
+            raise
+
+    def release(self, driver):
+        """
+        Return a driver to the pool, it is quit instead if it has reached max_uses
+
+        Args:
+            driver (object): Chrome webdriver, output of acquire()
+
+        Returns:
+
+        """
+        try:
+            with self.lock:
+                self.uses[id(driver)] = self.uses.get(id(driver), 0) + 1
+                num_uses = self.uses[id(driver)]
+            if num_uses >= self.max_uses or self.is_healthy(driver) == False:
+                self.quit_driver(driver)
+            else:
+                self.idle_drivers.put(driver)
+        finally:
+            self.slots.release()
+
+    @contextmanager
+    def driver(self, download_directory = None):
+        """
+        Context manager for a driver from the pool, the driver is returned to the pool on exit
+
+        Args:
+            download_directory (str): directory for files downloaded by this task, optional
+
+        Returns:
+            Chrome webdriver
+        """
+        driver = self.acquire(download_directory)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """
+        Quit all idle drivers, drivers still in use are quit when they are released
+
+        Returns:
+
+        """
+        self.max_uses = 0
+        while True:
+            try:
+                driver = self.idle_drivers.get_nowait()
+            except queue.Empty:
+                break
+            self.quit_driver(driver)
+def browser_get(driver, url):
+    """
+   Load a page in the browser, timed as a browser navigation in the crawl metrics
+
+    Args:
+        driver (object): Chrome webdriver
+        url (str): url of the page
+
+    Returns:
+
+    """
+    METRICS.inc('browser_navigations_total', host=get_metrics_host(url))
+    with time_stage('browser', 'browser_seconds', action='get'):
+        driver.get(url)
@@ -13,18 +13,22 @@ METADATA_FOLDER = f"{DATA_INGESTION_BASE_FOLDER}/logs"
 
 # metadata format:
 # url - string type
-# datetime_captured 
+# datetime_captured - timestamp type, rows are written with dt.strftime("%Y-%m-%d %H:%M:%S.%f")
 # title - string type
 # author - list type, list of strings
 # publication_date - string type (non-normalized formatting at this stage due to wide variety of inputs & broadly generalized ingestion code)
 # license - string type
 # file_type - string type lowercase (examples: 'pdf','html','xml','json')
 # storage_location - string type (indicates where you save the file to)
-# datetime_last_updated - string type, dt.strftime("%Y-%m-%d %H:%M:%S.%f") (indicates when you write it to the log OR if you update the value of that row in the log)
-# json_additional_metadata - dict type (examples: {'keywords':['maternal health', 'chronic disease']} )
+# datetime_last_updated - timestamp type, rows are written with dt.strftime("%Y-%m-%d %H:%M:%S.%f") (indicates when you write it to the log OR if you update the value of that row in the log)
+# json_additional_metadata - dict type (examples: {'keywords':['maternal health', 'chronic disease']} ), stored in the log as a JSON string
 
 METADATA_SCHEMA = ["url", "datetime_captured", "title", "author", "publication_date", "license", "file_type", "storage_location", "datetime_last_updated", "json_additional_metadata"]
+# column types of the log are in METADATA_ARROW_SCHEMA, shared by every source
 
 METADATA_DATE_FMT = "%Y-%m-%d %H:%M:%S.%f"
 DEFAULT_WAIT_TIME = 5 #seconds
+SAMHSA_DOWNLOAD_WAIT_TIME = 10 #seconds between report file downloads, used only if robots.txt sets no crawl delay or request rate
+# ordering of the all-reports listing (site default, newest first) - a saved resume page is discarded if this changes
+SAMHSA_RESULT_ORDERING = 'default'
  
\ No newline at end of file
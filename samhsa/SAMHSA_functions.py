@@ -1,5 +1,7 @@
 
 %run ./SAMHSA_config.ipynb
+%run ../common/common_functions.ipynb
+%run ../common/webdriver_functions.ipynb
 from selenium import webdriver
 import chromedriver_autoinstaller
 from selenium.webdriver.chrome.service import Service
@@ -22,40 +24,31 @@ from pathlib import Path
 
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-def get_html_response(url, rp, delay_time = DEFAULT_WAIT_TIME, retries = 3):
+def get_html_response(url, rp, delay_time = DEFAULT_WAIT_TIME, stream = False):
     """
    Function to get the HTML content of a page
       Also checks that url scraping is permitted under robots.txt file and delay requests
-      And retries, with a delay, if exception
+      Connection errors and 429/5xx responses are retried by the shared session
     
     Args:
         url (str): The URL for the page being accessed.
         rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
         delay_time: default time for delaying before accessing the page, may be specified in robots.txt
-        retries (int): default 3
+        stream (bool): default False, if True the body is not downloaded until it is read, for downloading files
     Returns:
         requests reponse object
     """
-    # if crawl_delay defined in robots.txt, use specified value for delay time
-    if not rp.crawl_delay('*') is None:
-        delay_time = rp.crawl_delay('*')
-    time.sleep(delay_time)
-   
     if rp.can_fetch(url, "*") == False:
         print(f'Restricted from scraping data from this URL: {url}')
         return None
     else:
-        for i in range(retries):
-            try:
-                response = requests.get(url)
-                return response
-            except:
-                if i < retries - 1:
-                    time.sleep(delay)
-                    continue
-                else:
-                    response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
-                    return None
+        # wait until the delay since the last request to this host has passed - crawl delay or request rate in robots.txt if specified
+        wait_for_host(url, rp, delay_time)
+        response = http_get(url, stream=stream)
+        if response.status_code >= 400:
+            response.close()
+        response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
+        return response
     
 def set_directory(folder, subfolder):
     """
@@ -102,37 +95,9 @@ def get_metadata(metapath):
     Returns:
        Pandas dataframe
     """
-    # if metadata exists read in the file, otherwise create an empty dataframe
-    if metapath.is_file() == True:
-        meta_data = pd.read_parquet(metapath)
-    else:
-        meta_data = pd.DataFrame(columns=METADATA_SCHEMA)
+    # if metadata exists read in the file and any checkpoints left by an interrupted run, otherwise create an empty dataframe
+    meta_data = read_metadata_log(metapath)
     return meta_data
-def find_meta_date(soup):
-    """
-    Search for publication date, based on a list of possible meta data tag
-        if any date is included, return that, otherwise return None
-    
-    Args:
-        soup (obj): BeautifulSoup parsed html
-        
-    Returns:
-        first date found in metadata from specified tags, or None if there is no date
-    
-    """
-    # Define potential meta tag attributes for publication date
-    publication_date_meta_tags = [
-        {'name': 'dc.date'},
-        {'property': 'article:published_time'},
-        {'itemprop': 'datePublished'},
-        {'name': 'publication_date'}
-    ]
-    for attrs in publication_date_meta_tags:
-        tag = soup.find('meta', attrs=attrs)
-        if tag and 'content' in tag.attrs:
-            return tag['content']
-    return None
-
 def extract_meta(url, rp):
     """
     extract meta data including author, keywords, description, title, and any publication date
@@ -143,27 +108,8 @@ def extract_meta(url, rp):
     Returns:
         dictionary of metadata 
     """
-    html_content = get_html_response(url, rp).text
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    meta_tags = {
-    'author': soup.find('meta', attrs={'name': 'author'}),
-    'keywords': soup.find('meta', attrs={'name': 'keywords'}),
-    'description': soup.find('meta', attrs={'name': 'description'}),
-    'title': soup.find('meta', attrs={'property': 'og:title'})
-    }
-    
-    meta_data = {}
-
-    for key, tag in meta_tags.items():
-        if tag and 'content' in tag.attrs:
-            meta_data[key] = tag['content']
-        else:
-            meta_data[key] = None
-
-    meta_data['date'] = find_meta_date(soup)
-    
-    return meta_data
+    # page is requested once per run and its meta tags parsed once, other extractors reading it use the cached copy
+    return dict(get_page_fields(url, rp, parse_meta))
 def combine_metadata_descriptions(metainfo, description_fields = ['keywords', 'description']):
     """
     combine some metadata fields into dictionary
@@ -193,16 +139,18 @@ def find_element_with_retry(driver, by, value, retries=3, delay=1):
     Returns:
        element 
     """
-    for i in range(retries):
-        try:
-            element = driver.find_element(by, value)
-            return element
-        except (StaleElementReferenceException, TimeoutException, NoSuchElementException):
-            if i < retries - 1:
-                time.sleep(delay)
-                continue
-            else:
-                return None
+    with time_stage('browser', 'browser_seconds', action='find'):
+        for i in range(retries):
+            try:
+                element = driver.find_element(by, value)
+                return element
+            except (StaleElementReferenceException, TimeoutException, NoSuchElementException):
+                if i < retries - 1:
+                    METRICS.inc('browser_retries_total', action='find')
+                    time.sleep(delay)
+                    continue
+                else:
+                    return None
        
 def find_elements_with_retry(driver, by, value, retries=5, delay=8):
     """
@@ -218,48 +166,41 @@ def find_elements_with_retry(driver, by, value, retries=5, delay=8):
     Returns:
        element 
     """
-    time.sleep(delay)
-    for i in range(retries):
-        try:
-            elements = driver.find_elements(by, value)
-            return elements
-        except (StaleElementReferenceException, TimeoutException, NoSuchElementException):
-            if i < retries - 1:
-                time.sleep(delay)
-                continue
-            else:
-                raise
-    return None
-def download_report(url, directory, rp):
+    with time_stage('browser', 'browser_seconds', action='find'):
+        time.sleep(delay)
+        for i in range(retries):
+            try:
+                elements = driver.find_elements(by, value)
+                return elements
+            except (StaleElementReferenceException, TimeoutException, NoSuchElementException):
+                if i < retries - 1:
+                    METRICS.inc('browser_retries_total', action='find')
+                    time.sleep(delay)
+                    continue
+                else:
+                    raise
+        return None
+def download_report(url, blob_folder, rp):
     """
-   Function to download a file from a URL, file downloaded is printed out
+   Function to download a file from a URL into the blob store, file downloaded is printed out
     
     Args:
         url (str): The URL for the file to download
-        destination_folder (Path object): file path to save file to
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
         rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
     Returns:
-        (str) name of file downloaded
+        dictionary of stored file details, output of stream_to_blob(), None if not downloaded
     """
-    time.sleep(5)
-    response = get_html_response(url, rp, delay_time = 10)
+    response = get_html_response(url, rp, delay_time = SAMHSA_DOWNLOAD_WAIT_TIME, stream = True)
     if not response is None:
         # set name based on url - add report number to filename (if in url) to prevent files with same name
         file_name = re.sub(".*/", "", url)
         report_num = re.findall(r'rpt\d+', url)
         if len(report_num)>0:
             file_name = report_num[0] + "_" + file_name
-        file_path = directory / file_name
-        with open(file_path, 'wb') as file:
-            file.write(response.content)
-        print(f"Downloaded: {file_name}")
+        return stream_to_blob(response, file_name, blob_folder)
     else:
-        return ""
-
-    # Wait for the download to complete (you may need to adjust the time.sleep duration)
-    time.sleep(5)
-    
-    return file_name
+        return None
 def get_sahmsa_report_info(new_driver):
     """
     extract text in sidebar with info relating to that SAHMSA report page and title of page
@@ -283,17 +224,39 @@ def get_sahmsa_report_info(new_driver):
         subclasses = sidebar_div.find_elements(By.XPATH, './/*')
 
         # Extract text and create dictionary
-        current_key = None
-        for element in subclasses:
-            text = element.text.strip()
-            if text.endswith(':'):
-                current_key = re.sub(":", "", text)
-            elif current_key:
-                data_dict[current_key] = text
-                current_key = None
+        data_dict = pair_sidebar_items([element.text.strip() for element in subclasses])
 
         # add page title to dictionary
         page_title = new_driver.find_element(By.CLASS_NAME, 'hide-for-iframe').text
         data_dict['Page Title'] = page_title
     
-    return data_dict
\ No newline at end of file
+    return data_dict
+def save_report(dl_url, page_info, page_meta, blob_folder, rp):
+    """
+    Download a file linked from a SAMHSA report page and create its row of metadata, run by the download workers
+    
+    Args:
+        dl_url (str): url of the file
+        page_info (dict): info for the report page, output of get_sahmsa_report_info()
+        page_meta (dict): metadata for the report page, output of extract_meta()
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
+    Returns:
+        dictionary, row of metadata for the file, or None if it was not downloaded
+    """
+    blob_info = download_report(dl_url, blob_folder, rp)
+    if blob_info is None:
+        return None
+    now = datetime.now()
+    date_time_string = now.strftime(METADATA_DATE_FMT)
+    cur_file_ext = re.sub(r'^.*\.', '', blob_info['file_name'])
+    return {'url':dl_url, 
+            'datetime_captured': date_time_string,
+            'title': page_info['Page Title'],
+            'author': page_meta['author'],
+            'publication_date': page_info['Publication Date'],
+            'license': 'Public',
+            'file_type': cur_file_ext,
+            'storage_location': blob_info['storage_location'],
+            'datetime_last_updated': date_time_string,
+            'json_additional_metadata': add_blob_metadata(combine_metadata_descriptions(page_meta), blob_info)}
@@ -2,22 +2,30 @@
 %run ./SAMHSA_functions.ipynb
 # set url and filepaths to directory for saving the files and metdata
 url = SAMHSA_URL
-destination_folder = set_directory(folder = RAW_DATA_BASE_FOLDER, subfolder = SAMHSA_FOLDER)
-directory = str(destination_folder)
+# downloaded files are stored once per SHA-256 digest in the blob store shared by every source
+blob_folder = get_blob_folder()
 metadata_filename = METADATA_PREFIX + SAMHSA_FOLDER + '.' + METADATA_EXT
 metapath = get_metapath(METADATA_FOLDER, metadata_filename) 
 meta_data = get_metadata(metapath)
+url_index = get_url_index(meta_data)
+# new rows are checkpointed to the log as files are downloaded, so an interrupted run resumes from the last checkpoint
+log_writer = MetadataLogWriter(metapath, meta_data)
+# files are downloaded by a pool of download workers while the main thread moves through the report pages
+pipeline = DownloadPipeline(log_writer, url_index)
+# last fully processed page from previous runs, so an interrupted crawl resumes from the next page
+state_path = get_crawl_state_path(METADATA_FOLDER, SAMHSA_FOLDER)
+crawl_state = load_crawl_state(state_path)
+filter_key = get_filter_key(url)
+start_page = get_resume_page(crawl_state, filter_key, SAMHSA_RESULT_ORDERING, first_page = 0)
+# serve the crawl metrics while the run is going, if METRICS_PORT is set
+metrics_server = start_metrics_server()
 # read robots.txt file
-r = requests.get(SAMHSA_ROBOTS_TXT)
-rp = Protego.parse(r.text)
+rp = get_robots_policy(SAMHSA_ROBOTS_TXT)
 # Set up Selenium with headless Chrome
-options = webdriver.ChromeOptions()
-options.add_argument('--headless')
-options.add_argument('--no-sandbox')
-options.add_argument('--disable-dev-shm-usage')
+# drivers are shared from a pool - one for the report listing, others are reused for each report page
 chromedriver_autoinstaller.install()
-
-driver = webdriver.Chrome(options=options)
+driver_pool = WebDriverPool()
+driver = driver_pool.acquire()
 # check that page can be scraped
 # get first page of files
 # and find the total number of pages
@@ -25,15 +33,15 @@ if rp.can_fetch(url, "*") == False:
     print(f'Restricted from scraping data from this URL: {url}')
     num_pages = 0
 else:
-    driver.get(url)
+    browser_get(driver, url)
     num_pages = driver.find_elements(By.CLASS_NAME, 'pagerer-center-pane')
     num_pages = num_pages[0].text
     num_pages = re.sub(".*of ", "", num_pages)
     num_pages = int(re.sub("[^0-9]", "", num_pages))
 print(f'Number of pages: {str(num_pages)}')
-Number of pages: 206
+print(f'Starting from page: {str(start_page)}')
 # stopped downloading after page ~95 as files we older
-for page_num in range(0, num_pages):
+for page_num in range(start_page, num_pages):
     # get current page
     new_url = url + '?page=' + str(page_num)
     print(f'Current page: {str(page_num)}')
@@ -42,7 +50,7 @@ for page_num in range(0, num_pages):
         print(f'Restricted from scraping data from this URL: {new_url}')
         report_links = []
     else:
-        driver.get(new_url)
+        browser_get(driver, new_url)
         # get all links to report of that page
         report_links = driver.find_elements(By.CSS_SELECTOR, 'a[href^="/data/report/"]')
     for link in report_links:
@@ -51,42 +59,37 @@ for page_num in range(0, num_pages):
         # check that link can be scraped
         if rp.can_fetch(href, "*") == False:
             print(f'Restricted from scraping data from this URL: {href}')
-            download_links = None
-        else:
-            page_driver = webdriver.Chrome(options=options)
-            page_driver.get(href)
+            continue
+        # borrow a driver from the pool for the report page, it is returned once links and page info are collected
+        with driver_pool.driver() as page_driver:
+            browser_get(page_driver, href)
             # find all pdfs, excel files, or csv for download
             download_links = find_elements_with_retry(page_driver, By.CSS_SELECTOR, 'a[href^="/data/sites/"][href$=".pdf"], a[href^="/data/sites/"][href$=".xlsx"], a[href^="/data/sites/"][href$=".csv"], a[href^="/data/sites/"][href$=".xls"]')
-        if len(download_links) > 0 and not download_links is None:
-            # get info related to atricle page
-            page_info = get_sahmsa_report_info(page_driver)
+            download_urls = [dl.get_attribute('href') for dl in download_links or []]
+            if len(download_urls) > 0:
+                # get info related to atricle page
+                page_info = get_sahmsa_report_info(page_driver)
+                # cache the rendered page, so extract_meta() does not request it again
+                PAGE_CACHE.put(href, page_driver.page_source)
+        if len(download_urls) > 0:
             page_meta = extract_meta(href, rp)
-            # download each link and save to directory, and get metadata
-            for dl in download_links:
-                dl_url = dl.get_attribute('href')
-                if meta_data["url"].str.contains(dl_url).any() == False:
-                    report_name = download_report(dl_url,destination_folder, rp)
-                    if report_name != "":
-                        now = datetime.now()
-                        date_time_string = now.strftime(METADATA_DATE_FMT)
-                        cur_file_ext = re.sub(r'^.*\.', '', report_name)
-                        cur_metadata = {'url':dl_url, 
-                                        'datetime_captured': date_time_string,
-                                        'title': page_info['Page Title'],
-                                        'author': page_meta['author'],
-                                        'publication_date': page_info['Publication Date'],
-                                        'license': 'Public',
-                                        'file_type': cur_file_ext,
-                                        'storage_location': directory + "/" + report_name,
-                                        'datetime_last_updated': date_time_string,
-                                        'json_additional_metadata': combine_metadata_descriptions(page_meta)}
-                        cur_metadata = pd.DataFrame([cur_metadata])
-                        meta_data = pd.concat([meta_data, cur_metadata], ignore_index = True)
-        page_driver.quit()
+            # queue each link - downloaded to the blob store and its row of metadata created by a download worker
+            for dl_url in download_urls:
+                if url_in_index(url_index, dl_url) == False:
+                    pipeline.submit(dl_url, save_report, dl_url, page_info, page_meta, blob_folder, rp)
+    # once the page's files are downloaded, save their rows and then record the page as processed
+    pipeline.when_page_done(checkpoint_page, log_writer, state_path, crawl_state, filter_key, SAMHSA_RESULT_ORDERING, page_num)
 
-driver.quit()
+if num_pages > 0:
+    pipeline.when_page_done(checkpoint_page, log_writer, state_path, crawl_state, filter_key, SAMHSA_RESULT_ORDERING, num_pages - 1, completed = True)
+driver_pool.release(driver)
+# wait for the queued downloads before closing the log
+pipeline.close()
+driver_pool.close()
 
 
 
-meta_data.to_parquet(metapath, index = False)
+meta_data = log_writer.close()
+# network, politeness, parse, browser and log write times for the run
+write_metrics(SAMHSA_FOLDER)
  
\ No newline at end of file
@@ -0,0 +1,41 @@
+
+# setup shared by the unit tests - the common functions notebook is run once for the session, as in a save notebook
+# run from the repository root: python -m pytest tests
+from pathlib import Path
+import os
+import sys
+import pytest
+TEST_FOLDER = Path(__file__).resolve().parent
+REPO_FOLDER = TEST_FOLDER.parent
+sys.path.append(str(REPO_FOLDER / 'benchmarks'))
+sys.path.append(str(REPO_FOLDER / 'common'))
+from notebook_loader import run_export
+@pytest.fixture(scope='session')
+def common_ns():
+    """
+    Namespace with a source config and the common functions notebook run in it, as in a save notebook
+    """
+    ns = {'__name__': 'common_functions'}
+    # %run paths are relative to the source folder, as in Jupyter
+    cwd = os.getcwd()
+    os.chdir(REPO_FOLDER / 'cdc_eis_case_studies')
+    try:
+        run_export(REPO_FOLDER / 'cdc_eis_case_studies' / 'cdc_eis_case_studies_config.py', ns)
+        run_export(REPO_FOLDER / 'common' / 'common_functions.py', ns)
+    finally:
+        os.chdir(cwd)
+    return ns
+class LogWriter:
+    """
+    Stand-in for MetadataLogWriter that keeps rows in memory and counts checkpoints
+    """
+    def __init__(self):
+        self.rows = []
+        self.num_checkpoints = 0
+    def append(self, row):
+        self.rows.append(row)
+    def checkpoint(self):
+        self.num_checkpoints += 1
+@pytest.fixture
+def log_writer():
+    return LogWriter()
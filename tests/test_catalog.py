@@ -0,0 +1,26 @@
+
+# catalog - a source's partitions are replaced by a write, and a write interrupted during the swap is recovered
+import pandas as pd
+from fixtures import make_metadata_rows
+def test_write_catalog_source(common_ns, tmp_path):
+    source_folder = common_ns['write_catalog_source'](pd.DataFrame(make_metadata_rows(10)), 'cdc_stacks', tmp_path)
+    assert source_folder == tmp_path / 'source=cdc_stacks'
+    assert len(common_ns['query_catalog'](['url'], catalog_folder = tmp_path)) == 10
+    common_ns['write_catalog_source'](pd.DataFrame(make_metadata_rows(3)), 'cdc_stacks', tmp_path)
+    assert len(common_ns['query_catalog'](['url'], catalog_folder = tmp_path)) == 3
+    assert [folder.name for folder in tmp_path.iterdir()] == ['source=cdc_stacks']
+def test_old_partitions_restored(common_ns, tmp_path):
+    # write interrupted after the old partitions were moved aside, before the new ones were moved in
+    common_ns['write_catalog_source'](pd.DataFrame(make_metadata_rows(10)), 'cdc_stacks', tmp_path)
+    (tmp_path / 'source=cdc_stacks').rename(tmp_path / '.old-source=cdc_stacks')
+    common_ns['recover_catalog_source'](tmp_path / 'source=cdc_stacks', tmp_path / '.old-source=cdc_stacks')
+    assert len(common_ns['query_catalog'](['url'], catalog_folder = tmp_path)) == 10
+    assert [folder.name for folder in tmp_path.iterdir()] == ['source=cdc_stacks']
+def test_leftover_folders_removed(common_ns, tmp_path):
+    # write interrupted after the new partitions were moved in, before the old ones were deleted
+    common_ns['write_catalog_source'](pd.DataFrame(make_metadata_rows(10)), 'cdc_stacks', tmp_path)
+    (tmp_path / '.old-source=cdc_stacks').mkdir()
+    (tmp_path / '.tmp-source=cdc_stacks').mkdir()
+    common_ns['write_catalog_source'](pd.DataFrame(make_metadata_rows(5)), 'cdc_stacks', tmp_path)
+    assert len(common_ns['query_catalog'](['url'], catalog_folder = tmp_path)) == 5
+    assert [folder.name for folder in tmp_path.iterdir()] == ['source=cdc_stacks']
@@ -0,0 +1,58 @@
+
+# crawl state - where a crawl resumes, and what is recorded when a page is done
+from datetime import datetime, timedelta
+import pytest
+ORDERING = 'date_desc'
+FILTER_KEY = 'collection|type'
+@pytest.fixture
+def state_path(tmp_path):
+    return tmp_path / 'crawl_state.json'
+def make_state(common_ns, last_page, completed = False, ordering = ORDERING, age = timedelta(0), failed_urls = None):
+    updated = (datetime.now() - age).strftime(common_ns['METADATA_DATE_FMT'])
+    return {FILTER_KEY: {'last_page': last_page, 'ordering': ordering, 'completed': completed,
+                         'failed_urls': failed_urls or [], 'datetime_last_updated': updated}}
+def test_resume_page_without_state(common_ns):
+    assert common_ns['get_resume_page']({}, FILTER_KEY, ORDERING) == 1
+    assert common_ns['get_resume_page']({}, FILTER_KEY, ORDERING, first_page = 0) == 0
+def test_resume_page_after_last_page(common_ns):
+    crawl_state = make_state(common_ns, 3, failed_urls = ['https://example.com/a.pdf'])
+    assert common_ns['get_resume_page'](crawl_state, FILTER_KEY, ORDERING) == 4
+def test_resume_page_completed(common_ns):
+    crawl_state = make_state(common_ns, 3, completed = True)
+    assert common_ns['get_resume_page'](crawl_state, FILTER_KEY, ORDERING) == 1
+def test_resume_page_ordering_changed(common_ns):
+    crawl_state = make_state(common_ns, 3, ordering = 'title')
+    assert common_ns['get_resume_page'](crawl_state, FILTER_KEY, ORDERING) == 1
+def test_resume_page_stale_state(common_ns):
+    max_age = common_ns['CRAWL_STATE_MAX_AGE']
+    crawl_state = make_state(common_ns, 3, age = timedelta(seconds = max_age + 60))
+    assert common_ns['get_resume_page'](crawl_state, FILTER_KEY, ORDERING) == 1
+    assert common_ns['get_resume_page'](crawl_state, FILTER_KEY, ORDERING, max_age = max_age + 3600) == 4
+def test_checkpoint_page_saves_state(common_ns, log_writer, state_path):
+    crawl_state = {}
+    common_ns['checkpoint_page'](log_writer, state_path, crawl_state, FILTER_KEY, ORDERING, 1, failed_urls = [])
+    assert log_writer.num_checkpoints == 1
+    saved = common_ns['load_crawl_state'](state_path)
+    assert saved[FILTER_KEY]['last_page'] == 1
+    assert saved[FILTER_KEY]['completed'] == False
+    assert common_ns['get_resume_page'](saved, FILTER_KEY, ORDERING) == 2
+def test_checkpoint_page_records_failures(common_ns, log_writer, state_path):
+    crawl_state = {}
+    checkpoint_page = common_ns['checkpoint_page']
+    checkpoint_page(log_writer, state_path, crawl_state, FILTER_KEY, ORDERING, 1, failed_urls = ['https://example.com/a.pdf'])
+    # a failed download does not stop the crawl moving on
+    checkpoint_page(log_writer, state_path, crawl_state, FILTER_KEY, ORDERING, 2, failed_urls = ['https://example.com/a.pdf', 'https://example.com/b.pdf'])
+    saved = common_ns['load_crawl_state'](state_path)
+    assert saved[FILTER_KEY]['last_page'] == 2
+    assert saved[FILTER_KEY]['failed_urls'] == ['https://example.com/a.pdf', 'https://example.com/b.pdf']
+    assert common_ns['get_resume_page'](saved, FILTER_KEY, ORDERING) == 3
+def test_checkpoint_page_completed(common_ns, log_writer, state_path):
+    crawl_state = make_state(common_ns, 3, failed_urls = ['https://example.com/a.pdf'])
+    checkpoint_page = common_ns['checkpoint_page']
+    checkpoint_page(log_writer, state_path, crawl_state, FILTER_KEY, ORDERING, 4, completed = True, failed_urls = [])
+    assert crawl_state[FILTER_KEY]['completed'] == True
+    assert crawl_state[FILTER_KEY]['failed_urls'] == ['https://example.com/a.pdf']
+    assert common_ns['get_resume_page'](crawl_state, FILTER_KEY, ORDERING) == 1
+    # the next crawl starts from the first page with a new list of failures
+    checkpoint_page(log_writer, state_path, crawl_state, FILTER_KEY, ORDERING, 1, failed_urls = [])
+    assert crawl_state[FILTER_KEY]['failed_urls'] == []
@@ -0,0 +1,42 @@
+
+# download pipeline - page callbacks run once the page's downloads have finished, with the page's failed downloads
+import threading
+def download(url, release = None):
+    if not release is None:
+        release.wait(5)
+    if url.endswith('broken.pdf'):
+        raise ValueError('broken link')
+    return {'url': url}
+def test_when_page_done_passes_failed_urls(common_ns, log_writer):
+    pipeline = common_ns['DownloadPipeline'](log_writer, num_workers = 2)
+    pages = []
+    def page_done(page, failed_urls):
+        pages.append((page, failed_urls))
+    pipeline.submit('https://example.com/1/a.pdf', download, 'https://example.com/1/a.pdf')
+    pipeline.submit('https://example.com/1/broken.pdf', download, 'https://example.com/1/broken.pdf')
+    pipeline.when_page_done(page_done, 1)
+    pipeline.submit('https://example.com/2/a.pdf', download, 'https://example.com/2/a.pdf')
+    pipeline.when_page_done(page_done, 2)
+    pipeline.close()
+    assert pages == [(1, ['https://example.com/1/broken.pdf']), (2, [])]
+    assert len(log_writer.rows) == 2
+    assert pipeline.num_failed == 1
+def test_when_page_done_waits_for_downloads(common_ns, log_writer):
+    pipeline = common_ns['DownloadPipeline'](log_writer, num_workers = 2)
+    release = threading.Event()
+    pages = []
+    pipeline.submit('https://example.com/1/a.pdf', download, 'https://example.com/1/a.pdf', release)
+    pipeline.when_page_done(lambda page, failed_urls: pages.append(page), 1)
+    assert pages == []
+    release.set()
+    pipeline.close()
+    assert pages == [1]
+def test_when_done_runs_in_order(common_ns, log_writer):
+    pipeline = common_ns['DownloadPipeline'](log_writer, num_workers = 2)
+    calls = []
+    pipeline.submit('https://example.com/1/broken.pdf', download, 'https://example.com/1/broken.pdf')
+    pipeline.when_done(calls.append, 'checkpoint')
+    pipeline.when_page_done(lambda page, failed_urls: calls.append((page, failed_urls)), 1)
+    pipeline.close()
+    # when_done() does not end the page, the failed download is still passed to the page callback
+    assert calls == ['checkpoint', (1, ['https://example.com/1/broken.pdf'])]
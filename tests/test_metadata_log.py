@@ -0,0 +1,19 @@
+
+# metadata log - close() writes the log even if the catalog can not be updated
+from fixtures import make_metadata_rows
+def count_catalog_errors(metrics):
+    return sum(value for (name, labels), value in metrics.counters.items()
+               if name == 'catalog_errors_total' and ('source', 'cdc_stacks') in labels)
+def test_close_catalog_error(common_ns, tmp_path):
+    metrics = common_ns['METRICS']
+    metapath = tmp_path / 'log_cdc_stacks.parquet'
+    # a file where the catalog folder should be, so the catalog write fails
+    (tmp_path / common_ns['CATALOG_FOLDER']).write_text('not a folder')
+    log_writer = common_ns['MetadataLogWriter'](metapath, common_ns['read_metadata_log'](metapath), update_catalog = True)
+    for row in make_metadata_rows(5):
+        log_writer.append(row)
+    errors = count_catalog_errors(metrics)
+    meta_data = log_writer.close()
+    assert len(meta_data) == 5
+    assert len(common_ns['read_metadata_log'](metapath)) == 5
+    assert count_catalog_errors(metrics) == errors + 1
@@ -0,0 +1,28 @@
+
+# meta tags - read from the head, with the publication date microdata also read from the body
+from parse_functions import parse_meta
+def make_page(head, body):
+    return f'<html><head><title>Page</title>{head}</head><body><p>Text</p>{body}</body></html>'
+def test_date_in_head():
+    html = make_page('<meta name="author" content="Author"><meta name="dc.date" content="2024-03-01">',
+                     '<meta itemprop="datePublished" content="2020-01-01">')
+    meta_data = parse_meta(html)
+    assert meta_data['author'] == 'Author'
+    assert meta_data['date'] == '2024-03-01'
+def test_date_published_in_body():
+    html = make_page('<meta name="author" content="Author">',
+                     '<div itemscope><meta itemprop="datePublished" content="2024-03-01"><meta itemprop="author" content="Other"></div>')
+    meta_data = parse_meta(html)
+    assert meta_data['date'] == '2024-03-01'
+    # only the publication date is read from the body
+    assert meta_data['author'] == 'Author'
+def test_date_published_in_body_before_publication_date():
+    # same order as PUBLICATION_DATE_META_TAGS, wherever the tags are on the page
+    html = make_page('<meta name="publication_date" content="2020-01-01">', '<meta content="2024-03-01" itemprop="datePublished" />')
+    assert parse_meta(html)['date'] == '2024-03-01'
+def test_date_published_in_body_without_head_end():
+    html = '<html><head><meta name="author" content="Author"><body><meta itemprop=datePublished content=2024-03-01></body></html>'
+    assert parse_meta(html)['date'] == '2024-03-01'
+def test_no_date():
+    html = make_page('<meta name="author" content="Author">', '<span itemprop="datePublishedLocal">2024-03-01</span>')
+    assert parse_meta(html)['date'] is None
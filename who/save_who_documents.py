@@ -1,37 +1,45 @@
 
 # get function and config for scraping data from WHO
-%run ./who_functions.ipynb
+%run ./who_document_functions.ipynb
 # set url and filepaths for saving data and metadata
 url = WHO_DOCUMENTS_URL
-destination_folder = set_directory(folder = RAW_DATA_BASE_FOLDER, subfolder = WHO_DOCUMENTS_FOLDER)
+# downloaded files are stored once per SHA-256 digest in the blob store shared by every source
+blob_folder = get_blob_folder()
 metadata_filename = METADATA_PREFIX + WHO_DOCUMENTS_FOLDER + '.' + METADATA_EXT
 metapath = get_metapath(METADATA_FOLDER, metadata_filename) 
 meta_data = get_metadata(metapath)
-# Set up Selenium with headless Chrome
-options = webdriver.ChromeOptions()
-options.add_argument('--headless')
-options.add_argument('--no-sandbox')
-options.add_argument('--disable-dev-shm-usage')
+url_index = get_url_index(meta_data)
+# new rows are checkpointed to the log as files are downloaded, so an interrupted run resumes from the last checkpoint
+log_writer = MetadataLogWriter(metapath, meta_data)
+# files are downloaded by a pool of download workers while the main thread moves through the result pages
+pipeline = DownloadPipeline(log_writer, url_index)
+# last fully processed page for each document type from previous runs, so an interrupted crawl resumes from the next page
+state_path = get_crawl_state_path(METADATA_FOLDER, WHO_DOCUMENTS_FOLDER)
+crawl_state = load_crawl_state(state_path)
+# Set up Selenium with headless Chrome, from the shared driver pool
 chromedriver_autoinstaller.install()
+driver_pool = WebDriverPool()
+driver = driver_pool.acquire()
 
-driver = webdriver.Chrome(options=options)
-
+# serve the crawl metrics while the run is going, if METRICS_PORT is set
+metrics_server = start_metrics_server()
+# read robots.txt file
+rp = get_robots_policy(WHO_ROBOTS_TXT)
 # check that page can be scraped
 if rp.can_fetch(url, "*") == False:
     print(f'Restricted from scraping data from this URL: {url}')
 else:
     # Load the page
-    driver.get(url)
-# read robots.txt file
-r = requests.get(WHO_ROBOTS_TXT)
-rp = Protego.parse(r.text)
+    browser_get(driver, url)
 # WHO has 10,000s of documents, we are not downloading all of these
 # Just downloading a subset of document types -  Manuals and position papers - for now, which we can filter for
 # Loop through each of these filter, find all documents for download on each page, and click through all pages
 for doc_type in WHO_DOCUMENT_TYPES:
     # filter document types to those specified
     set_document_type(driver, doc_type)   
-    page = 1
+    filter_key = get_filter_key(doc_type)
+    # move to the page after the last fully processed page
+    page = skip_to_page(driver, get_resume_page(crawl_state, filter_key, WHO_DOCUMENTS_ORDERING))
     while True:
         print(page)
         # wait for page to load
@@ -53,38 +61,20 @@ for doc_type in WHO_DOCUMENT_TYPES:
                 # check that a download link is available for the document - some are missing
                 if not download_link is None:
                     # check that the document has not already been downloaded
-                    if meta_data["url"].str.contains(download_link).any() == False:
+                    if url_in_index(url_index, download_link) == False:
                         # get the title, which is used to name the file
                         download_title = download_titles[i].get_attribute('title')
-                        download_filename = re.sub(r'[^A-Za-z0-9 ]+', '', download_title) + "." + DOCUMENTS_EXT
                         
                         # get the publication date and format
                         doc_publication_date = publication_dates[i].text
                         doc_publication_date = datetime.strptime(doc_publication_date, "%d %B %Y").strftime("%Y-%m-%d")
                         
-                        # download the file to specified destination folder with the specified title
-                        download_file(download_link, destination_folder, download_filename, rp)
-                       
-                        # extract additional metadata
-                        meta_data_info = extract_meta(page_link, rp)
-                        # set current date for metadata
-                        now = datetime.now()
-                        date_time_string = now.strftime(METADATA_DATE_FMT)
-                        # create row of metadata and add to table
-                        cur_metadata = {'url':download_link, 
-                                        'datetime_captured': date_time_string,
-                                        'title': download_title,
-                                        'author': meta_data_info['author'],
-                                        'publication_date': doc_publication_date,
-                                        'license': WHO_LICENSE,
-                                        'file_type': DOCUMENTS_EXT,
-                                        'storage_location': str(destination_folder) + "/" + download_filename,
-                                        'datetime_last_updated': date_time_string,
-                                        'json_additional_metadata': combine_metadata_descriptions(meta_data_info)}
-                        cur_metadata = pd.DataFrame([cur_metadata])
-                        meta_data = pd.concat([meta_data, cur_metadata], ignore_index = True)
+                        # queue the download - the file is downloaded and its metadata extracted by a download worker
+                        pipeline.submit(download_link, download_document, download_link, page_link, download_title, doc_publication_date, blob_folder, rp)
                 driver.implicitly_wait(DEFAULT_WAIT_TIME)
 
+            # once the page's files are downloaded, save their rows and then record the page as processed
+            pipeline.when_page_done(checkpoint_page, log_writer, state_path, crawl_state, filter_key, WHO_DOCUMENTS_ORDERING, page)
             # click right button to move to the next page of documents
             right_button = WebDriverWait(driver, 10).until(
                 EC.element_to_be_clickable((By.CLASS_NAME, 'k-i-arrow-60-right'))
@@ -97,12 +87,22 @@ for doc_type in WHO_DOCUMENT_TYPES:
         except StaleElementReferenceException:
             print("Encountered a stale element reference. Retrying...")
             continue
+        except TimeoutException:
+            # no right button - all pages have been processed
+            print("No more pages to load")
+            pipeline.when_page_done(checkpoint_page, log_writer, state_path, crawl_state, filter_key, WHO_DOCUMENTS_ORDERING, page, completed = True)
+            break
         except Exception as e:
             print(f"No more pages to load or encountered an error: {e}")
             break
     # return to base url to collect documents of the next type
-    driver.get(url)
-driver.quit()
+    browser_get(driver, url)
+driver_pool.release(driver)
+# wait for the queued downloads before closing the log
+pipeline.close()
+driver_pool.close()
 
-meta_data.to_parquet(metapath, index = False)
+meta_data = log_writer.close()
+# network, politeness, parse, browser and log write times for the run
+write_metrics(WHO_DOCUMENTS_FOLDER)
  
\ No newline at end of file
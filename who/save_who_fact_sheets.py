@@ -6,32 +6,34 @@ destination_folder = set_directory(folder = RAW_DATA_BASE_FOLDER, subfolder = WH
 metadata_filename = METADATA_PREFIX + WHO_FACT_SHEETS_FOLDER + '.' + METADATA_EXT
 metapath = get_metapath(METADATA_FOLDER, metadata_filename) 
 sheet_meta_data = get_metadata(metapath)
+url_index = get_url_index(sheet_meta_data)
+# logged publication and capture dates, used to find fact sheets updated since they were downloaded
+logged_dates = get_logged_values(sheet_meta_data, 'publication_date')
+logged_captured = get_logged_values(sheet_meta_data, 'datetime_captured')
+# new rows are checkpointed to the log as files are downloaded, so an interrupted run resumes from the last checkpoint
+log_writer = MetadataLogWriter(metapath, sheet_meta_data)
+# serve the crawl metrics while the run is going, if METRICS_PORT is set
+metrics_server = start_metrics_server()
 # read robots.txt file
-r = requests.get(WHO_ROBOTS_TXT)
-rp = Protego.parse(r.text)
+rp = get_robots_policy(WHO_ROBOTS_TXT)
 fact_sheet_links = get_fact_sheet_links(url, rp)
-for link in fact_sheet_links:
-    if not link is None:
-        # check that the document has not already been downloaded
-        if sheet_meta_data["url"].str.contains(link).any() == False:
-            fact_sheet_meta = save_fact_sheet(link, destination_folder, rp)
-            if fact_sheet_meta != "" and fact_sheet_meta is not None:
-                # extract additional metadata
-                meta_data_info = extract_meta(link, rp)
-                now = datetime.now()
-                date_time_string = now.strftime(METADATA_DATE_FMT)
-                cur_metadata = {'url': link, 
-                                'datetime_captured': date_time_string,
-                                'title': meta_data_info['title'],
-                                'author': meta_data_info['author'],
-                                'publication_date': fact_sheet_meta[1],
-                                'license': WHO_LICENSE,
-                                'file_type': FACT_SHEETS_EXT,
-                                'storage_location': str(destination_folder) + "/" + fact_sheet_meta[0],
-                                'datetime_last_updated': date_time_string,
-                                'json_additional_metadata': combine_metadata_descriptions(meta_data_info)}
-                cur_metadata = pd.DataFrame([cur_metadata])
-                sheet_meta_data = pd.concat([sheet_meta_data, cur_metadata], ignore_index = True)
+# fact sheets are fetched at the same time on the async fetch engine, within the robots.txt rate limit
+# rows are added to the log as fact sheets are saved
+async with AsyncFetcher(rp) as fetcher:
+    jobs = []
+    queued_urls = set()
+    for link in fact_sheet_links:
+        if not link is None and url_in_index(queued_urls, link) == False:
+            # check whether the document has already been downloaded
+            is_new = url_in_index(url_index, link) == False
+            if is_new == False and REFRESH_UPDATED_FILES == False:
+                continue
+            jobs.append((link, download_fact_sheet(fetcher, link, destination_folder, rp, is_new,
+                                                   logged_dates.get(normalize_url(link)), logged_captured.get(normalize_url(link)))))
+            add_to_url_index(queued_urls, link)
+    await gather_rows(jobs, log_writer)
 
-sheet_meta_data.to_parquet(metapath, index = False)
+sheet_meta_data = log_writer.close()
+# network, politeness, parse, browser and log write times for the run
+write_metrics(WHO_FACT_SHEETS_FOLDER)
  
\ No newline at end of file
@@ -0,0 +1,97 @@
+
+%run ./who_functions.ipynb
+%run ../common/webdriver_functions.ipynb
+# browser functions for the WHO documents search - the fact sheets are fetched without a browser
+from selenium import webdriver
+import chromedriver_autoinstaller
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.keys import Keys
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+import time
+def find_elements_with_retry(driver, by, value, retries=3, delay=1):
+    """
+   Function to find elements with retry mechanism - if stale element attempts to find it again and adds a delay
+    
+    Args:
+        driver (object): Chrome webdriver
+        by: argument to driver.find_elements, specifies which attributes are used to find the element
+        value (str): string used to find element 
+        retries (int): default 3, number of attempts to find the element
+        delay (int): default 1, delay time before attempting to find the element again
+        
+    Returns:
+       element 
+    """
+    with time_stage('browser', 'browser_seconds', action='find'):
+        for i in range(retries):
+            try:
+                elements = driver.find_elements(by, value)
+                return elements
+            except StaleElementReferenceException:
+                if i < retries - 1:
+                    METRICS.inc('browser_retries_total', action='find')
+                    time.sleep(delay)
+                    continue
+                else:
+                    raise
+def set_document_type(driver, doc_type):
+    """
+   Set document type in WHO advanced filtering for documents and searches for those documents
+    
+    Args:
+        driver (obj): webdriver Chrome object
+        doc_type (str): name of document
+        
+    Returns:
+    
+    """
+    # filter to documents of type manual
+    # Locate the dropdown toggle by its class name
+    dropdown_toggle = driver.find_element(By.CLASS_NAME, 'k-i-arrow-60-down')
+
+    # Click the dropdown toggle to reveal the options
+    dropdown_toggle.click()
+
+    # Optionally, wait for the dropdown options to be visible
+    time.sleep(2)  # Adjust the sleep time as needed, or use WebDriverWait for a better approach
+
+    # Locate the dropdown options container (you may need to adjust the selector)
+    dropdown_options_container = driver.find_element(By.CLASS_NAME, 'k-list-container')  # Adjust as necessary
+    
+    # Locate and click the desired option within the container
+    desired_option = dropdown_options_container.find_element(By.XPATH, f"//li[text()='{doc_type}']")
+    desired_option.click()
+
+    driver.implicitly_wait(50)
+    time.sleep(2)
+def skip_to_page(driver, target_page, wait_time = 3):
+    """
+   Click through publication pages without processing them, used to resume a crawl at the page after the last fully processed page
+    
+    Args:
+        driver (obj): webdriver Chrome object, on the first page of documents
+        target_page (int): page to move to, pages start at 1
+        wait_time (int): delay after each click, default 3
+        
+    Returns:
+       page number reached (int), lower than target_page if there are fewer pages
+    """
+    page = 1
+    while page < target_page:
+        try:
+            right_button = WebDriverWait(driver, 10).until(
+                EC.element_to_be_clickable((By.CLASS_NAME, 'k-i-arrow-60-right'))
+            )
+        except TimeoutException:
+            break
+        right_button.click()
+        time.sleep(wait_time)
+        page = page + 1
+    if page > 1:
+        print(f'Resuming from page: {page}')
+    return page
@@ -1,16 +1,9 @@
 
 %run ./who_config.ipynb
-from selenium import webdriver
-import chromedriver_autoinstaller
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.keys import Keys
+%run ../common/common_functions.ipynb
+%run ../common/async_fetch_functions.ipynb
+# browser functions for the documents search are in who_document_functions, so the fact sheets can be saved without selenium
 import requests
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import StaleElementReferenceException
 import re
 import time
 from datetime import datetime, date, timedelta
@@ -21,7 +14,7 @@ from pathlib import Path
 
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-def get_html_response(url, rp, delay_time = DEFAULT_WAIT_TIME):
+def get_html_response(url, rp, delay_time = DEFAULT_WAIT_TIME, use_cache = False, stream = False):
     """
    Function to get the HTML content of a page
       Also checks that url scraping is permitted under robots.txt file and delay requests
@@ -30,63 +23,39 @@ def get_html_response(url, rp, delay_time = DEFAULT_WAIT_TIME):
         url (str): The URL for the page being accessed.
         rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
         delay_time: default time for delaying before accessing the page, may be specified in robots.txt
+        use_cache (bool): default False, if True the page is revalidated against the on-disk HTTP cache and not downloaded again if unchanged
+        stream (bool): default False, if True the body is not downloaded until it is read, for downloading files
     Returns:
         requests reponse object
     """
-    # if crawl_delay defined in robots.txt, use specified value for delay time
-    if not rp.crawl_delay('*') is None:
-        delay_time = rp.crawl_delay('*')
-    time.sleep(delay_time)
-   
     if rp.can_fetch(url, "*") == False:
         print(f'Restricted from scraping data from this URL: {url}')
         return None
     else:
-        response = requests.get(url)
+        # wait until the delay since the last request to this host has passed - crawl delay or request rate in robots.txt if specified
+        wait_for_host(url, rp, delay_time)
+        if use_cache == True:
+            response = http_get_cached(url)
+        else:
+            response = http_get(url, stream=stream)
         response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
         return response
-def download_file(url, destination_folder, file_name, rp):
+def download_file(url, blob_folder, file_name, rp):
     """
-   Function to download a file from a URL, file downloaded is printed out
+   Function to download a file from a URL into the blob store, file downloaded is printed out
     
     Args:
         url (str): The URL for the file to download
-        destination_folder (Path object): file path to save file to
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        file_name (str): name of the file, used for its extension
         rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego
     Returns:
-        
-    """
-    response = get_html_response(url, rp)
-    file_path = destination_folder / file_name
-    
-    if not response is None:
-        with open(file_path, 'wb') as file:
-            file.write(response.content)
-        print(f"Downloaded: {file_name}")
-def find_elements_with_retry(driver, by, value, retries=3, delay=1):
-    """
-   Function to find elements with retry mechanism - if stale element attempts to find it again and adds a delay
-    
-    Args:
-        driver (object): Chrome webdriver
-        by: argument to driver.find_elements, specifies which attributes are used to find the element
-        value (str): string used to find element 
-        retries (int): default 3, number of attempts to find the element
-        delay (int): default 1, delay time before attempting to find the element again
-        
-    Returns:
-       element 
+        dictionary of stored file details, output of stream_to_blob(), None if not downloaded
     """
-    for i in range(retries):
-        try:
-            elements = driver.find_elements(by, value)
-            return elements
-        except StaleElementReferenceException:
-            if i < retries - 1:
-                time.sleep(delay)
-                continue
-            else:
-                raise
+    response = get_html_response(url, rp, stream=True)
+    if response is None:
+        return None
+    return stream_to_blob(response, file_name, blob_folder)
 def set_directory(folder, subfolder):
     """
    Returns full file path to gcs folder specified. If folder does not exist it is created
@@ -132,68 +101,9 @@ def get_metadata(metapath):
     Returns:
        Pandas dataframe
     """
-    # if metadata exists read in the file, otherwise create an empty dataframe
-    if metapath.is_file() == True:
-        meta_data = pd.read_parquet(metapath)
-    else:
-        meta_data = pd.DataFrame(columns=METADATA_SCHEMA)
+    # if metadata exists read in the file and any checkpoints left by an interrupted run, otherwise create an empty dataframe
+    meta_data = read_metadata_log(metapath)
     return meta_data
-def set_document_type(driver, doc_type):
-    """
-   Set document type in WHO advanced filtering for documents and searches for those documents
-    
-    Args:
-        driver (obj): webdriver Chrome object
-        doc_type (str): name of document
-        
-    Returns:
-    
-    """
-    # filter to documents of type manual
-    # Locate the dropdown toggle by its class name
-    dropdown_toggle = driver.find_element(By.CLASS_NAME, 'k-i-arrow-60-down')
-
-    # Click the dropdown toggle to reveal the options
-    dropdown_toggle.click()
-
-    # Optionally, wait for the dropdown options to be visible
-    time.sleep(2)  # Adjust the sleep time as needed, or use WebDriverWait for a better approach
-
-    # Locate the dropdown options container (you may need to adjust the selector)
-    dropdown_options_container = driver.find_element(By.CLASS_NAME, 'k-list-container')  # Adjust as necessary
-    
-    # Locate and click the desired option within the container
-    desired_option = dropdown_options_container.find_element(By.XPATH, f"//li[text()='{doc_type}']")
-    desired_option.click()
-
-    driver.implicitly_wait(50)
-    time.sleep(2)
-def find_meta_date(soup):
-    """
-    Search for publication date, based on a list of possible meta data tag
-        if any date is included, return that, otherwise return None
-    
-    Args:
-        soup (obj): BeautifulSoup parsed html
-        
-    Returns:
-        first date found in metadata from specified tags, or None if there is no date
-    
-    """
-    # Define potential meta tag attributes for publication date
-    publication_date_meta_tags = [
-        {'name': 'dc.date'},
-        {'property': 'article:published_time'},
-        {'itemprop': 'datePublished'},
-        {'name': 'publication_date'}
-    ]
-    for attrs in publication_date_meta_tags:
-        tag = soup.find('meta', attrs=attrs)
-        if tag and 'content' in tag.attrs:
-            return tag['content']
-    return None
-
-
 def extract_meta(url, rp):
     """
     extract meta data including author, keywords, description, title, and any publication date
@@ -204,27 +114,8 @@ def extract_meta(url, rp):
     Returns:
         dictionary of metadata 
     """
-    html_content = get_html_response(url, rp).text
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    meta_tags = {
-    'author': soup.find('meta', attrs={'name': 'author'}),
-    'keywords': soup.find('meta', attrs={'name': 'keywords'}),
-    'description': soup.find('meta', attrs={'name': 'description'}),
-    'title': soup.find('meta', attrs={'property': 'og:title'})
-    }
-    
-    meta_data = {}
-
-    for key, tag in meta_tags.items():
-        if tag and 'content' in tag.attrs:
-            meta_data[key] = tag['content']
-        else:
-            meta_data[key] = None
-
-    meta_data['date'] = find_meta_date(soup)
-    
-    return meta_data
+    # page is requested once per run and its meta tags parsed once, other extractors reading it use the cached copy
+    return dict(get_page_fields(url, rp, parse_meta))
 def combine_metadata_descriptions(metainfo, description_fields = ['keywords', 'description']):
     """
     combine some metadata fields into dictionary
@@ -252,55 +143,143 @@ def get_fact_sheet_links(base_url, rp):
     Returns:
         list of urls
     """
-    html_content = get_html_response(base_url, rp).text
+    # index page is revalidated against the HTTP cache, so it is only downloaded again if it changed
+    html_content = get_html_response(base_url, rp, use_cache = True).text
     fact_sheet_links = []
     if not html_content is None:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = parse_html(html_content)
         # Find all <a> tags within the specified class
         for li_tag in soup.find_all('li', class_='alphabetical-nav--list-item'):
             a_tag = li_tag.find('a')
             link= a_tag.get('href')
             if link and link.startswith('/news-room/fact-sheets'):
-                full_link = 'https://www.who.int' + link
+                full_link = urljoin(base_url, link)
                 fact_sheet_links.append(full_link)
 
     return fact_sheet_links
-def save_fact_sheet(url, directory, rp):
+async def fetch_fact_sheet(fetcher, url):
     """
-    Function to extract and save the text content of a WHO fact-sheet
+    Request a fact sheet page, revalidated against the on-disk HTTP cache, and add it to the page cache
+        so get_fact_sheet_content() and extract_meta() do not request it again
     
     Args:
+        fetcher (AsyncFetcher): async fetch engine for the crawl
         url (str): string for webpage
-        directory: file path to directory to save file
-        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego 
 
     Returns:
-        if fact sheet can be saved, returns name of file and publication date, otherwise returns empty string
+        requests response object, from_cache is True if the page has not changed since it was last requested,
+        or None if the page can not be scraped
     """
-    html_content = get_html_response(url, rp).text
-    if html_content is None:
-        return ''
+    response = await fetcher.fetch(url, use_cache = True)
+    if response is None:
+        return None
+    PAGE_CACHE.put(url, response.text)
+    return response
+def get_fact_sheet_content(url, fact_sheet):
+    """
+    Function to extract the text content of a WHO fact-sheet
     
-    soup = BeautifulSoup(html_content, 'html.parser')
+    Args:
+        url (str): string for webpage
+        fact_sheet (dict): text content and publication date of the fact sheet, output of parse_fact_sheet()
+
+    Returns:
+        if fact sheet has content, returns name of file, text content and publication date, otherwise returns None
+    """
+    text_content = fact_sheet['text']
+    pub_date = fact_sheet['date']
+
+    if text_content == '':
+        print(f'No content found for URL: {url}')
+        return None
+    # Create a filename based on the last part of the URL
+    filename = url.split('/')[-1] + '.txt'
+    return filename, text_content, pub_date
+def download_document(download_link, page_link, download_title, doc_publication_date, blob_folder, rp):
+    """
+    Download a WHO document and extract its metadata, run by the download workers
     
-    # Assuming the fact-sheet content is within the row sf-detail-content
-    text_content = ''
-    for content in soup.find_all('div', class_='row sf-detail-content'):
-        cur_text_content = content.get_text(separator='\n', strip=True)
-        text_content = text_content + cur_text_content
+    Args:
+        download_link (str): url of the document file
+        page_link (str): url of the document page, which contains metadata relating to the document
+        download_title (str): title of the document
+        doc_publication_date (str): publication date of the document, in Y-m-d format
+        blob_folder (Path object): blob store to save file to, output of get_blob_folder()
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego 
+
+    Returns:
+        dictionary, row of metadata for the document, or None if it was not downloaded
+    """
+    # the title is used to name the file
+    download_filename = re.sub(r'[^A-Za-z0-9 ]+', '', download_title) + "." + DOCUMENTS_EXT
+    # download the file to the blob store, the title is kept in the log
+    blob_info = download_file(download_link, blob_folder, download_filename, rp)
+    if blob_info is None:
+        return None
+    # extract additional metadata
+    meta_data_info = extract_meta(page_link, rp)
+    # set current date for metadata
+    now = datetime.now()
+    date_time_string = now.strftime(METADATA_DATE_FMT)
+    return {'url':download_link, 
+            'datetime_captured': date_time_string,
+            'title': download_title,
+            'author': meta_data_info['author'],
+            'publication_date': doc_publication_date,
+            'license': WHO_LICENSE,
+            'file_type': DOCUMENTS_EXT,
+            'storage_location': blob_info['storage_location'],
+            'datetime_last_updated': date_time_string,
+            'json_additional_metadata': add_blob_metadata(combine_metadata_descriptions(meta_data_info), blob_info)}
+async def download_fact_sheet(fetcher, link, directory, rp, is_new = True, logged_date = None, logged_captured = None):
+    """
+    Save a WHO fact sheet and extract its metadata, run as one of many concurrent jobs on the async fetch engine
+        fact sheets that are already logged are only saved again if they have been updated
     
-    pub_date = soup.find('div', class_='date').get_text(separator='\n', strip=True)
-    pub_date = datetime.strptime(pub_date, "%d %B %Y").strftime("%Y-%m-%d")
+    Args:
+        fetcher (AsyncFetcher): async fetch engine for the crawl
+        link (str): url of the fact sheet
+        directory: file path to directory to save file
+        rp (protego robots.txt parsing): result of parsing robots.txt file for the page using Protego 
+        is_new (bool): True if the fact sheet is not in the log
+        logged_date (str): publication date in the log, for fact sheets already logged
+        logged_captured (datetime): datetime captured in the log, for fact sheets already logged
 
-    if text_content != '':
-    # Create a filename based on the last part of the URL
-        filename = url.split('/')[-1] + '.txt'
-        filepath = directory / filename
-        # Save the text content to a file
-        with open(filepath, 'w', encoding='utf-8') as file:
-            file.write(text_content)
-        print(f'Saved: {filename}')
-        return filename, pub_date
-    else:
-        print(f'No content found for URL: {url}')
-        return ''
\ No newline at end of file
+    Returns:
+        dictionary, row of metadata for the fact sheet, or None if it was not saved
+    """
+    response = await fetch_fact_sheet(fetcher, link)
+    if response is None:
+        return None
+    # skip fact sheets that are not modified since the last request, before parsing them
+    if is_new == False and response.from_cache == True:
+        return None
+    # page was added to the page cache, so it is not requested again here, and is parsed in a worker process
+    fact_sheet = await get_page_fields_async(link, rp, parse_fact_sheet)
+    if is_new == False:
+        # skip fact sheets with the same date as the logged row
+        if fact_sheet['date'] == logged_date:
+            return None
+        print(f'Updated since last downloaded: {link}')
+    fact_sheet_content = get_fact_sheet_content(link, fact_sheet)
+    if fact_sheet_content is None:
+        return None
+    filename, text_content, pub_date = fact_sheet_content
+    await write_text_async(directory / filename, text_content)
+    print(f'Saved: {filename}')
+    # extract additional metadata, same as extract_meta() without holding up the other jobs
+    meta_data_info = dict(await get_page_fields_async(link, rp, parse_meta))
+    now = datetime.now()
+    date_time_string = now.strftime(METADATA_DATE_FMT)
+    # updated fact sheets keep the date they were first captured, and replace the logged row
+    date_captured = date_time_string if is_new or logged_captured is None else logged_captured
+    return {'url': link, 
+            'datetime_captured': date_captured,
+            'title': meta_data_info['title'],
+            'author': meta_data_info['author'],
+            'publication_date': pub_date,
+            'license': WHO_LICENSE,
+            'file_type': FACT_SHEETS_EXT,
+            'storage_location': str(directory) + "/" + filename,
+            'datetime_last_updated': date_time_string,
+            'json_additional_metadata': combine_metadata_descriptions(meta_data_info)}